@@ -1,6 +1,9 @@
 """Wrapper for Google OAuth2 API."""
 
+import json
+
 import googleapiclient.discovery
+import googleapiclient.discovery_cache
 import httplib2
 import oauth2client
 
@@ -33,14 +36,34 @@ def _get_credentials(flow, storage, get_code_callback):
         return _get_credentials_interactively(flow, storage, get_code_callback)
 
 
-def get_resource(client_secrets_file, credentials_file, get_code_callback):
-    """Authenticate and return a googleapiclient.discovery.Resource object."""
+def get_credentials(client_secrets_file, credentials_file, get_code_callback):
+    """Return the user credentials, running the interactive flow if needed."""
     get_flow = oauth2client.client.flow_from_clientsecrets
     flow = get_flow(client_secrets_file, scope=YOUTUBE_UPLOAD_SCOPE)
     storage = oauth2client.file.Storage(credentials_file)
-    credentials = _get_credentials(flow, storage, get_code_callback)
-    if credentials:
-        httplib = httplib2.Http()
-        httplib.redirect_codes = httplib.redirect_codes - {308}
-        http = credentials.authorize(httplib)
+    return _get_credentials(flow, storage, get_code_callback)
+
+
+def build_resource(credentials, base_url=None):
+    """Return a googleapiclient.discovery.Resource object on its own authorized
+    httplib2.Http. Http objects are not thread-safe, so every thread needs its own.
+
+    base_url sends the requests to a stand-in of the API instead, e.g.
+    benchmarks/fake_youtube.py."""
+    httplib = httplib2.Http()
+    httplib.redirect_codes = httplib.redirect_codes - {308}
+    http = credentials.authorize(httplib)
+    if not base_url:
         return googleapiclient.discovery.build("youtube", "v3", http=http)
+    # client_options={'api_endpoint': ...} would leave the batch requests
+    # going to the real rootUrl
+    document = json.loads(googleapiclient.discovery_cache.get_static_doc("youtube", "v3"))
+    document["rootUrl"] = document["mtlsRootUrl"] = base_url.rstrip("/") + "/"
+    return googleapiclient.discovery.build_from_document(document, http=http)
+
+
+def get_resource(client_secrets_file, credentials_file, get_code_callback, base_url=None):
+    """Authenticate and return a googleapiclient.discovery.Resource object."""
+    credentials = get_credentials(client_secrets_file, credentials_file, get_code_callback)
+    if credentials:
+        return build_resource(credentials, base_url)
@@ -0,0 +1,149 @@
+#
+# End-to-end benchmark of client.py against the local fake YouTube API.
+#
+# Run from the repository root:
+#   python3 -m benchmarks.end_to_end --items 100000 --videos 500 --latency 0.05
+#   python3 -m benchmarks.end_to_end --modes batch,workers=8,async=32 --out bench_results_e2e.json
+#
+# Every mode processes the next --videos recordings of the same seeded
+# Unprocessed playlist with `client.py --dry_run_off`, in a fresh working
+# directory (quota ledger, list cache, membership mirror, processed CSV). It
+# reports videos per second, HTTP requests per video and, as the fake server
+# accounts it, quota units per video.
+#
+# Without --error_rate every mode has to process exactly the first --videos
+# eligible recordings of Unprocessed, none skipped and none twice; the run
+# fails otherwise.
+
+import os
+import io
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+import client
+from benchmarks import fake_youtube
+from benchmarks import synthetic
+from thinkland import api_calls
+from thinkland import list_cache
+from thinkland import membership
+from thinkland import quota
+from thinkland.meeting import MeetingDB
+from thinkland.playlist import PlaylistDB
+from thinkland.playlist_items import PlaylistItem
+from thinkland.processed_journal import load_journal
+from thinkland.video_match import match_page
+
+
+def mode_arguments(mode):
+    """client.py arguments of a mode: batch, workers=N or async=N."""
+    if mode == 'batch':
+        return []
+    name, _, count = mode.partition('=')
+    return ['--%s' % name, count]
+
+
+def expected_videos(fake, meetingsCsv, count):
+    """Ids of the first count videos of the fake Unprocessed playlist that
+    client.py is expected to process."""
+    playlist = fake.playlists[fake_youtube.UNPROCESSED_PLAYLIST]
+    page = [PlaylistItem(playlist.videos[itemId], fake.videos[playlist.videos[itemId]]['title'], itemId)
+            for itemId in playlist.items]
+    matches = match_page(page, MeetingDB(meetingsCsv), PlaylistDB(meetingsCsv))
+    return [match.video.id for match in matches if match.eligible][:count]
+
+
+def run_mode(mode, args, fake, baseUrl, meetingsCsv, credentials, workdir):
+    os.makedirs(workdir)
+    quota._ledger = quota.QuotaLedger(os.path.join(workdir, 'quota.json'), limit=args.quota)
+    membership._membership = membership.PlaylistMembership(os.path.join(workdir, 'membership.sqlite'))
+    list_cache._cache = list_cache.ListCache(os.path.join(workdir, 'list_cache'))
+    api_calls._caller = api_calls.ApiCaller(rate=args.rate)
+    processedCsv = os.path.join(workdir, 'processed.csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = expected_videos(fake, meetingsCsv, args.videos)
+    before = fake.stats()
+
+    arguments = ['--api_base_url', baseUrl, '--meeting_csv', meetingsCsv,
+                 '--processed_csv', processedCsv, '--client-secrets', credentials[0],
+                 '--credentials-file', credentials[1], '--dry_run_off',
+                 '--process_limit', str(args.videos)] + mode_arguments(mode)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        client.main(arguments)
+    seconds = time.perf_counter() - start
+
+    after = fake.stats()
+    processed = load_journal(processedCsv)
+    videos = len(processed)
+    missing = [videoId for videoId in expected if videoId not in processed]
+    unexpected = [videoId for videoId in processed.videos if videoId not in set(expected)]
+    result = {
+        'mode': mode, 'videos': videos, 'seconds': seconds,
+        'videos_per_sec': videos / seconds if seconds > 0 else None,
+        'http_requests': after['requests'] - before['requests'],
+        'quota_units': after['quota']['spent'] - before['quota']['spent'],
+        'missing': len(missing), 'unexpected': len(unexpected),
+    }
+    result['quota_per_video'] = result['quota_units'] / videos if videos else None
+    result['requests_per_video'] = result['http_requests'] / videos if videos else None
+    print('%-12s videos=%-6d %8.2fs %8.1f videos/s %6.2f requests/video %7.1f units/video' % (
+        mode, videos, seconds, result['videos_per_sec'] or 0,
+        result['requests_per_video'] or 0, result['quota_per_video'] or 0))
+    if missing or unexpected:
+        message = '%s: %d of the expected videos not processed (%s), %d processed unexpectedly (%s)' % (
+            mode, len(missing), ' '.join(missing[:5]), len(unexpected), ' '.join(unexpected[:5]))
+        # injected errors fail some videos on purpose
+        assert args.error_rate, message
+        print(message)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark against the fake YouTube API')
+    parser.add_argument('--items', type=int, default=100000,
+                        help='recordings in the fake Unprocessed playlist')
+    parser.add_argument('--meetings', type=int, default=20000)
+    parser.add_argument('--videos', type=int, default=300, help='videos to process per mode')
+    parser.add_argument('--modes', default='batch,workers=8,async=32')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per HTTP request')
+    parser.add_argument('--error_rate', type=float, default=0.0)
+    parser.add_argument('--quota', type=int, default=10 ** 7,
+                        help='daily quota of the fake server and the ledger')
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help='requests per second of the client side rate limiter')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='thinkland_e2e_')
+    meetingsCsv = os.path.join(workdir, 'meetings.csv')
+    synthetic.write_meetings_csv(meetingsCsv, args.meetings, seed=args.seed)
+    fake = fake_youtube.FakeYouTube(args.quota, args.error_rate, seed=args.seed)
+    fake_youtube.seed_channel(fake, meetingsCsv, args.items, args.seed)
+    server = fake_youtube.serve(fake, latency=args.latency)
+    baseUrl = 'http://%s:%d' % server.server_address
+    credentials = fake_youtube.write_credentials(workdir, baseUrl)
+    print('fake API at %s: %d videos, latency %.0f ms, error rate %.1f%%' % (
+        baseUrl, len(fake.videos), 1000 * args.latency, 100 * args.error_rate))
+
+    # client.log writes to data/log.jsonl, keep it out of the checkout
+    os.makedirs(os.path.join(workdir, 'data'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = [run_mode(mode, args, fake, baseUrl, meetingsCsv, credentials,
+                            os.path.join(workdir, mode.replace('=', '_')))
+                   for mode in args.modes.split(',')]
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+    if args.out:
+        with open(args.out, mode='w') as file_out:
+            json.dump({'args': vars(args), 'results': results}, file_out, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,464 @@
+#
+# Local stand-in of the YouTube Data API for end-to-end tests and benchmarks.
+#
+# Implements the calls the scripts make, with the real paths, parameters and
+# response shapes:
+#
+#   GET    /youtube/v3/playlistItems   paged with maxResults / nextPageToken,
+#                                      ETags and 304 Not Modified
+#   POST   /youtube/v3/playlistItems
+#   DELETE /youtube/v3/playlistItems
+#   GET    /youtube/v3/videos          id=<comma separated ids>
+#   PUT    /youtube/v3/videos
+#   GET    /youtube/v3/playlists       id=... or mine=true, paged
+#   POST   /youtube/v3/playlists
+#   POST   /batch                      multipart/mixed batches of the above
+#   POST   /token                      OAuth2 token refreshes
+#   GET    /fake/stats                 calls, quota and items, as JSON
+#   POST   /fake/reset_quota
+#
+# Every API call is charged the units of thinkland.quota.COSTS; past the
+# daily quota the server answers 403 quotaExceeded like the real API.
+# --latency delays every HTTP request, --error_rate fails that share of the
+# calls with --error_status (503 backendError by default).
+#
+# Run from the repository root, seeded with synthetic recordings of the
+# meetings of benchmarks/synthetic.py:
+#
+#   python3 -m benchmarks.fake_youtube --items 100000 --port 8765 \
+#       --meetings_csv /tmp/fake/meetings.csv --credentials_dir /tmp/fake
+#   python3 client.py --api_base_url http://127.0.0.1:8765 \
+#       --meeting_csv /tmp/fake/meetings.csv \
+#       --client-secrets /tmp/fake/client_secrets.json \
+#       --credentials-file /tmp/fake/credentials.json --dry_run_off
+#
+# The credentials written to --credentials_dir are only good for this server.
+
+import argparse
+import csv
+import email.parser
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter
+from datetime import datetime
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from benchmarks import synthetic
+from thinkland.quota import COSTS
+from thinkland.quota import DAILY_QUOTA
+from thinkland.quota import UNKNOWN_COST
+
+UNPROCESSED_PLAYLIST = 'PLzr1p9rMdhyAPAN1c6O-AeoJPUk4LkQj2'
+ERROR_PROCESSING_PLAYLIST = 'PLzr1p9rMdhyCZ-wxUPEUy7plgIWP_l-cI'
+MAX_RESULTS = 50
+
+# (HTTP method, resource) -> API method
+METHODS = {
+    ('GET', 'playlistItems'): 'youtube.playlistItems.list',
+    ('POST', 'playlistItems'): 'youtube.playlistItems.insert',
+    ('DELETE', 'playlistItems'): 'youtube.playlistItems.delete',
+    ('GET', 'videos'): 'youtube.videos.list',
+    ('PUT', 'videos'): 'youtube.videos.update',
+    ('GET', 'playlists'): 'youtube.playlists.list',
+    ('POST', 'playlists'): 'youtube.playlists.insert',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, reason, message):
+        Exception.__init__(self, message)
+        self.status = status
+        self.reason = reason
+
+    def body(self):
+        return {'error': {'code': self.status, 'message': str(self),
+                          'errors': [{'reason': self.reason, 'message': str(self)}]}}
+
+
+class FakePlaylist:
+    """Items are kept in insertion order. Page tokens are plain offsets into
+    the live list, as on the real service: deleting an item moves every later
+    item one place up, also for a client in the middle of paging through."""
+    def __init__(self, playlistId, snippet, status):
+        self.id = playlistId
+        self.snippet = snippet
+        self.status = status
+        self.items = []      # itemIds
+        self.videos = {}     # itemId -> videoId
+        self.version = 0
+
+    @property
+    def count(self):
+        return len(self.items)
+
+    def add(self, itemId, videoId):
+        self.items.append(itemId)
+        self.videos[itemId] = videoId
+        self.version += 1
+
+    def remove(self, itemId):
+        self.items.remove(itemId)
+        del self.videos[itemId]
+        self.version += 1
+
+
+class FakeYouTube:
+    """The channel behind the fake server: playlists, videos and the quota."""
+    def __init__(self, quota=DAILY_QUOTA, errorRate=0.0, errorStatus=503, seed=0):
+        self.lock = threading.Lock()
+        self.playlists = {}
+        self.videos = {}
+        self.itemPlaylist = {}   # itemId -> playlistId
+        self.quota = quota
+        self.spent = 0
+        self.calls = Counter()
+        self.errors = Counter()
+        self.requests = 0
+        self.batches = 0
+        self.errorRate = errorRate
+        self.errorStatus = errorStatus
+        self.rng = random.Random(seed)
+        self._ids = 0
+
+    def new_id(self, prefix):
+        self._ids += 1
+        return '%s%09d' % (prefix, self._ids)
+
+    def add_playlist(self, playlistId, title, description=''):
+        self.playlists[playlistId] = FakePlaylist(
+            playlistId, {'title': title, 'description': description},
+            {'privacyStatus': 'unlisted'})
+
+    def add_video(self, videoId, title, description='', playlistId=None):
+        self.videos[videoId] = {'title': title, 'description': description, 'categoryId': '22'}
+        if playlistId:
+            itemId = self.new_id('UEx')
+            self.playlists[playlistId].add(itemId, videoId)
+            self.itemPlaylist[itemId] = playlistId
+
+    def call(self, method, resource, params, body):
+        """Run one API call. Returns (status, response or None, headers)."""
+        methodId = METHODS.get((method, resource))
+        if methodId is None:
+            raise ApiError(404, 'notFound', 'no %s method on %s' % (method, resource))
+        with self.lock:
+            units = COSTS.get(methodId, UNKNOWN_COST)
+            if self.spent + units > self.quota:
+                self.errors['quotaExceeded'] += 1
+                raise ApiError(403, 'quotaExceeded', 'The request cannot be completed because '
+                               'you have exceeded your quota.')
+            self.spent += units
+            self.calls[methodId] += 1
+            if self.errorRate and self.rng.random() < self.errorRate:
+                self.errors['injected'] += 1
+                raise ApiError(self.errorStatus, 'backendError', 'injected error')
+            handler = getattr(self, methodId.split('.', 1)[1].replace('.', '_'))
+            return handler(params, body)
+
+    def playlistItems_list(self, params, body):
+        playlist = self._playlist(params.get('playlistId'))
+        maxResults = min(int(params.get('maxResults', 5)), MAX_RESULTS)
+        offset = int(params.get('pageToken', '').lstrip('P') or 0)
+        page = [(itemId, playlist.videos[itemId]) for itemId in playlist.items[offset:offset + maxResults]]
+        offset += maxResults
+        etag = _etag(playlist.id, playlist.version, params.get('pageToken'), maxResults)
+        response = {
+            'kind': 'youtube#playlistItemListResponse',
+            'etag': etag,
+            'items': [self._item(playlist, itemId, videoId) for itemId, videoId in page],
+            'pageInfo': {'totalResults': playlist.count, 'resultsPerPage': maxResults},
+        }
+        if offset < len(playlist.items):
+            response['nextPageToken'] = 'P%d' % offset
+        return 200, response, {'etag': etag}
+
+    def playlistItems_insert(self, params, body):
+        snippet = body.get('snippet', {})
+        playlist = self._playlist(snippet.get('playlistId'))
+        videoId = snippet.get('resourceId', {}).get('videoId')
+        if videoId not in self.videos:
+            raise ApiError(404, 'videoNotFound', 'Video not found.')
+        itemId = self.new_id('UEx')
+        playlist.add(itemId, videoId)
+        self.itemPlaylist[itemId] = playlist.id
+        return 200, self._item(playlist, itemId, videoId), {}
+
+    def playlistItems_delete(self, params, body):
+        playlistId = self.itemPlaylist.pop(params.get('id'), None)
+        if playlistId is None:
+            raise ApiError(404, 'playlistItemNotFound', 'Playlist item not found.')
+        self.playlists[playlistId].remove(params['id'])
+        return 204, None, {}
+
+    def videos_list(self, params, body):
+        ids = [videoId for videoId in params.get('id', '').split(',') if videoId in self.videos]
+        return 200, {
+            'kind': 'youtube#videoListResponse',
+            'items': [{'kind': 'youtube#video', 'id': videoId, 'snippet': dict(self.videos[videoId])}
+                      for videoId in ids],
+            'pageInfo': {'totalResults': len(ids), 'resultsPerPage': len(ids)},
+        }, {}
+
+    def videos_update(self, params, body):
+        video = self.videos.get(body.get('id'))
+        if video is None:
+            raise ApiError(404, 'videoNotFound', 'Video not found.')
+        snippet = body.get('snippet', {})
+        if not snippet.get('title'):
+            raise ApiError(400, 'invalidTitle', 'The request metadata specifies an invalid video title.')
+        video.update((key, str(value)) for key, value in snippet.items()
+                     if key in ('title', 'description', 'categoryId'))
+        return 200, {'kind': 'youtube#video', 'id': body['id'], 'snippet': dict(video)}, {}
+
+    def playlists_list(self, params, body):
+        if params.get('id'):
+            ids = [playlistId for playlistId in params['id'].split(',') if playlistId in self.playlists]
+        else:
+            ids = list(self.playlists)
+        maxResults = min(int(params.get('maxResults', 5)), MAX_RESULTS)
+        offset = int(params.get('pageToken', '').lstrip('P') or 0)
+        response = {
+            'kind': 'youtube#playlistListResponse',
+            'items': [self._playlist_resource(self.playlists[playlistId])
+                      for playlistId in ids[offset:offset + maxResults]],
+            'pageInfo': {'totalResults': len(ids), 'resultsPerPage': maxResults},
+        }
+        if offset + maxResults < len(ids):
+            response['nextPageToken'] = 'P%d' % (offset + maxResults)
+        return 200, response, {}
+
+    def playlists_insert(self, params, body):
+        playlistId = self.new_id('PLfake')
+        self.add_playlist(playlistId, body.get('snippet', {}).get('title', ''),
+                          body.get('snippet', {}).get('description', ''))
+        return 200, self._playlist_resource(self.playlists[playlistId]), {}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'calls': dict(self.calls),
+                'errors': dict(self.errors),
+                'quota': {'limit': self.quota, 'spent': self.spent},
+                'videos': len(self.videos),
+                'playlists': {playlistId: playlist.count
+                              for playlistId, playlist in self.playlists.items()
+                              if playlistId in (UNPROCESSED_PLAYLIST, ERROR_PROCESSING_PLAYLIST)},
+                'processed_items': sum(playlist.count for playlistId, playlist in self.playlists.items()
+                                       if playlistId not in (UNPROCESSED_PLAYLIST,
+                                                             ERROR_PROCESSING_PLAYLIST)),
+            }
+
+    def _playlist(self, playlistId):
+        playlist = self.playlists.get(playlistId)
+        if playlist is None:
+            raise ApiError(404, 'playlistNotFound', 'Playlist %s not found.' % playlistId)
+        return playlist
+
+    def _item(self, playlist, itemId, videoId):
+        video = self.videos[videoId]
+        return {
+            'kind': 'youtube#playlistItem',
+            'etag': _etag(itemId, video['title']),
+            'id': itemId,
+            'snippet': {
+                'playlistId': playlist.id,
+                'title': video['title'],
+                'description': video['description'],
+                'resourceId': {'kind': 'youtube#video', 'videoId': videoId},
+            },
+            'contentDetails': {'videoId': videoId},
+        }
+
+    def _playlist_resource(self, playlist):
+        return {'kind': 'youtube#playlist', 'id': playlist.id, 'etag': _etag(playlist.id, playlist.version),
+                'snippet': dict(playlist.snippet), 'status': dict(playlist.status),
+                'contentDetails': {'itemCount': playlist.count}}
+
+
+def _etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def seed_channel(fake, meetingsCsv, items, seed=0):
+    """Fill fake with the playlists of meetingsCsv and `items` recordings of
+    its meetings in the Unprocessed playlist."""
+    fake.add_playlist(UNPROCESSED_PLAYLIST, 'Unprocessed')
+    fake.add_playlist(ERROR_PROCESSING_PLAYLIST, 'Error processing')
+    with open(meetingsCsv, mode='r') as file_in:
+        for line in csv.DictReader(file_in):
+            url = line['YouTube Playlist Share URL']
+            if 'list=' in url:
+                playlistId = url.rsplit('list=', 1)[1]
+                if playlistId not in fake.playlists:
+                    fake.add_playlist(playlistId, line['Class Name'])
+    for i, title in enumerate(synthetic.make_titles(meetingsCsv, items, seed=seed)):
+        fake.add_video('fakevid%07d' % i, title, 'Zoom cloud recording', UNPROCESSED_PLAYLIST)
+
+
+def write_credentials(directory, baseUrl):
+    """Write client_secrets.json and credentials.json that authorize against
+    the fake server at baseUrl. Returns their paths."""
+    from oauth2client.client import OAuth2Credentials
+    os.makedirs(directory, exist_ok=True)
+    tokenUri = baseUrl.rstrip('/') + '/token'
+    secretsPath = os.path.join(directory, 'client_secrets.json')
+    with open(secretsPath, mode='w') as file_out:
+        json.dump({'installed': {
+            'client_id': 'fake-client', 'client_secret': 'fake-secret',
+            'redirect_uris': ['urn:ietf:wg:oauth:2.0:oob'],
+            'auth_uri': baseUrl.rstrip('/') + '/auth', 'token_uri': tokenUri}}, file_out)
+    credentialsPath = os.path.join(directory, 'credentials.json')
+    credentials = OAuth2Credentials('fake-token', 'fake-client', 'fake-secret', 'fake-refresh',
+                                    datetime.utcnow() + timedelta(days=3650), tokenUri, None)
+    with open(credentialsPath, mode='w') as file_out:
+        file_out.write(credentials.to_json())
+    return secretsPath, credentialsPath
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch()
+
+    do_POST = do_PUT = do_DELETE = do_GET
+
+    def dispatch(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        with self.fake.lock:
+            self.fake.requests += 1
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == '/batch' or url.path.startswith('/batch/'):
+            self.batch(body)
+        elif url.path == '/token':
+            self.reply(200, {'access_token': 'fake-token', 'expires_in': 3600, 'token_type': 'Bearer'})
+        elif url.path == '/fake/stats':
+            self.reply(200, self.fake.stats())
+        elif url.path == '/fake/reset_quota':
+            with self.fake.lock:
+                self.fake.spent = 0
+            self.reply(204, None)
+        else:
+            status, response, headers = api_call(self.fake, self.command, self.path, body,
+                                                 self.headers.get('If-None-Match'))
+            self.reply(status, response, headers)
+
+    def batch(self, body):
+        with self.fake.lock:
+            self.fake.batches += 1
+        message = email.parser.BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode('latin-1') + b'\r\n\r\n' + body)
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            head, _, inner = part.get_payload().replace('\r\n', '\n').partition('\n\n')
+            requestLine, *headerLines = head.split('\n')
+            method, target = requestLine.split(' ')[:2]
+            headers = dict(line.split(': ', 1) for line in headerLines if ': ' in line)
+            status, response, extra = api_call(self.fake, method, target, inner.encode('utf-8'),
+                                               headers.get('If-None-Match') or headers.get('if-none-match'))
+            content = '' if response is None else json.dumps(response)
+            parts.append('--%s\r\nContent-Type: application/http\r\nContent-ID: <response-%s>\r\n\r\n'
+                         'HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=UTF-8\r\n%s\r\n%s\r\n' % (
+                             boundary, part['Content-ID'][1:-1], status, self.responses[status][0],
+                             ''.join('%s: %s\r\n' % item for item in extra.items()), content))
+        content = (''.join(parts) + '--%s--\r\n' % boundary).encode('utf-8')
+        self.send(200, content, {'Content-Type': 'multipart/mixed; boundary=%s' % boundary})
+
+    def reply(self, status, response, headers=None):
+        content = b'' if response is None else json.dumps(response).encode('utf-8')
+        headers = dict(headers or {})
+        if content:
+            headers['Content-Type'] = 'application/json; charset=UTF-8'
+        self.send(status, content, headers)
+
+    def send(self, status, content, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        # one write for the headers and the body: no Nagle delay on small replies
+        self._headers_buffer.append(b'\r\n')
+        self.wfile.write(b''.join(self._headers_buffer) + content)
+        self._headers_buffer = []
+
+
+def api_call(fake, method, target, body, ifNoneMatch=None):
+    """Run the API call of an HTTP request. Returns (status, response, headers)."""
+    url = urllib.parse.urlsplit(target)
+    resource = url.path.rstrip('/').rsplit('/', 1)[-1]
+    params = dict(urllib.parse.parse_qsl(url.query))
+    try:
+        status, response, headers = fake.call(method, resource, params,
+                                              json.loads(body) if body.strip() else {})
+    except ApiError as error:
+        return error.status, error.body(), {}
+    except (ValueError, KeyError, TypeError) as error:
+        return 400, ApiError(400, 'badRequest', str(error)).body(), {}
+    if ifNoneMatch and headers.get('etag') == ifNoneMatch:
+        return 304, None, headers
+    return status, response, headers
+
+
+def serve(fake, port=0, latency=0.0, host='127.0.0.1'):
+    """Start serving fake on a background thread. Returns the server, its
+    base URL is 'http://%s:%d' % server.server_address."""
+    handler = type('Handler', (FakeHandler,), {'fake': fake, 'latency': latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake_youtube', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in of the YouTube Data API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--items', type=int, default=100000,
+                        help='recordings in the Unprocessed playlist')
+    parser.add_argument('--meetings', type=int, default=20000,
+                        help='meetings of the synthetic schedule')
+    parser.add_argument('--meetings_csv', default='fake_meetings.csv',
+                        help='where to write the synthetic meetings CSV')
+    parser.add_argument('--credentials_dir',
+                        help='write client secrets and credentials for this server there')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per HTTP request')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='share of calls failed')
+    parser.add_argument('--error_status', type=int, default=503)
+    parser.add_argument('--quota', type=int, default=DAILY_QUOTA)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    synthetic.write_meetings_csv(args.meetings_csv, args.meetings, seed=args.seed)
+    fake = FakeYouTube(args.quota, args.error_rate, args.error_status, args.seed)
+    seed_channel(fake, args.meetings_csv, args.items, args.seed)
+    server = serve(fake, args.port, args.latency)
+    baseUrl = 'http://%s:%d' % server.server_address
+    if args.credentials_dir:
+        write_credentials(args.credentials_dir, baseUrl)
+    print('Serving %d videos in %d playlists at %s' % (len(fake.videos), len(fake.playlists), baseUrl))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#
+# Benchmarks of the meeting loading and matching hot paths on synthetic data.
+#
+# Run from the repository root:
+#   python3 -m benchmarks.run --rows 1000,10000,100000 --out bench_results.json
+#   python3 -m benchmarks.run --compare old_results.json bench_results.json
+#
+# For every CSV size it reports the throughput of each step and, unless
+# --no_memory is given, the peak Python heap usage measured in a second run
+# under tracemalloc (memory mapped snapshot pages are not counted).
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+import converter
+from benchmarks import synthetic
+from thinkland import snapshot
+from thinkland.meeting import MeetingDB
+from thinkland.playlist import PlaylistDB
+from thinkland.zoom_title import parse_titles
+
+STEPS = ['load_cold', 'load_warm', 'playlistdb_load', 'parse_titles', 'match',
+         'match_many', 'reload', 'expand_class_dates', 'converter_read_csv',
+         'converter_write_json', 'converter_load_json']
+
+
+def load_expand_class_dates():
+    # aigolearning parses the command line when imported
+    saved = sys.argv
+    sys.argv = [saved[0]]
+    sys.path.insert(0, 'process_v1_datascheme')
+    try:
+        import aigolearning
+    finally:
+        sys.argv = saved
+    return aigolearning.expandClassDates
+
+
+def measure(step, rows, items, setup, func, memory):
+    """Time func(*setup()), then rerun it under tracemalloc for the peak."""
+    args = setup()
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        args = setup()
+        tracemalloc.start()
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    result = {'step': step, 'rows': rows, 'items': items, 'seconds': seconds,
+              'items_per_sec': items / seconds if seconds > 0 else None,
+              'peak_bytes': peak}
+    print('%-22s rows=%-8d items=%-8d %9.4fs %12.0f/s %s' % (
+        step, rows, items, seconds, result['items_per_sec'] or 0,
+        '' if peak is None else '%.1f MB' % (peak / 1e6)))
+    return result
+
+
+def run_size(rows, args, workdir, expandClassDates):
+    csvPath = os.path.join(workdir, 'meetings_%d.csv' % rows)
+    rows = synthetic.write_meetings_csv(csvPath, rows, seed=args.seed)
+    titles = synthetic.make_titles(csvPath, args.titles, seed=args.seed)
+    steps = args.steps.split(',') if args.steps else STEPS
+    memory = not args.no_memory
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    results = []
+
+    def cold():
+        snapshot._loaded.clear()
+        if os.path.exists(snapshot.snapshot_path(csvPath)):
+            os.remove(snapshot.snapshot_path(csvPath))
+        return (csvPath,)
+
+    def warm():
+        snapshot._loaded.clear()
+        MeetingDB(csvPath)
+        snapshot._loaded.clear()
+        return (csvPath,)
+
+    def loaded():
+        return (MeetingDB(csvPath),)
+
+    def appended():
+        # a copy of the CSV with 1% more rows appended after loading it
+        copyPath = os.path.join(workdir, 'reload.csv')
+        for path in [copyPath, snapshot.snapshot_path(copyPath)]:
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.copyfile(csvPath, copyPath)
+        db = MeetingDB(copyPath)
+        extra = os.path.join(workdir, 'extra.csv')
+        synthetic.write_meetings_csv(extra, max(rows // 100, 1), seed=args.seed + 1)
+        with open(extra, mode='r') as file_in, open(copyPath, mode='a') as file_out:
+            file_out.write(''.join(file_in.readlines()[1:]))
+        return (db,)
+
+    def matchAll(db):
+        with quiet:
+            for title in titles:
+                db.match(title, 15)
+
+    jsonPath = os.path.join(workdir, 'meetings.json')
+    schedules = synthetic.make_class_schedules(max(rows // 15, 1), seed=args.seed)
+    plan = {
+        'load_cold': (rows, cold, MeetingDB),
+        'load_warm': (rows, warm, MeetingDB),
+        'playlistdb_load': (rows, warm, PlaylistDB),
+        'parse_titles': (len(titles), lambda: (titles,), parse_titles),
+        'match': (len(titles), loaded, matchAll),
+        'match_many': (len(titles), loaded, lambda db: db.match_many(titles, 15)),
+        'reload': (max(rows // 100, 1), appended, lambda db: db.reload()),
+        'expand_class_dates': (len(schedules), lambda: (schedules,),
+                               lambda s: [expandClassDates(d, t) for d, t in s]),
+        'converter_read_csv': (rows, lambda: (csvPath,), converter.read_csv),
+        'converter_write_json': (rows, lambda: (converter.read_csv(csvPath), jsonPath),
+                                 converter.write_json),
+        'converter_load_json': (rows, lambda: (jsonPath,), converter.load_meetings_from_json_file),
+    }
+    for step in steps:
+        items, setup, func = plan[step]
+        if step == 'converter_load_json' and not os.path.exists(jsonPath):
+            converter.write_json(converter.read_csv(csvPath), jsonPath)
+        results.append(measure(step, rows, items, setup, func, memory))
+    return results
+
+
+def compare(oldPath, newPath):
+    with open(oldPath, mode='r') as file_in:
+        old = json.load(file_in)
+    with open(newPath, mode='r') as file_in:
+        new = json.load(file_in)
+    before = {(r['step'], r['rows']): r for r in old['results']}
+    print('%-22s %-8s %10s %10s %8s' % ('step', 'rows', 'old s', 'new s', 'speedup'))
+    for r in new['results']:
+        key = (r['step'], r['rows'])
+        if key in before:
+            print('%-22s %-8d %10.4f %10.4f %7.2fx' % (
+                r['step'], r['rows'], before[key]['seconds'], r['seconds'],
+                before[key]['seconds'] / r['seconds'] if r['seconds'] else 0))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='1000,10000,100000',
+                        help='comma separated meetings CSV sizes, up to 1000000')
+    parser.add_argument('--titles', type=int, default=10000,
+                        help='number of Unprocessed playlist titles to match')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--steps', help='comma separated subset of ' + ','.join(STEPS))
+    parser.add_argument('--no_memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    expandClassDates = load_expand_class_dates()
+    results = []
+    workdir = tempfile.mkdtemp(prefix='thinkland-bench-')
+    try:
+        for rows in [int(r) for r in args.rows.split(',')]:
+            results.extend(run_size(rows, args, workdir, expandClassDates))
+    finally:
+        shutil.rmtree(workdir)
+
+    with open(args.out, mode='w') as file_out:
+        json.dump({'meta': {'time': datetime.now().isoformat(timespec='seconds'),
+                            'python': platform.python_version(),
+                            'platform': platform.platform(),
+                            'seed': args.seed, 'titles': args.titles},
+                   'results': results}, file_out, indent=4)
+    print('Wrote %s' % args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#
+# Seeded generator of synthetic data for the benchmarks.
+#
+# write_meetings_csv() writes a meetings CSV with the same columns as the
+# scheduling export: weekly classes over several terms, spread over every
+# Zoom account, each with its playlist. make_titles() produces titles as they
+# show up in the Unprocessed playlist, a share of them malformed.
+
+import csv
+import random
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from thinkland.zoom_canonicalize import ZOOM_KEY
+
+HEADER = ['Class Date', 'Start Time', 'End Time', 'Class Name', 'Class ID',
+          'Teacher Name', 'YouTube Title', 'YouTube Description', 'Zoom ID',
+          'Reported', 'YouTube Playlist Share URL']
+
+# (name, first day, number of weeks)
+TERMS = [('Fall', date(2022, 9, 5), 16), ('Winter', date(2023, 1, 2), 10),
+         ('Spring', date(2023, 3, 13), 12), ('Summer', date(2023, 6, 12), 10),
+         ('Fall', date(2023, 9, 4), 16), ('Spring', date(2024, 3, 11), 12)]
+COURSES = ['AI005 Java', 'AI003 Python', 'Math202 AMC 10', 'Math101 AMC 8',
+           'CS101 Scratch', 'AI007 USACO Bronze', 'AI008 USACO Silver']
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+FIRST_NAMES = ['Ali', 'Krishna', 'James', 'Ananya', 'Wei', 'Maria', 'Chen', 'Priya']
+LAST_NAMES = ['Fakhry', 'Cheemalapati', 'Leung', 'Agarwal', 'Zhang', 'Lopez', 'Li']
+RAW_ZOOM_IDS = sorted(ZOOM_KEY)
+EASTERN = ZoneInfo('US/Eastern')
+UTC = ZoneInfo('UTC')
+
+
+def generate_classes(rows, seed=0):
+    """Yield (class dict, meeting dates) until about `rows` meetings."""
+    rng = random.Random(seed)
+    total = 0
+    classId = 100
+    while total < rows:
+        termName, termStart, weeks = TERMS[classId % len(TERMS)]
+        weekday = rng.randrange(7)
+        hour = rng.randrange(8, 21)
+        minute = rng.choice([0, 30])
+        length = rng.choice([60, 90])
+        course = rng.choice(COURSES)
+        teacher = '%s %s' % (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+        end = datetime(2000, 1, 1, hour, minute) + timedelta(minutes=length)
+        tlClass = {
+            'classId': str(classId),
+            'className': '%s %s-%d %s %s %02d:%02d-%02d:%02d ET' % (
+                termName, course.split(' ')[0], classId, ' '.join(course.split(' ')[1:]),
+                WEEKDAYS[weekday], hour, minute, end.hour, end.minute),
+            'teacher': teacher,
+            'zoom': rng.choice(RAW_ZOOM_IDS),
+            'start': '%02d:%02d:00' % (hour, minute),
+            'end': '%02d:%02d:00' % (end.hour, end.minute),
+            'playlist': 'PLsynthetic%08d' % classId,
+            'weekday': weekday,
+            'first': termStart + timedelta(days=weekday),
+        }
+        dates = [tlClass['first'] + timedelta(weeks=w) for w in range(min(weeks, rows - total))]
+        total += len(dates)
+        classId += 1
+        yield tlClass, dates
+
+
+def write_meetings_csv(file_path, rows, seed=0):
+    """Write a meetings CSV of about `rows` meetings, returns the row count."""
+    count = 0
+    with open(file_path, mode='w', newline='') as file_out:
+        writer = csv.writer(file_out)
+        writer.writerow(HEADER)
+        for tlClass, dates in generate_classes(rows, seed):
+            for day in dates:
+                writer.writerow(meeting_row(tlClass, day, count))
+                count += 1
+    return count
+
+
+def meeting_row(tlClass, day, lesson):
+    return [day.isoformat(), tlClass['start'], tlClass['end'], tlClass['className'],
+            tlClass['classId'], tlClass['teacher'],
+            '%s | %s | %s' % (tlClass['className'], tlClass['teacher'], day.isoformat()),
+            'Lesson %d of %s, taught by %s.\nRecorded on Zoom.' % (
+                lesson, tlClass['className'], tlClass['teacher']),
+            tlClass['zoom'], '',
+            'https://www.youtube.com/playlist?list=%s' % tlClass['playlist']]
+
+
+def make_titles(csvFilePath, count, seed=0, malformed=0.05, jitterMinutes=20):
+    """Return `count` Unprocessed playlist titles for meetings of csvFilePath.
+
+    Recording starts are jittered by up to jitterMinutes around the meeting
+    start; about `malformed` of the titles are broken in various ways.
+    """
+    rng = random.Random(seed)
+    with open(csvFilePath, mode='r') as file_in:
+        meetings = [(line['Class Date'], line['Start Time'], line['Zoom ID'])
+                    for line in csv.DictReader(file_in)]
+    titles = []
+    for i in range(count):
+        classDate, startTime, rawZoom = rng.choice(meetings)
+        start = datetime.fromisoformat(classDate + 'T' + startTime).replace(tzinfo=EASTERN)
+        start = start.astimezone(UTC) + timedelta(seconds=rng.randint(-60 * jitterMinutes,
+                                                                      60 * jitterMinutes))
+        zoom = ZOOM_KEY.get(rawZoom, rawZoom)
+        suffix = rng.choice(['Recording 1760x820', 'Recording gallery 1686x768',
+                             'Recording 1920x1080', 'Recording'])
+        title = '%s %s %s' % (zoom, start.strftime('GMT%Y%m%d %H%M%S'), suffix)
+        if rng.random() < malformed:
+            title = rng.choice([
+                lambda t: t.replace(' GMT', ' GMT2022'),     # bad date
+                lambda t: t[:12],                            # truncated
+                lambda t: 'Z99' + t[3:],                     # unknown account
+                lambda t: 'IMG_%04d' % rng.randrange(10000),  # not a recording
+                lambda t: t.replace(' ', '_', 1),            # odd separator
+            ])(title)
+        titles.append(title)
+    return titles
+
+
+def make_class_schedules(count, seed=0):
+    """Return (classDateStr, classTimeStr) pairs as expandClassDates takes them."""
+    rng = random.Random(seed)
+    ret = []
+    for i in range(count):
+        termName, termStart, weeks = rng.choice(TERMS)
+        weekday = rng.randrange(7)
+        first = termStart + timedelta(days=weekday)
+        last = first + timedelta(weeks=weeks - 1)
+        hour = rng.randrange(8, 21)
+        ret.append(('%s-%s' % (first.strftime('%m/%d/%Y'), last.strftime('%m/%d/%Y')),
+                    '%s %02d:00-%02d:00' % (WEEKDAYS[weekday], hour, hour + 1)))
+    return ret
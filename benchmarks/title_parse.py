@@ -0,0 +1,50 @@
+#
+# Micro-benchmark of thinkland.zoom_title against the split based parsing
+# MeetingDB.match used before it.
+#
+# Run from the repository root:
+#   python3 -m benchmarks.title_parse --count 100000
+
+import time
+import argparse
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from thinkland.zoom_title import parse_title
+from thinkland.zoom_title import parse_titles
+
+UTC = ZoneInfo('UTC')
+
+
+def legacy_parse(title):
+    """The split based parsing MeetingDB.match used before, for comparison."""
+    sections = title.split(' ')
+    if (len(sections) < 3 or len(sections[1]) < 11 or len(sections[2]) < 6 or
+        not sections[1][3:].isdigit() or not sections[2].isdigit()):
+        return None
+    video_dt = datetime(int(sections[1][3:7]), int(sections[1][7:9]), int(sections[1][9:11]),
+                        int(sections[2][:2]), int(sections[2][2:4]), int(sections[2][4:6]),
+                        tzinfo=UTC)
+    return sections[0], int(video_dt.timestamp())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    samples = ['Z09 GMT20220812 183013 Recording 1760x820',
+               'Z05 GMT20221204 200309 Recording gallery 1686x768',
+               'Z09-GMT20221218-225935_Recording.transcript.vtt',
+               'Z09_GMT20230105_010101_Recording_avo_1280x720.mp4',
+               'not a recording title']
+    titles = [samples[i % len(samples)] for i in range(args.count)]
+
+    for name, func in [('legacy split', lambda: [legacy_parse(t) for t in titles]),
+                       ('parse_title', lambda: [parse_title(t) for t in titles]),
+                       ('strict', lambda: [parse_title(t, strict=True) for t in titles]),
+                       ('parse_titles', lambda: parse_titles(titles))]:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print('%-14s %8.1f ns/title' % (name, elapsed * 1e9 / len(titles)))
@@ -18,9 +18,9 @@
 import os
 import sys
 import optparse
-import json
 from io import open
-import csv
+import time
+import asyncio
 
 import googleapiclient.errors
 
@@ -29,24 +29,54 @@ from auth import lib
 
 # from thinkland import classes
 from thinkland.classes import log
-from thinkland.classes import appendProcessedVideo
+from thinkland.processed_journal import ProcessedJournal
+from thinkland.processed_journal import SYNC_EVERY
+from thinkland.processed_journal import load_journal
 from thinkland.playlist import PlaylistDB
+from thinkland.playlist import SqlPlaylistDB
 from thinkland.meeting import MeetingDB
+from thinkland.meeting import SqlMeetingDB
+from thinkland.metadata_store import MetadataStore
+from thinkland.meeting import AMBIGUOUS
+from thinkland.video_match import NO_MEETING
+from thinkland.video_match import match_pages
+from thinkland.zoom_title import parse_title
+from thinkland.zoom_title import GALLERY
+from thinkland.youtube_batch import BatchExecutor
+from thinkland.youtube_batch import logged
+from thinkland.youtube_async import AsyncYouTube
+from thinkland.youtube_async import DEFAULT_BASE_URL
+from thinkland.workers import Coordinator
+from thinkland.workers import prefetch
+from thinkland.workers import run_workers
+from thinkland.quota import QuotaExceeded
+from thinkland.quota import cost
+from thinkland.quota import get_ledger
+from thinkland.api_calls import execute
+from thinkland.api_calls import get_caller
+from thinkland.list_cache import get_list_cache
+from thinkland.playlist_items import fetch_descriptions
+from thinkland.playlist_items import iter_pages
+from thinkland.membership import get_membership
 
 
 unprocessed_playlist = 'PLzr1p9rMdhyAPAN1c6O-AeoJPUk4LkQj2'
 error_processing_playlist = 'PLzr1p9rMdhyCZ-wxUPEUy7plgIWP_l-cI'
 
 
-DAILY_THRESHOLD = 9500
 UNPROCESSED_LIMIT = 50
+# pages of the Unprocessed playlist listed ahead of the matching
+PREFETCH_PAGES = 2
+# quota units of the update, insert and delete of one video
+VIDEO_COST = (cost('youtube.videos.update') + cost('youtube.playlistItems.insert') +
+              cost('youtube.playlistItems.delete'))
 
 class AuthenticationError(Exception): pass
 
 class RequestError(Exception): pass
 
-def get_youtube_handler(options):
-    """Return the API Youtube object."""
+def get_youtube_credentials(options):
+    """Return the OAuth2 credentials of the Youtube account."""
     home = os.path.expanduser("~")
     default_credentials = os.path.join(home, ".youtube-upload-credentials.json")
     client_secrets = options.client_secrets or os.path.join(home, ".client_secrets.json")
@@ -55,45 +85,28 @@ def get_youtube_handler(options):
     lib.debug("Using credentials file: {0}".format(credentials))
     get_code_callback = (auth.browser.get_code
                          if options.auth_browser else auth.console.get_code)
-    return auth.get_resource(client_secrets, credentials,
-                             get_code_callback=get_code_callback)
-
-
-def get_unprocessed_videos(youtube, playlistDB, meetingDB, process_limit, minutesAllow=15):
-    next_page_token = ''
-    ret = list()
-    eligible = 0
-    while eligible < process_limit:
-        request = youtube.playlistItems().list(
-            part='snippet,contentDetails',
-            maxResults=UNPROCESSED_LIMIT,
-            pageToken=next_page_token,
-            playlistId=unprocessed_playlist
-        )
-        pl_items_list = request.execute()
-
-        for item in pl_items_list['items']:
-            video = {
-                    'id': item['contentDetails']['videoId'],
-                    'title': item['snippet']['title'],
-                    'desc': item['snippet']['description'],
-                    'itemId': item['id']
-                }
-            ret.append(video)
-            meeting = meetingDB.match(video['title'], minutesAllow)
-            if not meeting:
-                continue
-            playlist = playlistDB.getPlaylistId(meeting.classId, meeting.teacherName)
-            if not playlist:
-                continue
-            eligible += 1
-
-        # print(json.dumps(pl_items_list, indent=4))
-        if "nextPageToken" in pl_items_list:
-            next_page_token = pl_items_list['nextPageToken']
-        else:
-            break
-    return ret
+    return auth.get_credentials(client_secrets, credentials,
+                                get_code_callback=get_code_callback)
+
+
+def get_youtube_handler(options):
+    """Return the API Youtube object."""
+    credentials = get_youtube_credentials(options)
+    if credentials:
+        return auth.build_resource(credentials, options.api_base_url)
+
+
+def iter_unprocessed_pages(youtube):
+    """Yield the pages of the Unprocessed playlist, listed on a background
+    thread up to PREFETCH_PAGES pages ahead. The thread uses youtube
+    exclusively, give it a Resource of its own."""
+    return prefetch(iter_pages(youtube, unprocessed_playlist, UNPROCESSED_LIMIT), PREFETCH_PAGES)
+
+
+def iter_unprocessed_matches(youtube, playlistDB, meetingDB):
+    """Yield a VideoMatch for every video of the Unprocessed playlist, each
+    one matched once. Close the generator to stop the listing."""
+    return match_pages(iter_unprocessed_pages(youtube), meetingDB, playlistDB)
 
 
 # next_page = 'NONE'
@@ -131,76 +144,128 @@ def get_unprocessed_videos(youtube, playlistDB, meetingDB, process_limit, minute
 #     print(json.dumps(pl_items_list["pageInfo"], indent=4))
 #     return ret
 
-def process_video(video, meeting, youtube):
-    """Take a video, which is a (video_id, title, playlist_item_id) tuple.
-    Extracts the canonical zoom account from title.
-    Extracts GMT date time from title. EDIT: GMT date from meetingdb, meeting is pre-input
-    Try to match to a meeting.
-    If the meeting has not an associated video, call Youtube API to update the title and description
-    of this video.
-    Add the video into its destination playlist.
-    Remove this video from the unprocessed playlist by the given playlist_item_id.
-    Set the video_id back to the meetingsDB.
-    """
-    can_zid = video['title'].split(' ')[0]  # better to get it from meeting object
+def processed_video_body(video, meeting):
+    """The new title of a processed video and the body of its videos().update."""
+    can_zid = video.title.split(' ')[0]  # better to get it from meeting object
     recording_start = meeting.startTime
     # new_title = meeting.className + ' ' + meeting.teacherName + ' ' + str(recording_start)
     new_title = meeting.title
-    if "gallery" in video['title']:
+    parsed = parse_title(video.title)
+    if parsed and parsed.view == GALLERY:
         new_title = new_title + " Gallery"
 
     new_desc = (meeting.description + '\n\n###' + can_zid + '|' +
                 meeting.classId + '|' + str(recording_start) + '|' +
                 meeting.teacherName + '|' + meeting.className +
-                '###\n###YJv1###\n' + video['title'])
-    request = youtube.videos().update(
-        part='snippet',
-        body={
-            'id': video['id'],
-            'snippet': {
-                'description': new_desc,
-                'title': new_title,
-                'categoryId': 22
-            }
+                '###\n###YJv1###\n' + video.title)
+    return new_title, {
+        'id': video.id,
+        'snippet': {
+            'description': new_desc,
+            'title': new_title,
+            'categoryId': 22
         }
-    )
-    request.execute()
-    log("Updated video %s %s" % (video['id'], new_title))
-
-    request = youtube.playlistItems().insert(
-        part='snippet',
-        body={
-            'snippet': {
-                'playlistId': meeting.playlist,
-                'resourceId': {
+    }
+
+def playlist_item_body(playlistId, videoId):
+    """The body of the playlistItems().insert of videoId into playlistId."""
+    return {
+        'snippet': {
+            'playlistId': playlistId,
+            'resourceId': {
                 'kind': 'youtube#video',
-                'videoId': video['id']
-                }
+                'videoId': videoId
             }
         }
-    )
-    request.execute()
-    log("Add video %s %s into playlist %s" % (video['id'], new_title, meeting.playlist))
+    }
+
+def process_video(video, meeting, youtube, batch=None, done=None):
+    """Take a video, which is a (video_id, title, playlist_item_id) tuple.
+    Extracts the canonical zoom account from title.
+    Extracts GMT date time from title. EDIT: GMT date from meetingdb, meeting is pre-input
+    Try to match to a meeting.
+    If the meeting has not an associated video, call Youtube API to update the title and description
+    of this video.
+    Add the video into its destination playlist.
+    Set the video_id back to the meetingsDB.
 
-    request = youtube.playlistItems().delete(id=video['itemId'])
-    request.execute()
-    log("Removed video %s from unprocessed playlist" % video['id'])
+    The two requests are queued on batch, the insert only sent when the update
+    succeeded, and done(response, exception) is called with the outcome of the
+    insert. Without a batch they are executed right away. Removing the video
+    from the unprocessed playlist is left to remove_unprocessed().
+    """
+    new_title, body = processed_video_body(video, meeting)
+    executor = batch or BatchExecutor(youtube)
+    request = youtube.videos().update(part='snippet', body=body)
+    update = executor.add(request, logged("Updated video %s %s" % (video.id, new_title),
+                                           video=video.id, action='update'))
 
-def process_unmatched_video(youtube, video):
-    new_desc = '''###YJv1:video does not match any meeting###\n%s''' % (video['desc'])
+    request = youtube.playlistItems().insert(
+        part='snippet', body=playlist_item_body(meeting.playlist, video.id))
+    membership = get_membership()
+    executor.add(request, logged("Add video %s %s into playlist %s" % (
+        video.id, new_title, meeting.playlist),
+        membership.inserted(meeting.playlist, video.id, new_title, done), video=video.id, action='insert'),
+        after=update)
+    if batch is None:
+        executor.execute()
+
+def remove_unprocessed(youtube, videos):
+    """Delete the playlist items of videos from the unprocessed playlist, in
+    batches. Only call it once the listing of the playlist is done: the page
+    tokens are offsets, every delete moves the later videos one place up."""
+    batch = BatchExecutor(youtube)
+    membership = get_membership()
+    for video in videos:
+        request = youtube.playlistItems().delete(id=video.itemId)
+        batch.add(request, logged("Removed video %s from unprocessed playlist" % video.id,
+                                  membership.deleted(video.itemId), video=video.id, action='delete'))
+    return len(videos) - batch.execute()
+
+async def process_video_async(video, meeting, youtube, done=None):
+    """process_video() on an AsyncYouTube: the same two requests, the insert
+    sent once the update succeeded. done(response, exception) is called for
+    every outcome, on an executor thread since it may write the journal."""
+    new_title, body = processed_video_body(video, meeting)
+    membership = get_membership()
+    step = "Updated video %s %s" % (video.id, new_title)
+    action = 'update'
+    failure = None
+    try:
+        start = time.perf_counter()
+        await youtube.videos_update(body)
+        log(step, video=video.id, action=action, latency=time.perf_counter() - start)
+        step = "Add video %s %s into playlist %s" % (video.id, new_title, meeting.playlist)
+        action = 'insert'
+        start = time.perf_counter()
+        response = await youtube.playlist_items_insert(playlist_item_body(meeting.playlist, video.id))
+        membership.add(meeting.playlist, video.id, response['id'], new_title)
+        log(step, video=video.id, action=action, latency=time.perf_counter() - start)
+    except Exception as error:
+        # transport errors too: the videos after this one are only recorded
+        # once this one is done
+        log('FAILED %s: %s' % (step, error), video=video.id, action=action)
+        failure = error
+    if done:
+        await asyncio.get_running_loop().run_in_executor(None, done, None, failure)
+
+def process_unmatched_video(youtube, video, batch=None):
+    fetch_descriptions(youtube, [video])
+    new_desc = '''###YJv1:video does not match any meeting###\n%s''' % (video.desc)
+    executor = batch or BatchExecutor(youtube)
     request = youtube.videos().update(
         part='snippet',
         body={
-            'id': video['id'],
+            'id': video.id,
             'snippet': {
-                'title': video['title'],
+                'title': video.title,
                 'description': new_desc,
                 'categoryId': 22
             }
         }
     )
-    request.execute()
-    log('Updated unmatched video %s description' % video["id"])
+    update = executor.add(request, logged('Updated unmatched video %s description' % video.id,
+                                           video=video.id, action='update'))
     request = youtube.playlistItems().insert(
         part="snippet",
         body={
@@ -208,16 +273,23 @@ def process_unmatched_video(youtube, video):
                 "playlistId": error_processing_playlist,
                 "resourceId": {
                     "kind": "youtube#video",
-                    "videoId": video['id']
+                    "videoId": video.id
                 }
             }
         }
     )
-    request.execute()
-    log('Added video %s to error processing playlist' % video['id'])
-    request = youtube.playlistItems().delete(id=video['itemId'])
-    request.execute()
-    log('Removed video %s from unprocessed playlist' % video['id'])
+    membership = get_membership()
+    insert = executor.add(request, logged('Added video %s to error processing playlist' % video.id,
+                                          membership.inserted(error_processing_playlist, video.id,
+                                                              video.title),
+                                          video=video.id, action='insert'),
+                          after=update)
+    request = youtube.playlistItems().delete(id=video.itemId)
+    executor.add(request, logged('Removed video %s from unprocessed playlist' % video.id,
+                                 membership.deleted(video.itemId), video=video.id, action='delete'),
+                 after=insert)
+    if batch is None:
+        executor.execute()
 
 def make_playlist(youtube, tlclass):
     title = tlclass.className + ' | ' + tlclass.teacherName
@@ -237,87 +309,197 @@ def make_playlist(youtube, tlclass):
             }
         }
     )
-    response = request.execute()
+    response = execute(request)
     log("Created a new playlist %s : %s" % (response['id'], title))
     return response['id']
 
-def dry_run(youtube, playlistDB, meetingDB, processLimit, minutesAllow=15):
-    unprocessed_videos = get_unprocessed_videos(youtube, playlistDB, meetingDB, processLimit)
-
+def dry_run(youtube, playlistDB, meetingDB, processLimit):
+    count_scanned = 0
     count_matched = 0
     count_valid = 0
-    for video in unprocessed_videos:
-        meeting = meetingDB.match(video['title'], minutesAllow)
-        if meeting:
+    matches = iter_unprocessed_matches(youtube, playlistDB, meetingDB)
+    for match in matches:
+        video = match.video
+        count_scanned += 1
+        if match.status == AMBIGUOUS:
+            print('Ambiguous: %s matches %d meetings, using the closest one' %
+                  (video.title, match.candidates))
+        if match.meeting:
             count_matched += 1
-            playlist = playlistDB.getPlaylistId(meeting.classId, meeting.teacherName)
-            if playlist:
+            if match.eligible:
                 count_valid += 1
-                print('Match with Playlist: %s %s %s' % (video['title'], video['id'], meeting.classId))
+                print('Match with Playlist: %s %s %s' % (video.title, video.id, match.meeting.classId))
             else:
-                print('Match without Playlist: %s %s %s' % (video['title'], video['id'], meeting.classId))
+                print('Match without Playlist: %s %s %s' % (video.title, video.id, match.meeting.classId))
         else:
-            print('NOT FOUND: %s %s' % (video['title'], video['id']))
+            print('NOT FOUND: %s %s' % (video.title, video.id))
+        if count_valid >= processLimit:
+            matches.close()
+            break
 
-    print("%d matched out of %d unprocessed" % (count_matched, len(unprocessed_videos)))
+    print("%d matched out of %d unprocessed" % (count_matched, count_scanned))
     print("%d videos are eligible for processing" % count_valid)
 
 
+def process_video_job(youtube, video, meeting, done):
+    """Worker side of run_main: process one video on the thread's own Resource."""
+    try:
+        process_video(video, meeting, youtube, done=done)
+    except Exception as error:
+        done(None, error)
+        raise
+
+
+async def run_async(jobs, credentials, concurrency, base_url=None):
+    """Process the (video, meeting, done) jobs on one event loop, up to
+    concurrency videos at a time. jobs is iterated on a thread, it may block
+    on the listing."""
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def job(video, meeting, done):
+        try:
+            await process_video_async(video, meeting, youtube, done)
+        finally:
+            slots.release()
+
+    # a video has one request in flight at a time
+    async with AsyncYouTube(credentials, base_url or DEFAULT_BASE_URL,
+                            maxInFlight=concurrency) as youtube:
+        while True:
+            item = await loop.run_in_executor(None, next, jobs, None)
+            if item is None:
+                break
+            await slots.acquire()
+            task = asyncio.create_task(job(*item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        # like run_workers(): wait for every video, then raise the first error
+        errors = [result for result in await asyncio.gather(*tasks, return_exceptions=True)
+                  if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+
 def run_main(parser, options, args, output=sys.stdout):
     """Run the main scripts from the parsed options/args."""
-    youtube = get_youtube_handler(options)
-    if not youtube:
+    credentials = get_youtube_credentials(options)
+    if not credentials:
         raise AuthenticationError("Cannot get youtube resource")
+    youtube = auth.build_resource(credentials, options.api_base_url)
+    get_list_cache().bypass = bool(options.no_list_cache)
 
     meeting_csv_file = options.meeting_csv or 'data/meetings.csv'
-    playlistDB = PlaylistDB(meeting_csv_file)
-    meetingDB = MeetingDB(meeting_csv_file)
     processedCSV = options.processed_csv or 'data/processed.csv'
+    store = None
+    if options.metadata_db:
+        store = MetadataStore(options.metadata_db)
+        store.import_processed(processedCSV)
+        playlistDB = SqlPlaylistDB(meeting_csv_file, store)
+        meetingDB = SqlMeetingDB(meeting_csv_file, store)
+    else:
+        playlistDB = PlaylistDB(meeting_csv_file)
+        meetingDB = MeetingDB(meeting_csv_file)
 
     process_limit = options.process_limit or 60
+    workers = options.workers or 1
 
     if not options.dry_run_off:
         dry_run(youtube, playlistDB, meetingDB, process_limit)
         return
     
-    unprocessed_videos = get_unprocessed_videos(youtube, playlistDB, meetingDB, process_limit)
-    youtube_points = 1
-    v_processed = 0
+    ledger = get_ledger()
+    spent_before = ledger.spent()
     skip_processed = 0
-
-    for video in unprocessed_videos:
-        if v_processed >= process_limit:
-            log('Reached video processing limit of %d' % process_limit)
-            break
-        meeting = meetingDB.match(video['title'], 20)
-        if meeting is None:
-            log("Meeting not found: " + video['title'])            
-            skip_processed += 1
-            continue
-
-        meeting.playlist = playlistDB.getPlaylistId(meeting.classId, meeting.teacherName)
-        if not meeting.playlist:
-            log("Playlist not created yet: " + video['title'])
-            continue
-        
-        process_video(video, meeting, youtube)
+    syncEvery = SYNC_EVERY if options.journal_sync_every is None else options.journal_sync_every
+    # videos of the journal still in Unprocessed were processed by a run that
+    # stopped before removing them
+    processed = load_journal(processedCSV)
+    journal = ProcessedJournal(processedCSV, syncEvery)
+    # removed from Unprocessed only after the listing, see remove_unprocessed()
+    to_remove = []
+
+    def record(item):
+        video, meeting = item
         if not meeting.youtubeURL:
-            meeting.youtubeURL = f'https://youtube.com/watch?v={video["id"]}'
+            meeting.youtubeURL = f'https://youtube.com/watch?v={video.id}'
         else:
-            meeting.youtubeURL = meeting.youtubeURL + f'https://youtube.com/watch?v={video["id"]}'
-        v_processed += 1
-        appendProcessedVideo(processedCSV, meeting=meeting, videoId=video["id"])
-        
-        youtube_points += 160
-        if youtube_points > DAILY_THRESHOLD:
-            print('Videos processed: ' + str(v_processed))
-            print('Skip processed: ' + str(skip_processed))
-            print("Reached daily youtube points threshold: %d" % youtube_points)
-            break
+            meeting.youtubeURL = meeting.youtubeURL + f'https://youtube.com/watch?v={video.id}'
+        journal.append(meeting, video.id)
+        if store:
+            store.add_processed(meeting, video.id)
+        to_remove.append(video)
+
+    coordinator = Coordinator(record, threshold=ledger.remaining())
+
+    def eligible_jobs():
+        """The jobs of the eligible videos, yielded as soon as they are matched
+        while the next pages are listed in the background."""
+        nonlocal skip_processed
+        count = 0
+        # the listing thread gets a Resource of its own
+        listing = auth.build_resource(credentials, options.api_base_url)
+        matches = iter_unprocessed_matches(listing, playlistDB, meetingDB)
+        try:
+            for match in matches:
+                video = match.video
+                if video.id in processed:
+                    log('Already processed: %s' % video.title, video=video.id)
+                    if coordinator.charge(cost('youtube.playlistItems.delete')):
+                        to_remove.append(video)
+                    continue
+                if not match.eligible:
+                    log('%s: %s' % (match.skip.capitalize(), video.title))
+                    if match.skip == NO_MEETING:
+                        skip_processed += 1
+                    continue
+
+                if not coordinator.charge(VIDEO_COST):
+                    print("Not enough daily youtube quota left for more videos")
+                    break
+                yield (video, match.meeting, coordinator.submit((video, match.meeting)))
+                count += 1
+                if count >= process_limit:
+                    # no more pages are listed from here on
+                    log('Reached video processing limit of %d' % process_limit)
+                    break
+        finally:
+            matches.close()
 
-    print('Videos processed: ' + str(v_processed))
+    try:
+        if options.async_client:
+            asyncio.run(run_async(eligible_jobs(), credentials, options.async_client,
+                                  options.api_base_url))
+        elif workers > 1:
+            # a Resource per thread, the updates of a video stay in order on one thread
+            run_workers(eligible_jobs(), lambda: auth.build_resource(credentials, options.api_base_url),
+                        workers, process_video_job)
+        else:
+            batch = BatchExecutor(youtube)
+            queued = 0
+            for video, meeting, done in eligible_jobs():
+                process_video(video, meeting, youtube, batch, done)
+                queued += 1
+                # send every full batch right away instead of after the listing
+                if queued == batch.batchSize:
+                    batch.execute()
+                    queued = 0
+            batch.execute()
+            print('HTTP requests for the writes: %d' % batch.httpCalls)
+    finally:
+        # the records still buffered, also when the run stops on an error
+        journal.close()
+    # the listing is done, deleting no longer shifts the pages still to list
+    removed = remove_unprocessed(youtube, to_remove)
+
+    if coordinator.failed:
+        print('Videos failed: %d' % coordinator.failed)
+    print('Videos processed: ' + str(coordinator.succeeded))
     print('Skip processed: ' + str(skip_processed))
-    print('Used daily youtube points: %d' % youtube_points)
+    print('Removed from unprocessed playlist: %d of %d' % (removed, len(to_remove)))
+    print('Used daily youtube points: %d, %d left today' % (
+        ledger.spent() - spent_before, ledger.remaining()))
 
 
 def main(arguments):
@@ -331,24 +513,45 @@ def main(arguments):
                       type="string", help='Credentials JSON file')
     parser.add_option('', '--auth-browser', dest='auth_browser', action='store_true',
                       help='Open a GUI browser to authenticate if required')
+    parser.add_option('', '--api_base_url', dest='api_base_url', type='string',
+                      help='Send the API requests to this stand-in server, e.g. http://127.0.0.1:8765')
 
     # Business specific flags
     parser.add_option('', '--meeting_csv', dest='meeting_csv',
                       type="string", help='path to the csv file of meetingDB')
     parser.add_option('', '--processed_csv', dest='processed_csv',
                       type='string', help='path to the csv file for processed vidoes')
+    parser.add_option('', '--metadata_db', dest='metadata_db', type='string',
+                      help='Match against the SQLite metadata store at this path, '
+                           'e.g. data/metadata.sqlite, importing the CSV when it changed')
     parser.add_option('', '--dry_run_off', dest='dry_run_off', action='store_true',
                       help='Turns off dry run mode')
     parser.add_option('', '--process_limit', dest='process_limit',
                       type='int', help='Limit the maximum number of videos to process')
+    parser.add_option('', '--workers', dest='workers', type='int',
+                      help='Number of threads processing videos concurrently (default 1, batched)')
+    parser.add_option('', '--async', dest='async_client', type='int',
+                      help='Process this many videos concurrently on one asyncio event loop')
+
+    parser.add_option('', '--no_list_cache', dest='no_list_cache', action='store_true',
+                      help='List playlists without the local ETag cache')
+    parser.add_option('', '--journal_sync_every', dest='journal_sync_every', type='int',
+                      help='Write and fsync the processed journal every N videos '
+                           '(default %d, 0 only at the end)' % SYNC_EVERY)
 
     options, args = parser.parse_args(arguments)
 
     try:
         run_main(parser, options, args)
+    except QuotaExceeded as error:
+        log('Out of daily youtube quota: %s' % error)
     except googleapiclient.errors.HttpError as error:
         response = bytes.decode(error.content).strip()
         raise RequestError(u"Server response: {0}".format(response))
+    finally:
+        report = get_caller().report()
+        if report:
+            log('YouTube API calls:\n%s' % report)
 
 
 if __name__ == '__main__':
@@ -12,17 +12,21 @@
 # If there is any changes, you write to XXX.v001.json
 # If you make another change, you write to XXX.v002.json
 # In the end, if everything goes well, you write back to XXX.json. Then remove the temp files.
+#
+# thinkland/versioned_json.py implements this; add_playlist() uses it.
 
 import os
 import csv
 import json
 import argparse
 import sys
-from thinkland.classes import Meeting
-from datetime import datetime
+import atexit
+from thinkland.meeting import Meeting
 from datetime import timedelta
 from zoneinfo import ZoneInfo
 from thinkland.zoom_canonicalize import get_canonical_zoom_id
+from thinkland.tz_offsets import get_offset_table
+from thinkland.versioned_json import VersionedJson
 
 playlist_file_path = 'data/playlist.json'
 playlist_holder_file_path = 'data/playlist_copy.json'
@@ -50,25 +54,10 @@ def load_meetings_from_json_file(jsonFilePath):
     ret = list()
     with open(jsonFilePath, mode='r') as fileIn:
         reader = json.load(fileIn)
+        offsets = get_offset_table(ZoneInfo('US/Eastern'))
         for curMeeting in reader:
-            dateSections = reader[curMeeting]['date'].split('-')
-            year = int(dateSections[0])
-            month = int(dateSections[1])
-            day = int(dateSections[2])
-            tzone = ZoneInfo('US/Eastern')
-            # meetingDate = datetime(year, month, day, tzinfo=tzone)
-
-            sTimeSections = reader[curMeeting]['stime'].split(':')
-            shour = int(sTimeSections[0])
-            smin = int(sTimeSections[1])
-            ssec = int(sTimeSections[2])
-            stime = datetime(year, month, day, shour, smin, ssec, tzinfo=tzone)
-
-            eTimeSections = reader[curMeeting]['etime'].split(':')
-            ehour = int(eTimeSections[0])
-            emin = int(eTimeSections[1])
-            esec = int(eTimeSections[2])
-            etime = datetime(year, month, day, ehour, emin, esec, tzinfo=tzone)
+            stime = offsets.parse_local(reader[curMeeting]['date'], reader[curMeeting]['stime'])
+            etime = offsets.parse_local(reader[curMeeting]['date'], reader[curMeeting]['etime'])
 
             thisMeeting = Meeting(stime, etime, reader[curMeeting]['className'],
                 reader[curMeeting]['classId'], reader[curMeeting]['teacher'],
@@ -103,14 +92,19 @@ def get_classes_without_playlist():
                 ret.append(possible)
     return ret
 
+_playlists = None
+
+def get_playlists():
+    '''The VersionedJson of playlist_holder_file_path, compacted when the process exits.'''
+    global _playlists
+    if _playlists is None:
+        _playlists = VersionedJson(playlist_holder_file_path)
+        atexit.register(_playlists.close)
+    return _playlists
+
 def add_playlist(classId, playlistId):
-    '''TODO: Implement temp files (playlist_temp/001.json, playlist_temp/002.json, etc)'''
-    read_file_path = playlist_holder_file_path
-    with open(read_file_path, mode='r') as file_in:
-        edit = json.load(file_in)
-        edit[classId] = playlistId
-        with open(playlist_holder_file_path, mode='w') as file_out:
-            json.dump(edit, file_out, indent=4)
+    '''Record the playlist of a class as one delta file, not a rewrite of the whole JSON.'''
+    get_playlists().set(classId, playlistId)
 
 
 if __name__ == '__main__':
@@ -22,6 +22,17 @@ from auth import lib
 
 from thinkland import classes
 from thinkland.classes import log
+from thinkland.youtube_batch import BatchExecutor
+from thinkland.youtube_batch import logged
+from thinkland.quota import QuotaExceeded
+from thinkland.quota import cost
+from thinkland.quota import get_ledger
+from thinkland.api_calls import get_caller
+from thinkland.list_cache import get_list_cache
+from thinkland.playlist_items import decode_items
+from thinkland.playlist_items import fetch_descriptions
+from thinkland.playlist_items import list_request
+from thinkland.membership import get_membership
 
 
 unprocessed_playlist = 'PLzr1p9rMdhyAPAN1c6O-AeoJPUk4LkQj2'
@@ -30,7 +41,9 @@ error_processing_playlist = 'PLzr1p9rMdhyCZ-wxUPEUy7plgIWP_l-cI'
 #unprocessed_playlist = 'PLLoERmYbGOUn9r9pAke-3_pj-kEEj9cpl'
 #error_processing_playlist = 'PLLoERmYbGOUkL5PX69LpM4bUiMYjhzOk2'
 
-DAILY_THRESHOLD = 5999 # 9000
+# quota units of the update, insert and delete of one video
+VIDEO_COST = (cost('youtube.videos.update') + cost('youtube.playlistItems.insert') +
+              cost('youtube.playlistItems.delete'))
 
 class AuthenticationError(Exception): pass
 
@@ -47,104 +60,47 @@ def get_youtube_handler(options):
     get_code_callback = (auth.browser.get_code
                          if options.auth_browser else auth.console.get_code)
     return auth.get_resource(client_secrets, credentials,
-                             get_code_callback=get_code_callback)
+                             get_code_callback=get_code_callback,
+                             base_url=options.api_base_url)
 
 def get_some_error_processing_videos(youtube):
     """Try to retrieve some unprocessed videos.
     
     Returns a list of (video_id, title, playlist_item_id) tuples.
     EDIT: {'id': video_id, 'title': video_title, 'desc': video_description, 'itemId': playlist_item_id} dict
+    EDIT: PlaylistItem records, with the descriptions
     
     Because of the Youtube API quota. We need to limit to process up to N videos
     a day. N is set by flag (default = 10)
     """
-    request = youtube.playlistItems().list(
-        part='snippet,contentDetails',
-        maxResults=25, # TODO: Change maxResults to flag
-        playlistId=error_processing_playlist
-    )
-    pl_items_list = request.execute()
-    ret = list()
-    for item in pl_items_list['items']:
-        ret.append(
-            {
-                'id': item['contentDetails']['videoId'],
-                'title': item['snippet']['title'],
-                'desc': item['snippet']['description'],
-                'itemId': item['id']
-            }
-        )
-    return ret
-    """Take a video, which is a (video_id, title, playlist_item_id) tuple.
-    Extracts the canonical zoom account from title.
-    Extracts GMT date time from title. EDIT: GMT date from meetingdb, meeting is pre-input
-    Try to match to a meeting.
-    If the meeting has not an associated video, call Youtube API to update the title and description
-    of this video.
-    Add the video into its destination playlist.
-    Remove this video from the unprocessed playlist by the given playlist_item_id.
-    Set the video_id back to the meetingsDB.
-    """
-    can_zid = video['title'].split(' ')[0]  # better to get it from meeting object
-    recording_start = meeting.startTime
-    # new_title = meeting.className + ' ' + meeting.teacherName + ' ' + str(recording_start)
-    # if "gallery" in video['title']:
-    #     new_title = new_title + " Gallery"
+    request = list_request(youtube, error_processing_playlist,
+                           maxResults=25) # TODO: Change maxResults to flag
+    pl_items_list = get_list_cache().execute(request)
+    # rolling back rewrites every description
+    return fetch_descriptions(youtube, decode_items(pl_items_list))
 
-    # new_desc = '###' + can_zid + '|' + meeting.classId + '|' + str(recording_start) + '|' + meeting.teacherName + '|' + meeting.className + '###\n###YJv1###\n' + video['title']
-    request = youtube.videos().update(
-        part='snippet',
-        body={
-            'id': video['id'],
-            'snippet': {
-                'description': '',
-                'title': video['title'],
-                'categoryId': 22
-            }
-        }
-    )
-    request.execute()
-    log("Updated video %s %s" % (video['id'], new_title))
 
-    request = youtube.playlistItems().insert(
-        part='snippet',
-        body={
-            'snippet': {
-                'playlistId': meeting.playlist,
-                'resourceId': {
-                'kind': 'youtube#video',
-                'videoId': video['id']
-                }
-            }
-        }
-    )
-    request.execute()
-    log("Add video %s %s into playlist %s" % (video['id'], new_title, meeting.playlist))
-
-    request = youtube.playlistItems().delete(id=video['itemId'])
-    request.execute()
-    log("Removed video %s from unprocessed playlist" % video['id'])
-
-def process_video(youtube, video):
+def process_video(youtube, video, batch=None, done=None):
     # first, remove the first line of the description
-    desc = video['desc'].split('\n')
-    new_desc = video['desc']
+    desc = video.desc.split('\n')
+    new_desc = video.desc
     if len(desc) > 0:
         new_desc = '\n'.join(desc[1:])
 
+    executor = batch or BatchExecutor(youtube)
     request = youtube.videos().update(
         part='snippet',
         body={
-            'id': video['id'],
+            'id': video.id,
             'snippet': {
-                'title': video['title'],
+                'title': video.title,
                 'description': new_desc,
                 'categoryId': 22
             }
         }
     )
-    request.execute()
-    log('Updated video %s description' % video["id"])
+    update = executor.add(request, logged('Updated video %s description' % video.id,
+                                           video=video.id, action='update'))
     request = youtube.playlistItems().insert(
         part="snippet",
         body={
@@ -152,16 +108,23 @@ def process_video(youtube, video):
                 "playlistId": unprocessed_playlist,
                 "resourceId": {
                     "kind": "youtube#video",
-                    "videoId": video['id']
+                    "videoId": video.id
                 }
             }
         }
     )
-    request.execute()
-    log('Added video %s to unprocessing playlist' % video['id'])
-    request = youtube.playlistItems().delete(id=video['itemId'])
-    request.execute()
-    log('Removed video %s from error-processing playlist' % video['id'])
+    membership = get_membership()
+    insert = executor.add(request, logged('Added video %s to unprocessing playlist' % video.id,
+                                          membership.inserted(unprocessed_playlist, video.id,
+                                                              video.title),
+                                          video=video.id, action='insert'),
+                          after=update)
+    request = youtube.playlistItems().delete(id=video.itemId)
+    executor.add(request, logged('Removed video %s from error-processing playlist' % video.id,
+                                 membership.deleted(video.itemId, done), video=video.id, action='delete'),
+                 after=insert)
+    if batch is None:
+        executor.execute()
 
 
 
@@ -170,23 +133,33 @@ def run_main(parser, options, args, output=sys.stdout):
     youtube = get_youtube_handler(options)
     if not youtube:
         raise AuthenticationError("Cannot get youtube resource")
+    get_list_cache().bypass = bool(options.no_list_cache)
     
+    ledger = get_ledger()
+    spent_before = ledger.spent()
     unprocessed_videos = get_some_error_processing_videos(youtube)
-    youtube_points = 1
+    budget = ledger.remaining()
     v_processed = 0
+    batch = BatchExecutor(youtube)
+
+    def done(response, exception):
+        nonlocal v_processed
+        if exception is None:
+            v_processed += 1
 
     for video in unprocessed_videos:
-        process_video(youtube, video)
-        
-        v_processed += 1
-        youtube_points += 160
-        if youtube_points > DAILY_THRESHOLD:
-            print('Videos processed: ' + str(v_processed))
-            print("Reached daily youtube points threshold: %d" % youtube_points)
+        if budget < VIDEO_COST:
+            print("Not enough daily youtube quota left for more videos")
             break
+        process_video(youtube, video, batch, done)
+        budget -= VIDEO_COST
 
+    failures = batch.execute()
+    if failures:
+        print('Failed or skipped requests: %d' % failures)
     print('Videos processed: ' + str(v_processed))
-    print('Used daily youtube points: %d' % youtube_points)
+    print('Used daily youtube points: %d, %d left today' % (
+        ledger.spent() - spent_before, ledger.remaining()))
 
 
 def main(arguments):
@@ -200,6 +173,8 @@ def main(arguments):
                       type="string", help='Credentials JSON file')
     parser.add_option('', '--auth-browser', dest='auth_browser', action='store_true',
                       help='Open a GUI browser to authenticate if required')
+    parser.add_option('', '--api_base_url', dest='api_base_url', type='string',
+                      help='Send the API requests to this stand-in server, e.g. http://127.0.0.1:8765')
 
     # Business specific flags
     parser.add_option('', '--meeting_json', dest='meeting_json',
@@ -207,13 +182,22 @@ def main(arguments):
     parser.add_option('', '--playlist_json', dest = 'playlist_json',
                       type='string', help='path to the json file of playlistDB')
 
+    parser.add_option('', '--no_list_cache', dest='no_list_cache', action='store_true',
+                      help='List playlists without the local ETag cache')
+
     options, args = parser.parse_args(arguments)
 
     try:
         run_main(parser, options, args)
+    except QuotaExceeded as error:
+        log('Out of daily youtube quota: %s' % error)
     except googleapiclient.errors.HttpError as error:
         response = bytes.decode(error.content).strip()
         raise RequestError(u"Server response: {0}".format(response))
+    finally:
+        report = get_caller().report()
+        if report:
+            log('YouTube API calls:\n%s' % report)
 
 
 if __name__ == '__main__':
@@ -18,9 +18,10 @@
 import os
 import sys
 import optparse
-# import json
+import json
 from io import open
 import csv
+import re
 import time
 
 import googleapiclient.errors
@@ -28,8 +29,14 @@ import googleapiclient.errors
 import auth
 from auth import lib
 
-from thinkland import classes
 from thinkland.classes import log
+from thinkland.quota import QuotaExceeded
+from thinkland.quota import get_ledger
+from thinkland.api_calls import execute
+from thinkland.api_calls import get_caller
+from thinkland.processed_journal import Journal
+from thinkland.processed_journal import load_rows
+from thinkland.versioned_json import write_atomic
 
 
 unprocessed_playlist = 'PLzr1p9rMdhyAPAN1c6O-AeoJPUk4LkQj2'
@@ -38,7 +45,11 @@ error_processing_playlist = 'PLzr1p9rMdhyCZ-wxUPEUy7plgIWP_l-cI'
 #unprocessed_playlist = 'PLLoERmYbGOUn9r9pAke-3_pj-kEEj9cpl'
 #error_processing_playlist = 'PLLoERmYbGOUkL5PX69LpM4bUiMYjhzOk2'
 
-DAILY_THRESHOLD = 5999 # 9000
+# description of the playlists we create, found again after a restart
+PLAYLIST_MARKER = '###YJv1:%s###'
+PLAYLIST_MARKER_RE = re.compile(r'###YJv1:(.*?)###')
+
+PLAYLIST_FIELDS = 'items(id,snippet/description),nextPageToken'
 
 class AuthenticationError(Exception): pass
 
@@ -55,11 +66,12 @@ def get_youtube_handler(options):
     get_code_callback = (auth.browser.get_code
                          if options.auth_browser else auth.console.get_code)
     return auth.get_resource(client_secrets, credentials,
-                             get_code_callback=get_code_callback)
+                             get_code_callback=get_code_callback,
+                             base_url=options.api_base_url)
 
 def make_playlist(youtube, plist_info, classId):
     title = plist_info['Playlist Title']
-    desc = """###YJv1:%s###""" % (classId)
+    desc = PLAYLIST_MARKER % classId
 
     request = youtube.playlists().insert(
         part='snippet,status',
@@ -75,11 +87,47 @@ def make_playlist(youtube, plist_info, classId):
             }
         }
     )
-    response = request.execute()
+    response = execute(request)
     log("Created a new playlist %s : %s" % (response['id'], title))
     return response['id']
 
 
+def find_created_playlists(youtube):
+    """classId => id of the playlists make_playlist() created on the channel,
+    found by the marker in their description."""
+    found = {}
+    pageToken = ''
+    while True:
+        response = execute(youtube.playlists().list(
+            part='snippet', mine=True, maxResults=50, pageToken=pageToken,
+            fields=PLAYLIST_FIELDS))
+        for item in response.get('items', []):
+            match = PLAYLIST_MARKER_RE.search(item['snippet'].get('description', ''))
+            if match:
+                found.setdefault(match.group(1), item['id'])
+        pageToken = response.get('nextPageToken')
+        if not pageToken:
+            return found
+
+
+def set_playlist_id(playlists, classId, pl_id):
+    playlists[classId] = dict(playlists[classId], **{'Playlist ID': pl_id})
+
+
+def adopt_created(youtube, playlists, journal):
+    """After a run that did not finish, record the playlists it created but
+    did not journal, so they are not created twice. Returns how many."""
+    created = find_created_playlists(youtube)
+    adopted = 0
+    for classId, info in playlists.items():
+        if info['Playlist ID'] is None and classId in created:
+            set_playlist_id(playlists, classId, created[classId])
+            journal.append_row([classId, created[classId]])
+            log('Found playlist %s created for class %s before the restart' % (created[classId], classId))
+            adopted += 1
+    return adopted
+
+
 def run_main(parser, options, args, output=sys.stdout):
     """Run the main scripts from the parsed options/args."""
     youtube = get_youtube_handler(options)
@@ -87,27 +135,52 @@ def run_main(parser, options, args, output=sys.stdout):
         raise AuthenticationError("Cannot get youtube resource")
 
     playlist_json_file = options.playlist_json or 'data/playlist.json'
-    playlistDB = classes.PlaylistDB(playlist_json_file)
-
-    quota_usage = 0
+    with open(playlist_json_file, mode='r', encoding='utf-8') as file_in:
+        playlists = json.load(file_in)
+
+    # every created playlist is appended and fsync'ed to
+    # data/playlist.journal.csv as <crc32>,<class id>,<playlist id> and the
+    # journal is folded into the JSON once the run finishes. A journal left
+    # behind means the last run did not finish: replay it, then look for a
+    # playlist created between its last insert and journal write.
+    journal_file = os.path.splitext(playlist_json_file)[0] + '.journal.csv'
+    resumed = os.path.exists(journal_file)
+    if resumed:
+        rows, corrupt = load_rows(journal_file)
+        for classId, pl_id in rows:
+            if classId in playlists:
+                set_playlist_id(playlists, classId, pl_id)
+        log('Resuming from %d journal records of %s, %d damaged' % (len(rows), journal_file, corrupt))
+    # synced before the next insert: a crash loses no created playlist id
+    journal = Journal(journal_file, syncEvery=1)
+
+    ledger = get_ledger()
     playlists_made = 0
     playlists_skipped = 0
     quota_exceeded = False
-    for classId in playlistDB.allPlaylists:
-        if playlistDB.getPlaylistId(classId) == None:
+    try:
+        if resumed:
+            adopt_created(youtube, playlists, journal)
+        for classId in list(playlists):
+            info = playlists[classId]
+            if info['Playlist ID'] is not None:
+                continue
+            if not quota_exceeded and not ledger.can_afford('youtube.playlists.insert'):
+                log('Reached daily limit')
+                quota_exceeded = True
             if not quota_exceeded:
                 time.sleep(0.5)
-                pl_id = make_playlist(youtube, playlistDB.allPlaylists[classId], classId)
-                quota_usage += 50
+                pl_id = make_playlist(youtube, info, classId)
                 playlists_made += 1
-                playlistDB.updatePlaylistId(classId, pl_id)
-                playlistDB.writeBack()
-                if quota_usage >= DAILY_THRESHOLD:
-                    log('Reached daily limit')
-                    quota_exceeded = True
+                set_playlist_id(playlists, classId, pl_id)
+                journal.append_row([classId, pl_id])
             else:
                 playlists_skipped += 1
+    finally:
+        journal.close()
 
+    write_atomic(playlist_json_file, playlists)
+    os.remove(journal_file)
 
     # print some summaries, e.g. how many new playlists are created
     # and how many more playlists need to be created next time with new Daily quota
@@ -128,6 +201,8 @@ def main(arguments):
                       type="string", help='Credentials JSON file')
     parser.add_option('', '--auth-browser', dest='auth_browser', action='store_true',
                       help='Open a GUI browser to authenticate if required')
+    parser.add_option('', '--api_base_url', dest='api_base_url', type='string',
+                      help='Send the API requests to this stand-in server, e.g. http://127.0.0.1:8765')
 
     # Business specific flags
     parser.add_option('', '--playlist_json', dest = 'playlist_json',
@@ -137,9 +212,15 @@ def main(arguments):
 
     try:
         run_main(parser, options, args)
+    except QuotaExceeded as error:
+        log('Out of daily youtube quota: %s' % error)
     except googleapiclient.errors.HttpError as error:
         response = bytes.decode(error.content).strip()
         raise RequestError(u"Server response: {0}".format(response))
+    finally:
+        report = get_caller().report()
+        if report:
+            log('YouTube API calls:\n%s' % report)
 
 
 if __name__ == '__main__':
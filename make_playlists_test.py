@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import fake_youtube
+from thinkland.processed_journal import load_rows
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# make_playlists.main() against the fake server, killed right after the
+# insert number KILL_AFTER returned and before its id is journaled
+CHILD = '''
+import os
+import sys
+import make_playlists
+
+make_playlists.time.sleep = lambda seconds: None
+killAfter = int(sys.argv[1])
+inserts = []
+make_playlist = make_playlists.make_playlist
+
+def killed(youtube, info, classId):
+    playlistId = make_playlist(youtube, info, classId)
+    inserts.append(playlistId)
+    if len(inserts) == killAfter:
+        os._exit(3)
+    return playlistId
+
+make_playlists.make_playlist = killed
+make_playlists.main(sys.argv[2:])
+'''
+
+
+def run_child(directory, credentials, baseUrl, killAfter=0):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run(
+        [sys.executable, '-c', CHILD, str(killAfter),
+         '--client-secrets', credentials[0], '--credentials-file', credentials[1],
+         '--api_base_url', baseUrl],
+        cwd=directory, env=env, capture_output=True, text=True).returncode
+
+
+def test_kill_between_insert_and_journal(tmp_path):
+    os.makedirs(tmp_path / 'data')
+    playlists = {str(classId): {'Playlist ID': None, 'Playlist Title': 'Class %d' % classId,
+                                'Teacher Name': 'Teacher %d' % classId}
+                 for classId in range(10)}
+    (tmp_path / 'data' / 'playlist.json').write_text(json.dumps(playlists))
+    fake = fake_youtube.FakeYouTube()
+    server = fake_youtube.serve(fake)
+    try:
+        baseUrl = 'http://%s:%d' % server.server_address
+        credentials = fake_youtube.write_credentials(str(tmp_path), baseUrl)
+
+        assert run_child(tmp_path, credentials, baseUrl, killAfter=3) == 3
+        assert len(fake.playlists) == 3
+        # the first two are on disk, the third one only on the channel
+        rows, corrupt = load_rows(str(tmp_path / 'data' / 'playlist.journal.csv'))
+        assert corrupt == 0
+        assert [classId for classId, _ in rows] == ['0', '1']
+
+        assert run_child(tmp_path, credentials, baseUrl) == 0
+    finally:
+        server.shutdown()
+
+    assert not os.path.exists(tmp_path / 'data' / 'playlist.journal.csv')
+    result = json.loads((tmp_path / 'data' / 'playlist.json').read_text())
+    ids = [info['Playlist ID'] for info in result.values()]
+    # every class got exactly one playlist, the one of class 2 was adopted
+    assert fake.stats()['calls']['youtube.playlists.insert'] == 10
+    assert sorted(ids) == sorted(fake.playlists)
+    assert result['5']['Teacher Name'] == 'Teacher 5'
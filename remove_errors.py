@@ -16,9 +16,17 @@ from auth import lib
 
 # from thinkland import classes
 from thinkland.classes import log
-from thinkland.classes import appendProcessedVideo
 from thinkland.playlist import PlaylistDB
 from thinkland.meeting import MeetingDB
+from thinkland.zoom_title import parse_title
+from thinkland.quota import QuotaExceeded
+from thinkland.api_calls import execute
+from thinkland.api_calls import get_caller
+from thinkland.list_cache import get_list_cache
+from thinkland.playlist_items import decode_items
+from thinkland.playlist_items import fetch_descriptions
+from thinkland.playlist_items import list_request
+from thinkland.membership import get_membership
 
 unprocessed_playlist = 'PLzr1p9rMdhyAPAN1c6O-AeoJPUk4LkQj2'
 
@@ -40,7 +48,8 @@ def get_youtube_handler(options):
     get_code_callback = (auth.browser.get_code
                          if options.auth_browser else auth.console.get_code)
     return auth.get_resource(client_secrets, credentials,
-                             get_code_callback=get_code_callback)
+                             get_code_callback=get_code_callback,
+                             base_url=options.api_base_url)
 
 
 def get_unprocessed_videos(youtube, playlistDB, meetingDB, process_limit, minutesAllow=15):
@@ -51,24 +60,12 @@ def get_unprocessed_videos(youtube, playlistDB, meetingDB, process_limit, minute
     while eligible < process_limit:
         print("start Unprocessed Page %d" % page)
         page += 1
-        request = youtube.playlistItems().list(
-            part='snippet,contentDetails',
-            maxResults=UNPROCESSED_LIMIT,
-            pageToken=next_page_token,
-            playlistId=unprocessed_playlist
-        )
-        pl_items_list = request.execute()
+        request = list_request(youtube, unprocessed_playlist, next_page_token, UNPROCESSED_LIMIT)
+        pl_items_list = get_list_cache().execute(request)
 
         # print(json.dumps(pl_items_list, indent=4))
 
-        for item in pl_items_list['items']:
-            video = {
-                    'id': item['contentDetails']['videoId'],
-                    'title': item['snippet']['title'],
-                    'desc': item['snippet']['description'],
-                    'itemId': item['id']
-                }
-
+        for video in decode_items(pl_items_list):
             if errorVideo(video):
                 ret.append(video)
                 eligible += 1
@@ -79,15 +76,13 @@ def get_unprocessed_videos(youtube, playlistDB, meetingDB, process_limit, minute
             next_page_token = pl_items_list['nextPageToken']
         else:
             break
-    return ret
+    # the original title is the last line of the description
+    return fetch_descriptions(youtube, ret)
 
 
 def errorVideo(video):
-    sections = video['title'].split(' ')
-    if (len(sections) < 3 or len(sections[1]) < 11 or len(sections[2]) < 6 or
-            not sections[1][3:].isdigit() or not sections[2].isdigit()):
-        return True
-    return False
+    # strict: the file name layouts parse_title() also reads count as errors
+    return parse_title(video.title, strict=True) is None
 
 
 def dry_run(youtube, playlistDB, meetingDB, processLimit, minutesAllow=15):
@@ -98,8 +93,8 @@ def dry_run(youtube, playlistDB, meetingDB, processLimit, minutesAllow=15):
     for video in unprocessed_videos:
         if errorVideo(video):
             # TODO: print some error messages
-            print('Video title error: %s' % video['title'])
-            original_title = video["desc"].split("\n")[-1]
+            print('Video title error: %s' % video.title)
+            original_title = video.desc.split("\n")[-1]
             print("oritinal title: %s" % original_title)
             meeting = meetingDB.match(original_title, minutesAllow)
             if not meeting:
@@ -111,32 +106,11 @@ def dry_run(youtube, playlistDB, meetingDB, processLimit, minutesAllow=15):
                 print("not found playlist")
                 continue
 
-            next_page_token = ""
-            found = False
-            while not found:
-                request = youtube.playlistItems().list(
-                    part='snippet,contentDetails',
-                    maxResults=UNPROCESSED_LIMIT,
-                    pageToken=next_page_token,
-                    playlistId=playlist
-                )
-                pl_items_list = request.execute()
-
-                for item in pl_items_list['items']:
-                    if item['contentDetails']['videoId'] != video['id']:
-                        continue
-
-                    # request = youtube.playlistItems().delete(id=video['itemId'])
-                    # request.execute()
-                    # log('Removed video %s from unprocessed playlist' % video['id'])
-                    print("The video is already in the target playlist.")
-                    found = True
-                    break
-
-                if "nextPageToken" in pl_items_list:
-                    next_page_token = pl_items_list['nextPageToken']
-                else:
-                    break
+            if get_membership().is_member(youtube, playlist, video.id):
+                # request = youtube.playlistItems().delete(id=video.itemId)
+                # request.execute()
+                # log('Removed video %s from unprocessed playlist' % video.id)
+                print("The video is already in the target playlist.")
 
 
 
@@ -145,6 +119,7 @@ def run_main(parser, options, args, output=sys.stdout, minutesAllow=15):
     youtube = get_youtube_handler(options)
     if not youtube:
         raise AuthenticationError("Cannot get youtube resource")
+    get_list_cache().bypass = bool(options.no_list_cache)
 
     meeting_csv_file = options.meeting_csv or 'data/meetings.csv'
     playlistDB = PlaylistDB(meeting_csv_file)
@@ -165,8 +140,8 @@ def run_main(parser, options, args, output=sys.stdout, minutesAllow=15):
     for video in unprocessed_videos:
         if errorVideo(video):
             # TODO: print some error messages
-            print('Video title error: %s' % video['title'])
-            original_title = video["desc"].split("\n")[-1]
+            print('Video title error: %s' % video.title)
+            original_title = video.desc.split("\n")[-1]
             print("oritinal title: %s" % original_title)
             meeting = meetingDB.match(original_title, minutesAllow)
             if not meeting:
@@ -178,32 +153,13 @@ def run_main(parser, options, args, output=sys.stdout, minutesAllow=15):
                 print("not found playlist")
                 continue
 
-            next_page_token = ""
-            found = False
-            while not found:
-                request = youtube.playlistItems().list(
-                    part='snippet,contentDetails',
-                    maxResults=UNPROCESSED_LIMIT,
-                    pageToken=next_page_token,
-                    playlistId=playlist
-                )
-                pl_items_list = request.execute()
-
-                for item in pl_items_list['items']:
-                    if item['contentDetails']['videoId'] != video['id']:
-                        continue
-
-                    print("The video is already in the target playlist.")
-                    request = youtube.playlistItems().delete(id=video['itemId'])
-                    request.execute()
-                    log('Removed video %s from unprocessed playlist' % video['id'])
-                    found = True
-                    break
-
-                if "nextPageToken" in pl_items_list:
-                    next_page_token = pl_items_list['nextPageToken']
-                else:
-                    break
+            membership = get_membership()
+            if membership.is_member(youtube, playlist, video.id):
+                print("The video is already in the target playlist.")
+                request = youtube.playlistItems().delete(id=video.itemId)
+                execute(request)
+                membership.remove(video.itemId)
+                log('Removed video %s from unprocessed playlist' % video.id)
 
 
 def main(arguments):
@@ -217,6 +173,8 @@ def main(arguments):
                       type="string", help='Credentials JSON file')
     parser.add_option('', '--auth-browser', dest='auth_browser', action='store_true',
                       help='Open a GUI browser to authenticate if required')
+    parser.add_option('', '--api_base_url', dest='api_base_url', type='string',
+                      help='Send the API requests to this stand-in server, e.g. http://127.0.0.1:8765')
 
     # Business specific flags
     parser.add_option('', '--meeting_csv', dest='meeting_csv',
@@ -228,13 +186,22 @@ def main(arguments):
     parser.add_option('', '--process_limit', dest='process_limit',
                       type='int', help='Limit the maximum number of videos to process')
 
+    parser.add_option('', '--no_list_cache', dest='no_list_cache', action='store_true',
+                      help='List playlists without the local ETag cache')
+
     options, args = parser.parse_args(arguments)
 
     try:
         run_main(parser, options, args)
+    except QuotaExceeded as error:
+        log('Out of daily youtube quota: %s' % error)
     except googleapiclient.errors.HttpError as error:
         response = bytes.decode(error.content).strip()
         raise RequestError(u"Server response: {0}".format(response))
+    finally:
+        report = get_caller().report()
+        if report:
+            log('YouTube API calls:\n%s' % report)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,213 @@
+#
+# Shared execution of YouTube API requests: quota, rate limit, retries, stats.
+#
+# execute(request) is what the scripts call instead of request.execute():
+#
+#   1. charges the quota ledger
+#   2. waits for a token of the client side rate limiter (a token bucket)
+#   3. sends the request, retrying transient failures of idempotent requests
+#      (GET, PUT and DELETE; an insert is a POST and is never sent twice)
+#      after an exponential backoff with full jitter, or the Retry-After the
+#      server asked for
+#   4. records the latency and the retries per API method
+#
+# Errors are classified as QUOTA (out of daily quota: retrying only burns
+# more of it, so the ledger is marked used up and QuotaExceeded is raised),
+# TRANSIENT (5xx, 429, rate limit reasons, dropped connections) or FATAL.
+
+import json
+import random
+import socket
+import threading
+import time
+
+import googleapiclient.errors
+import httplib2
+
+from thinkland.quota import QuotaExceeded
+from thinkland.quota import get_ledger
+
+QUOTA = 'quota'
+TRANSIENT = 'transient'
+FATAL = 'fatal'
+
+IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+QUOTA_REASONS = ('quotaExceeded', 'dailyLimitExceeded')
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'backendError')
+TRANSPORT_ERRORS = (ConnectionError, socket.timeout, httplib2.ServerNotFoundError,
+                    httplib2.HttpLib2Error)
+
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 32.0
+# the API allows far more, this only smooths out bursts of the worker threads
+REQUESTS_PER_SECOND = 10.0
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, bursts of `capacity`."""
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take tokens, sleeping until they are available. Returns the wait."""
+        wait = self.reserve(tokens)
+        if wait:
+            self.sleep(wait)
+        return wait
+
+    def reserve(self, tokens=1):
+        """Take tokens without sleeping. Returns the seconds the caller has to
+        wait before using them, e.g. with asyncio.sleep()."""
+        tokens = min(tokens, self.capacity)
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class MethodStats:
+    __slots__ = ('calls', 'retries', 'failures', 'seconds', 'maxSeconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.maxSeconds = 0.0
+
+
+def error_reasons(error):
+    """The reasons listed in the JSON body of an HttpError."""
+    try:
+        body = json.loads(error.content.decode('utf-8'))
+        return [e.get('reason') for e in body['error'].get('errors', [])]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return []
+
+
+def classify(error):
+    """QUOTA, TRANSIENT or FATAL for an exception raised by a request."""
+    if isinstance(error, googleapiclient.errors.HttpError):
+        status = error.resp.status
+        reasons = error_reasons(error)
+        if any(reason in QUOTA_REASONS for reason in reasons):
+            return QUOTA
+        if status >= 500 or status == 429 or any(reason in RATE_LIMIT_REASONS for reason in reasons):
+            return TRANSIENT
+        return FATAL
+    if isinstance(error, TRANSPORT_ERRORS):
+        return TRANSIENT
+    return FATAL
+
+
+class ApiCaller:
+    def __init__(self, rate=REQUESTS_PER_SECOND, maxRetries=MAX_RETRIES, baseDelay=BASE_DELAY,
+                 maxDelay=MAX_DELAY, sleep=time.sleep):
+        self.bucket = TokenBucket(rate, sleep=sleep)
+        self.maxRetries = maxRetries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.sleep = sleep
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def execute(self, request, ledger=None):
+        """Charge, rate limit and send an HttpRequest, retrying when safe."""
+        (ledger or get_ledger()).charge(request)
+        return self.send(request)
+
+    def send(self, request):
+        """execute() for a request the ledger was already charged for."""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = request.execute()
+            except Exception as error:
+                status = getattr(getattr(error, 'resp', None), 'status', None)
+                # 304 is the answer ListCache hopes for, not a failure
+                self.record(request, time.perf_counter() - start, failed=status != 304)
+                if self.gone_already(request, error, attempt):
+                    return None
+                if not self.retryable(request, error, attempt):
+                    if classify(error) == QUOTA:
+                        raise self.quota_exceeded(error) from error
+                    raise
+                self.sleep(self.backoff(attempt, error))
+                attempt += 1
+                self.record(request, 0.0, retried=True)
+            else:
+                self.record(request, time.perf_counter() - start)
+                return response
+
+    def gone_already(self, request, error, attempt):
+        """A 404 for a DELETE that is being retried: an earlier attempt went
+        through after all."""
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+        return attempt > 0 and request.method == 'DELETE' and status == 404
+
+    def retryable(self, request, error, attempt):
+        return (attempt < self.maxRetries and request.method in IDEMPOTENT_METHODS and
+                classify(error) == TRANSIENT)
+
+    def quota_exceeded(self, error):
+        """The QuotaExceeded for a quota error of the API. The ledger counts
+        the day as used up from then on."""
+        get_ledger().exhaust()
+        return QuotaExceeded('the API reports the daily quota exceeded: %s' % error)
+
+    def backoff(self, attempt, error=None):
+        """Seconds to wait before retry number attempt + 1."""
+        resp = getattr(error, 'resp', None)
+        if resp is not None and resp.get('retry-after', '').isdigit():
+            return min(float(resp['retry-after']), self.maxDelay)
+        return random.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** attempt))
+
+    def record(self, request, seconds, retried=False, failed=False):
+        methodId = getattr(request, 'methodId', None) or 'unknown'
+        with self.lock:
+            stats = self.stats.setdefault(methodId, MethodStats())
+            if retried:
+                stats.retries += 1
+                return
+            stats.calls += 1
+            stats.failures += failed
+            stats.seconds += seconds
+            stats.maxSeconds = max(stats.maxSeconds, seconds)
+
+    def report(self):
+        """One line per API method: calls, retries, failures and latency."""
+        lines = []
+        with self.lock:
+            for methodId, stats in sorted(self.stats.items()):
+                lines.append('%-30s calls %5d  retries %4d  failures %4d  avg %6.0f ms  max %6.0f ms' % (
+                    methodId, stats.calls, stats.retries, stats.failures,
+                    1000 * stats.seconds / stats.calls if stats.calls else 0,
+                    1000 * stats.maxSeconds))
+        return '\n'.join(lines)
+
+
+_caller = None
+
+
+def get_caller():
+    """The shared ApiCaller of the process."""
+    global _caller
+    if _caller is None:
+        _caller = ApiCaller()
+    return _caller
+
+
+def execute(request):
+    """Execute an HttpRequest through the shared ApiCaller."""
+    return get_caller().execute(request)
@@ -0,0 +1,150 @@
+import json
+import socket
+
+import googleapiclient.errors
+import httplib2
+import pytest
+
+from thinkland import quota
+from thinkland.api_calls import FATAL
+from thinkland.api_calls import QUOTA
+from thinkland.api_calls import TRANSIENT
+from thinkland.api_calls import ApiCaller
+from thinkland.api_calls import TokenBucket
+from thinkland.api_calls import classify
+from thinkland.quota import QuotaExceeded
+from thinkland.quota import QuotaLedger
+
+
+def http_error(status, reason=None, headers=None):
+    body = {'error': {'code': status, 'errors': [{'reason': reason}] if reason else []}}
+    return googleapiclient.errors.HttpError(httplib2.Response(dict(headers or {}, status=status)),
+                                            json.dumps(body).encode('utf-8'))
+
+
+class FakeRequest:
+    """Raises the errors in turn, then returns the response."""
+    def __init__(self, method='GET', errors=(), methodId='youtube.playlistItems.list'):
+        self.method = method
+        self.methodId = methodId
+        self.errors = list(errors)
+        self.sent = 0
+
+    def execute(self):
+        self.sent += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'sent': self.sent}
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    ledger = QuotaLedger(str(tmp_path / 'quota.json'))
+    monkeypatch.setattr(quota, '_ledger', ledger)
+    return ledger
+
+
+def caller(sleeps, **kwargs):
+    return ApiCaller(rate=1000, sleep=sleeps.append, **kwargs)
+
+
+def test_classify():
+    assert classify(http_error(403, 'quotaExceeded')) == QUOTA
+    assert classify(http_error(403, 'dailyLimitExceeded')) == QUOTA
+    assert classify(http_error(403, 'rateLimitExceeded')) == TRANSIENT
+    assert classify(http_error(500)) == TRANSIENT
+    assert classify(http_error(503, 'backendError')) == TRANSIENT
+    assert classify(http_error(429)) == TRANSIENT
+    assert classify(ConnectionResetError()) == TRANSIENT
+    assert classify(socket.timeout()) == TRANSIENT
+    assert classify(http_error(403, 'forbidden')) == FATAL
+    assert classify(http_error(404, 'playlistItemNotFound')) == FATAL
+    assert classify(ValueError()) == FATAL
+    # a body that is not the JSON of an API error
+    error = googleapiclient.errors.HttpError(httplib2.Response({'status': 503}), b'<html>')
+    assert classify(error) == TRANSIENT
+
+
+def test_transient_errors_are_retried(ledger):
+    sleeps = []
+    request = FakeRequest(errors=[http_error(503), ConnectionResetError()])
+    assert caller(sleeps).execute(request) == {'sent': 3}
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+    # charged once, for the call the script made
+    assert ledger.spent() == 1
+
+
+def test_retry_after(ledger):
+    sleeps = []
+    request = FakeRequest('PUT', [http_error(429, headers={'retry-after': '7'}),
+                                  http_error(429, headers={'retry-after': '120'})])
+    assert caller(sleeps).execute(request) == {'sent': 3}
+    assert sleeps == [7.0, 32.0]
+
+
+def test_retries_give_up(ledger):
+    sleeps = []
+    calls = caller(sleeps, maxRetries=2)
+    request = FakeRequest(errors=[http_error(503)] * 3)
+    with pytest.raises(googleapiclient.errors.HttpError):
+        calls.execute(request)
+    assert request.sent == 3 and len(sleeps) == 2
+    stats = calls.stats['youtube.playlistItems.list']
+    assert (stats.calls, stats.retries, stats.failures) == (3, 2, 3)
+
+
+def test_no_retries_of_inserts_and_fatal_errors(ledger):
+    sleeps = []
+    insert = FakeRequest('POST', [http_error(503)], 'youtube.playlistItems.insert')
+    with pytest.raises(googleapiclient.errors.HttpError):
+        caller(sleeps).execute(insert)
+    forbidden = FakeRequest('PUT', [http_error(403, 'forbidden')], 'youtube.videos.update')
+    with pytest.raises(googleapiclient.errors.HttpError):
+        caller(sleeps).execute(forbidden)
+    assert (insert.sent, forbidden.sent, sleeps) == (1, 1, [])
+
+
+def test_quota_error_exhausts_the_ledger(ledger):
+    sleeps = []
+    request = FakeRequest(errors=[http_error(403, 'quotaExceeded')])
+    with pytest.raises(QuotaExceeded):
+        caller(sleeps).execute(request)
+    assert request.sent == 1 and sleeps == []
+    assert ledger.remaining() == 0
+
+
+def test_retried_delete_already_gone(ledger):
+    sleeps = []
+    # the first attempt went through, its answer was lost
+    request = FakeRequest('DELETE', [http_error(503), http_error(404, 'playlistItemNotFound')],
+                          'youtube.playlistItems.delete')
+    assert caller(sleeps).execute(request) is None
+    assert request.sent == 2
+    # a 404 on the first attempt is an error of the caller
+    request = FakeRequest('DELETE', [http_error(404, 'playlistItemNotFound')],
+                          'youtube.playlistItems.delete')
+    with pytest.raises(googleapiclient.errors.HttpError):
+        caller(sleeps).execute(request)
+
+
+def test_not_modified_is_not_a_failure(ledger):
+    calls = caller([])
+    with pytest.raises(googleapiclient.errors.HttpError):
+        calls.execute(FakeRequest(errors=[http_error(304)]))
+    stats = calls.stats['youtube.playlistItems.list']
+    assert (stats.calls, stats.retries, stats.failures) == (1, 0, 0)
+
+
+def test_token_bucket():
+    now = [0.0]
+    sleeps = []
+    bucket = TokenBucket(2, capacity=2, clock=lambda: now[0], sleep=sleeps.append)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.reserve() == 0.5
+    assert bucket.acquire() == 1.0
+    now[0] = 10.0
+    # refilled up to the capacity only
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.reserve() == 0.5
+    assert sleeps == [1.0]
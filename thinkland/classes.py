@@ -1,13 +1,13 @@
 import json
 import csv
 import sys
-from datetime import datetime
 from datetime import timedelta
 from zoneinfo import ZoneInfo
 from thinkland.zoom_canonicalize import get_canonical_zoom_id
 from thinkland.zoom_canonicalize import is_canonical
+from thinkland.processed_journal import format_record
+from thinkland.log_writer import get_log_writer
 
-log_file = 'data/log.txt'
 
 # class Meeting:
 #     def __init__(self, startTime, endTime, className, classId, teacherName, rawZoomId, reported, video, title, description):#, vid_title, vid_desc):
@@ -191,17 +191,18 @@ log_file = 'data/log.txt'
 #             json.dump(self.allPlaylists, file_out, indent=4)
 # '''
 
-def log(message, printOnScreen=True):
-    with open(log_file, mode='a') as file_out:
-        file_out.write(str(datetime.now()) + ' ' + message + '\n')
+def log(message, printOnScreen=True, video=None, action=None, latency=None):
+    """Log message to data/log.jsonl, optionally with the video id, the action
+    and its latency in seconds. The file is written by a background thread."""
+    get_log_writer().write(message, video=video, action=action,
+                           latency=None if latency is None else round(latency, 4))
     if printOnScreen:
-        print(message, sys.stderr)
+        print(message, file=sys.stderr)
 
 
 
 def appendProcessedVideo(csvFile, meeting, videoId):
-    with open(csvFile, 'a') as file_out:
-        date = str(meeting.startTime)[:10]
-        stime = str(meeting.startTime)[11:19]
-        line = '%s,%s,%s,%s,%s\n' % (meeting.classId, date, stime, meeting.teacherName, videoId)
-        file_out.write(line)
\ No newline at end of file
+    """Append one record to the processed journal. A run processing many videos
+    keeps a thinkland.processed_journal.ProcessedJournal open instead."""
+    with open(csvFile, 'a', newline='', encoding='utf-8') as file_out:
+        file_out.write(format_record(meeting, videoId))
\ No newline at end of file
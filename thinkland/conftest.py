@@ -0,0 +1,25 @@
+import pytest
+from oauth2client.client import OAuth2Credentials
+
+import auth
+from benchmarks import fake_youtube
+from thinkland import api_calls
+from thinkland import quota
+
+
+@pytest.fixture
+def channel(tmp_path, monkeypatch):
+    """The fake server with one playlist of three videos, and a youtube
+    resource talking to it."""
+    monkeypatch.setattr(quota, '_ledger', quota.QuotaLedger(str(tmp_path / 'quota.json')))
+    monkeypatch.setattr(api_calls, '_caller', api_calls.ApiCaller())
+    fake = fake_youtube.FakeYouTube()
+    fake.add_playlist('PL774', 'Class 774')
+    for i in range(3):
+        fake.add_video('vid%d' % i, 'Video %d' % i, playlistId='PL774')
+    server = fake_youtube.serve(fake)
+    baseUrl = 'http://%s:%d' % server.server_address
+    with open(fake_youtube.write_credentials(str(tmp_path), baseUrl)[1]) as file_in:
+        credentials = OAuth2Credentials.from_json(file_in.read())
+    yield fake, auth.build_resource(credentials, baseUrl)
+    server.shutdown()
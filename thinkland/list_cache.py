@@ -0,0 +1,129 @@
+#
+# On-disk cache of YouTube list responses, revalidated with ETags.
+#
+# The scripts list the same playlist pages on every run, and a dry run lists
+# them again. ListCache.execute(request) stores each list response under the
+# sha1 of the request method and URL (the URL carries every parameter, the
+# page token included) together with its ETag. The next time the same page is
+# requested it is sent with If-None-Match; when the page did not change the
+# API answers 304 Not Modified, googleapiclient raises that as an HttpError
+# and the stored response is returned instead.
+#
+# Entries live in data/list_cache/<sha1>.json. When the directory grows past
+# maxBytes the least recently used entries are removed. bypass=True (the
+# --no_list_cache flag of the scripts) sends plain requests and leaves the
+# cache alone.
+
+import hashlib
+import json
+import os
+
+import googleapiclient.errors
+
+from thinkland.api_calls import execute
+
+DEFAULT_CACHE_DIR = 'data/list_cache'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ListCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, maxBytes=DEFAULT_MAX_BYTES, bypass=False):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def execute(self, request):
+        """Execute a list HttpRequest, answering from the cache when the
+        API reports the response unchanged."""
+        if self.bypass:
+            return execute(request)
+
+        path = self._path(request)
+        entry = self._read(path)
+        if entry:
+            request.headers['If-None-Match'] = entry['etag']
+        headers = {}
+        postproc = request.postproc
+
+        def capture(resp, content):
+            headers.update(resp)
+            return postproc(resp, content)
+        request.postproc = capture
+
+        try:
+            response = execute(request)
+        except googleapiclient.errors.HttpError as error:
+            if entry and error.resp.status == 304:
+                self.hits += 1
+                os.utime(path)
+                return entry['response']
+            raise
+        self.misses += 1
+        etag = headers.get('etag') or response.get('etag')
+        if etag:
+            self._write(path, {'uri': request.uri, 'etag': etag, 'response': response})
+        return response
+
+    def clear(self):
+        for name in self._entries():
+            os.remove(os.path.join(self.directory, name))
+        self._size = 0
+
+    def _path(self, request):
+        key = hashlib.sha1(('%s %s' % (request.method, request.uri)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.json')
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [name for name in os.listdir(self.directory) if name.endswith('.json')]
+
+    def _read(self, path):
+        try:
+            with open(path, mode='r') as file_in:
+                return json.load(file_in)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        if self._size is None:
+            self._size = sum(os.path.getsize(os.path.join(self.directory, name))
+                             for name in self._entries())
+        if os.path.exists(path):
+            self._size -= os.path.getsize(path)
+        tmpPath = path + '.tmp'
+        with open(tmpPath, mode='w') as file_out:
+            json.dump(entry, file_out)
+        os.replace(tmpPath, path)
+        self._size += os.path.getsize(path)
+        if self._size > self.maxBytes:
+            self._evict()
+
+    def _evict(self):
+        """Remove the least recently used entries down to 3/4 of maxBytes."""
+        entries = []
+        for name in self._entries():
+            st = os.stat(os.path.join(self.directory, name))
+            entries.append((st.st_mtime, st.st_size, name))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for mtime, size, name in entries:
+            if self._size <= self.maxBytes * 3 // 4:
+                break
+            os.remove(os.path.join(self.directory, name))
+            self._size -= size
+
+
+_cache = None
+
+
+def get_list_cache():
+    """The shared ListCache of data/list_cache."""
+    global _cache
+    if _cache is None:
+        _cache = ListCache()
+    return _cache
@@ -0,0 +1,72 @@
+import os
+
+from thinkland.list_cache import ListCache
+from thinkland.playlist_items import list_request
+
+
+def video_ids(response):
+    return [item['contentDetails']['videoId'] for item in response['items']]
+
+
+def test_unchanged_page_comes_from_the_cache(tmp_path, channel):
+    fake, youtube = channel
+    cache = ListCache(str(tmp_path / 'list_cache'))
+    first = cache.execute(list_request(youtube, 'PL774'))
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert len(os.listdir(tmp_path / 'list_cache')) == 1
+    # the server answers 304 Not Modified, the stored response is returned
+    assert cache.execute(list_request(youtube, 'PL774')) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert fake.stats()['calls']['youtube.playlistItems.list'] == 2
+    assert video_ids(first) == ['vid0', 'vid1', 'vid2']
+
+
+def test_changed_page_is_fetched_again(tmp_path, channel):
+    fake, youtube = channel
+    cache = ListCache(str(tmp_path / 'list_cache'))
+    first = cache.execute(list_request(youtube, 'PL774'))
+    fake.add_video('vid3', 'Video 3', playlistId='PL774')
+    second = cache.execute(list_request(youtube, 'PL774'))
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert second['etag'] != first['etag']
+    assert video_ids(second) == ['vid0', 'vid1', 'vid2', 'vid3']
+    # the new response replaced the old one
+    assert cache.execute(list_request(youtube, 'PL774')) == second
+    assert cache.hits == 1
+    assert len(os.listdir(tmp_path / 'list_cache')) == 1
+
+
+def test_pages_are_cached_apart(tmp_path, channel):
+    fake, youtube = channel
+    cache = ListCache(str(tmp_path / 'list_cache'))
+    first = cache.execute(list_request(youtube, 'PL774', maxResults=2))
+    second = cache.execute(list_request(youtube, 'PL774', first['nextPageToken'], maxResults=2))
+    assert video_ids(first) + video_ids(second) == ['vid0', 'vid1', 'vid2']
+    assert cache.execute(list_request(youtube, 'PL774', first['nextPageToken'], maxResults=2)) == second
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_bypass(tmp_path, channel):
+    fake, youtube = channel
+    cache = ListCache(str(tmp_path / 'list_cache'), bypass=True)
+    response = cache.execute(list_request(youtube, 'PL774'))
+    assert video_ids(response) == ['vid0', 'vid1', 'vid2']
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert not os.path.exists(tmp_path / 'list_cache')
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, channel):
+    fake, youtube = channel
+    directory = tmp_path / 'list_cache'
+    cache = ListCache(str(directory))
+    cache.execute(list_request(youtube, 'PL774', maxResults=1))
+    entrySize = os.path.getsize(directory / os.listdir(directory)[0])
+    # room for about two entries
+    cache = ListCache(str(directory), maxBytes=entrySize * 5 // 2)
+    os.utime(directory / os.listdir(directory)[0], (0, 0))
+    cache.execute(list_request(youtube, 'PL774', maxResults=2))
+    cache.execute(list_request(youtube, 'PL774', maxResults=3))
+    assert len(os.listdir(directory)) == 1
+    # the most recent one is kept
+    assert cache.execute(list_request(youtube, 'PL774', maxResults=3))['items']
+    assert cache.hits == 1
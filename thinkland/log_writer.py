@@ -0,0 +1,143 @@
+#
+# Buffered, structured log behind thinkland.classes.log().
+#
+# log() used to open data/log.txt, append one line and close it again, three
+# times per processed video. LogWriter.write() only puts the record on a
+# queue; a background thread drains the queue and appends everything queued
+# so far with one write, at most every flushSeconds. Records are JSON lines:
+#
+#   {"ts": "2023-08-13T18:04:11.123456", "script": "client",
+#    "message": "Updated video abc ...", "video": "abc", "action": "update",
+#    "latency": 0.215}
+#
+# video, action and latency are only there when the caller passes them. When
+# the file grows past maxBytes it is rotated to log.jsonl.1.gz (gzip), the
+# older ones shift up to log.jsonl.<backups>.gz and the oldest is removed.
+# Records still queued are written when the process exits.
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_LOG_FILE = 'data/log.jsonl'
+MAX_BYTES = 10 * 1024 * 1024
+BACKUPS = 5
+FLUSH_SECONDS = 0.5
+
+_STOP = object()
+
+
+class LogWriter:
+    def __init__(self, path=DEFAULT_LOG_FILE, maxBytes=MAX_BYTES, backups=BACKUPS,
+                 flushSeconds=FLUSH_SECONDS, script=None):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.backups = backups
+        self.flushSeconds = flushSeconds
+        self.script = script or os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = 0
+
+    def write(self, message, **fields):
+        """Queue one record; fields with a None value are left out."""
+        record = {'ts': datetime.now().isoformat(), 'script': self.script, 'message': message}
+        record.update((name, value) for name, value in fields.items() if value is not None)
+        self.queue.put(record)
+        if self.thread is None:
+            self._start()
+
+    def flush(self):
+        """Wait until every record queued so far is in the file."""
+        done = threading.Event()
+        self.queue.put(done)
+        if self.thread is None:
+            self._start()
+        done.wait()
+
+    def close(self):
+        with self.lock:
+            thread = self.thread
+            if thread is None:
+                return
+            self.queue.put(_STOP)
+            self.thread = None
+        thread.join()
+
+    def _start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name='log_writer', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_out = open(self.path, mode='a', encoding='utf-8')
+        size = file_out.tell()
+        try:
+            while True:
+                items = [self.queue.get()]
+                # what arrives within flushSeconds goes into the same write
+                deadline = time.monotonic() + self.flushSeconds
+                while isinstance(items[-1], dict):
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        items.append(self.queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n'
+                                for record in items if isinstance(record, dict))
+                if lines:
+                    file_out.write(lines)
+                    file_out.flush()
+                    size += len(lines.encode('utf-8'))
+                    self.written += sum(1 for record in items if isinstance(record, dict))
+                if size > self.maxBytes:
+                    file_out.close()
+                    self._rotate()
+                    file_out = open(self.path, mode='a', encoding='utf-8')
+                    size = 0
+                for record in items:
+                    if isinstance(record, threading.Event):
+                        record.set()
+                if items[-1] is _STOP:
+                    return
+        finally:
+            file_out.close()
+
+    def _rotate(self):
+        oldest = '%s.%d.gz' % (self.path, self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for n in range(self.backups - 1, 0, -1):
+            name = '%s.%d.gz' % (self.path, n)
+            if os.path.exists(name):
+                os.replace(name, '%s.%d.gz' % (self.path, n + 1))
+        with open(self.path, mode='rb') as file_in, gzip.open(self.path + '.1.gz', mode='wb') as file_out:
+            shutil.copyfileobj(file_in, file_out)
+        os.remove(self.path)
+
+
+_writer = None
+
+
+def get_log_writer():
+    """The shared LogWriter of data/log.jsonl, closed when the process exits."""
+    global _writer
+    if _writer is None:
+        _writer = LogWriter()
+        atexit.register(_writer.close)
+    return _writer
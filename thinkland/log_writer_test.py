@@ -0,0 +1,70 @@
+import gzip
+import json
+import os
+
+from thinkland.log_writer import LogWriter
+
+
+def records(path):
+    with open(path, mode='r', encoding='utf-8') as file_in:
+        return [json.loads(line) for line in file_in]
+
+
+def gzipped_messages(path):
+    with gzip.open(path, mode='rt', encoding='utf-8') as file_in:
+        return [json.loads(line)['message'] for line in file_in]
+
+
+def test_flush_writes_the_queued_records(tmp_path):
+    path = str(tmp_path / 'data' / 'log.jsonl')
+    writer = LogWriter(path, flushSeconds=10, script='client')
+    writer.write('Updated video abc', video='abc', action='update', latency=0.25)
+    writer.write('Skipped', video=None)
+    # the flush ends the batch without waiting out flushSeconds
+    writer.flush()
+    written = records(path)
+    assert [record['message'] for record in written] == ['Updated video abc', 'Skipped']
+    assert written[0]['video'] == 'abc' and written[0]['latency'] == 0.25
+    assert written[0]['script'] == 'client'
+    assert set(written[1]) == {'ts', 'script', 'message'}
+    assert writer.written == 2
+    writer.close()
+
+
+def test_close_writes_the_rest(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    writer = LogWriter(path, flushSeconds=10)
+    writer.close()
+    for i in range(100):
+        writer.write('record %d' % i)
+    writer.close()
+    assert [record['message'] for record in records(path)] == ['record %d' % i for i in range(100)]
+    # a closed writer starts again
+    writer.write('again')
+    writer.flush()
+    assert records(path)[-1]['message'] == 'again'
+    writer.close()
+
+
+def test_rotation(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    writer = LogWriter(path, maxBytes=1, backups=2, flushSeconds=0)
+    for i in range(4):
+        writer.write('record %d' % i)
+        writer.flush()
+    writer.close()
+    assert gzipped_messages(path + '.1.gz') == ['record 3']
+    assert gzipped_messages(path + '.2.gz') == ['record 2']
+    assert not os.path.exists(path + '.3.gz')
+    assert records(path) == []
+
+
+def test_appends_to_an_existing_log(tmp_path):
+    path = tmp_path / 'log.jsonl'
+    path.write_text(json.dumps({'message': 'old'}) + '\n')
+    writer = LogWriter(str(path), maxBytes=60, flushSeconds=0)
+    writer.write('new')
+    writer.flush()
+    writer.close()
+    # the old record counts towards maxBytes
+    assert gzipped_messages(str(path) + '.1.gz') == ['old', 'new']
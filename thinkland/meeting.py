@@ -1,14 +1,42 @@
-import csv
+import bisect
+from array import array
 from datetime import datetime
-from datetime import timedelta
 from zoneinfo import ZoneInfo
 from thinkland.zoom_canonicalize import get_canonical_zoom_id
-from thinkland.zoom_canonicalize import is_canonical
+from thinkland.zoom_canonicalize import get_canonicalizer
+from thinkland import snapshot
+from thinkland.zoom_title import parse_title
+
+
+# status of a MatchResult
+MATCHED = 'matched'
+NO_MATCH = 'no match'
+AMBIGUOUS = 'ambiguous'
+
+
+class MatchResult:
+    """Result of matching one video title.
+
+    status is MATCHED, NO_MATCH or AMBIGUOUS. For an AMBIGUOUS result more than
+    one meeting starts inside the window; meeting is still the closest one.
+    """
+    def __init__(self, status, meeting=None, candidates=0):
+        self.status = status
+        self.meeting = meeting
+        self.candidates = candidates
+
 
 class Meeting:
-    def __init__(self, startTime, endTime, className, classId, teacherName, rawZoomId, reported, video, title, description):#, vid_title, vid_desc):
-        self.startTime = startTime
-        self.endTime = endTime
+    """One class meeting. Start and end are kept as UTC epoch seconds;
+    startTime and endTime build the datetimes in zoneInfo for display."""
+    __slots__ = ('startEpoch', 'endEpoch', 'zoneInfo', 'className', 'classId',
+                 'teacherName', 'rawZoomId', 'reported', 'video', 'title',
+                 'description', 'youtubeURL', 'playlist')
+
+    def __init__(self, startEpoch, endEpoch, className, classId, teacherName, rawZoomId, reported, video, title, description, zoneInfo=ZoneInfo('US/Eastern')):#, vid_title, vid_desc):
+        self.startEpoch = startEpoch
+        self.endEpoch = endEpoch
+        self.zoneInfo = zoneInfo
         self.className = className
         self.classId = classId
         self.teacherName = teacherName
@@ -20,97 +48,269 @@ class Meeting:
         self.youtubeURL = None
         self.playlist = None
 
+    @property
+    def startTime(self):
+        return datetime.fromtimestamp(self.startEpoch, self.zoneInfo)
+
+    @property
+    def endTime(self):
+        return datetime.fromtimestamp(self.endEpoch, self.zoneInfo)
+
     def getCanonicalZoomId(self):
         return get_canonical_zoom_id(self.rawZoomId)
 
 
 class MeetingDB:
     def __init__(self, csvFilePath, zoneInfo=ZoneInfo('US/Eastern')):
-        allMeetingsDict = {}
-        with open(csvFilePath, 'r') as file_in:
-            reader = csv.DictReader(file_in)
-            for line in reader:
-                cur = {'date': line['Class Date'], 'stime': line['Start Time'],
-                    'etime': line['End Time'], 'className': line['Class Name'],
-                    'classId': line['Class ID'], 'teacher': line['Teacher Name'],
-                    'title': line['YouTube Title'], 'description': line['YouTube Description'],
-                    'rawZoom': line['Zoom ID'], 'reported': line['Reported'], 'video': ''}#line['Video']}
-                key = cur['classId'] + '|' + cur['date']
-                allMeetingsDict[key] = cur
-
-        self.allMeetings = {}
-        for meetingId in allMeetingsDict:
-            a = allMeetingsDict[meetingId]
-            sections_meet = a['date'].split('-')
-            year = int(sections_meet[0])
-            month = int(sections_meet[1])
-            day = int(sections_meet[2])
-            sections_time = a['stime'].split(':')
-            hour = int(sections_time[0])
-            mins = int(sections_time[1])
-            sec = int(sections_time[2])
-            startTime = datetime(year, month, day, hour, mins, sec, tzinfo=zoneInfo)
-
-            sections_time = a['etime'].split(':')
-            hour = int(sections_time[0])
-            mins = int(sections_time[1])
-            sec = int(sections_time[2])
-            endTime = datetime(year, month, day, hour, mins, sec, tzinfo=zoneInfo)
-            
-            meetingObj = Meeting(startTime, endTime,
-                                 a['className'], a['classId'], a['teacher'],
-                                 a['rawZoom'], a['reported'], a['video'], a['title'], a['description'])#,
-                                #  a['vid_title'], a['vid_desc'])
-            if 'youtube_url' in a:
-                meetingObj.youtubeURL = a['youtube_url']
-            if 'playlist' in a:
-                meetingObj.playlist = a['playlist']
-            self.allMeetings[meetingId] = meetingObj
-            
+        """Meetings are kept in the columns of the snapshot table: start and
+        end times as int64 epochs and strings as interned ids. Meeting objects
+        are only built for the rows that match() returns."""
+        self.csvFilePath = csvFilePath
+        self.zoneInfo = zoneInfo
+        self._load(snapshot.load(csvFilePath, zoneInfo))
 
-    def match(self, videoTitle, minutesAllow, zoneInfo=ZoneInfo('US/Eastern')):
-        matches = list()
-        sections = videoTitle.split(' ')
-        if (len(sections) < 3 or len(sections[1]) < 11 or len(sections[2]) < 6 or
-            not sections[1][3:].isdigit() or not sections[2].isdigit()):
+    def _load(self, table):
+        self.table = table
+        classIds = table.codes['Class ID']
+        dates = table.codes['Class Date']
+        # later rows of the same class on the same date replace earlier ones
+        self._rowsByKey = {}
+        for row in range(len(table)):
+            self._rowsByKey[(classIds[row], dates[row])] = row
+        self.rows = array('I', self._rowsByKey.values())
+        self._meetings = {}
+        self._accounts = {}  # interned Zoom ID => account number
+
+        self.buildStartIndex()
+
+    def reload(self):
+        """Pick up the rows appended to the CSV since it was loaded.
+
+        Only the appended rows are parsed and merged into the index. If the
+        already loaded part of the CSV changed, everything is rebuilt.
+        Returns the number of rows added or replaced.
+        """
+        table, firstNewRow = snapshot.reload(self.table, self.csvFilePath, self.zoneInfo)
+        if firstNewRow == 0:
+            self._load(table)
+            return len(self.rows)
+
+        self.table = table
+        classIds = table.codes['Class ID']
+        dates = table.codes['Class Date']
+        for row in range(firstNewRow, len(table)):
+            key = (classIds[row], dates[row])
+            if key in self._rowsByKey:
+                self._unindex(self._rowsByKey[key])
+            self._rowsByKey[key] = row
+            self._index(row)
+        self.rows = array('I', self._rowsByKey.values())
+        return len(table) - firstNewRow
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def allMeetings(self):
+        """classId|date => Meeting of every meeting. Builds all the Meeting
+        objects, so only use it for reporting."""
+        ret = {}
+        for row in self.rows:
+            meeting = self.meeting(row)
+            ret[meeting.classId + '|' + self.table.value('Class Date', row)] = meeting
+        return ret
+
+    def meeting(self, row):
+        """Return the Meeting of a table row, building it on first use."""
+        if row not in self._meetings:
+            t = self.table
+            self._meetings[row] = Meeting(
+                t.starts[row], t.ends[row],
+                t.value('Class Name', row), t.value('Class ID', row),
+                t.value('Teacher Name', row), t.value('Zoom ID', row),
+                t.value('Reported', row), '',
+                t.value('YouTube Title', row), t.value('YouTube Description', row),
+                self.zoneInfo)
+        return self._meetings[row]
+
+    def buildStartIndex(self):
+        """Group the meetings by canonical Zoom account, sorted by start time.
+
+        self.startIndex maps a Zoom account number (5 for "Z05") to a pair of
+        parallel arrays (start epoch seconds, table row) so match() can binary
+        search instead of scanning every meeting. Meetings of unknown Zoom
+        accounts can never match and are left out.
+        """
+        starts = self.table.starts
+        groups = {}
+        for row in self.rows:
+            account = self._account(row)
+            if account is not None:
+                groups.setdefault(account, []).append(row)
+
+        self.startIndex = {}
+        for account, rows in groups.items():
+            # sort() is stable, so meetings with the same start keep their order
+            rows.sort(key=lambda row: starts[row])
+            self.startIndex[account] = (array('q', [starts[row] for row in rows]),
+                                        array('I', rows))
+
+    def _account(self, row):
+        code = self.table.codes['Zoom ID'][row]
+        if code not in self._accounts:
+            self._accounts[code] = get_canonicalizer().account_number(self.table.strings[code])
+        return self._accounts[code]
+
+    def _index(self, row):
+        account = self._account(row)
+        if account is None:
+            return
+        starts, rows = self.startIndex.setdefault(account, (array('q'), array('I')))
+        start = self.table.starts[row]
+        pos = bisect.bisect_right(starts, start)
+        starts.insert(pos, start)
+        rows.insert(pos, row)
+
+    def _unindex(self, row):
+        account = self._account(row)
+        if account is None:
+            return
+        starts, rows = self.startIndex[account]
+        pos = bisect.bisect_left(starts, self.table.starts[row])
+        while rows[pos] != row:
+            pos += 1
+        del starts[pos]
+        del rows[pos]
+
+    def parseVideoTitle(self, videoTitle, verbose=True):
+        """Return (Zoom account number, UTC epoch seconds) for a recording
+        title, or None when the title is malformed or the Zoom ID is not
+        canonical."""
+        parsed = parse_title(videoTitle)
+        if parsed is None:
             # TODO: print some error messages
-            print('Video title error: %s' % videoTitle)
+            if verbose:
+                print('Video title error: %s' % videoTitle)
             return None
-        year = int(sections[1][3:7])
-        month = int(sections[1][7:9])
-        day = int(sections[1][9:11])
-        hour = int(sections[2][:2])
-        mins = int(sections[2][2:4])
-        sec = int(sections[2][4:6])
-        video_dt = datetime(year, month, day, hour, mins, sec, tzinfo=ZoneInfo('UTC'))
-        
-        zoomId = sections[0]
-        if not is_canonical(zoomId):
-            print("Not a valid canonical ZoomID: %s" % videoTitle)
-            return
 
-        maxDif = timedelta(minutes=minutesAllow)
-        for meetingId in self.allMeetings:
-            meeting = self.allMeetings[meetingId]
-            if zoomId != meeting.getCanonicalZoomId():
+        account = get_canonicalizer().numbers.get(parsed.account)
+        if account is None:
+            if verbose:
+                print("Not a valid canonical ZoomID: %s" % videoTitle)
+            return None
+        return account, parsed.epoch
+
+    def match(self, videoTitle, minutesAllow, zoneInfo=ZoneInfo('US/Eastern')):
+        parsed = self.parseVideoTitle(videoTitle)
+        if not parsed:
+            return None
+        account, video_ts = parsed
+        if account not in self.startIndex:
+            return None
+        starts, rows = self.startIndex[account]
+        best, count = self._closest(starts, video_ts, minutesAllow * 60)
+        if count == 0:
+            return None
+        return self.meeting(rows[best])
+
+    def _closest(self, starts, video_ts, maxDif):
+        """Return (index of the closest start, number of starts) within
+        [video_ts - maxDif, video_ts + maxDif]."""
+        lo = bisect.bisect_left(starts, video_ts - maxDif)
+        hi = bisect.bisect_right(starts, video_ts + maxDif)
+        if lo == hi:
+            return None, 0
+
+        # select the closest meeting time, the earliest one on ties
+        best = lo
+        for i in range(lo + 1, hi):
+            if abs(starts[i] - video_ts) < abs(starts[best] - video_ts):
+                best = i
+        return best, hi - lo
+
+    def match_many(self, titles, minutesAllow):
+        """match() of every title in turn, without printing, returning one
+        MatchResult per title: AMBIGUOUS when several meetings start within
+        the window, with the closest one."""
+        results = []
+        maxDif = minutesAllow * 60
+        for title in titles:
+            parsed = self.parseVideoTitle(title, verbose=False)
+            if not parsed or parsed[0] not in self.startIndex:
+                results.append(MatchResult(NO_MATCH))
                 continue
-            
-            time_diff = video_dt - meeting.startTime
-            if meeting.startTime >= video_dt:
-                time_diff = meeting.startTime - video_dt
-            if time_diff <= maxDif:
-                matches.append(meeting)
-
-        if len(matches) == 0:
+            starts, rows = self.startIndex[parsed[0]]
+            best, count = self._closest(starts, parsed[1], maxDif)
+            if count:
+                results.append(MatchResult(MATCHED if count == 1 else AMBIGUOUS,
+                                           self.meeting(rows[best]), count))
+            else:
+                results.append(MatchResult(NO_MATCH))
+        return results
+
+
+class SqlMeetingDB(MeetingDB):
+    """MeetingDB answering from a thinkland.metadata_store.MetadataStore.
+
+    The meetings CSV is imported into the store when it changed since the
+    last import; match() and match_many() are indexed queries on (Zoom
+    account, start time) instead of the in-memory start index. Meeting ids
+    of the store take the place of the table rows.
+    """
+    def __init__(self, csvFilePath, store, zoneInfo=ZoneInfo('US/Eastern')):
+        self.csvFilePath = csvFilePath
+        self.zoneInfo = zoneInfo
+        self.store = store
+        self._meetings = {}
+        store.import_zoom_aliases(get_canonicalizer().zoomKey)
+        if csvFilePath:
+            store.import_meetings_csv(csvFilePath, zoneInfo)
+
+    def reload(self):
+        """Import the CSV again when it changed, returns the rows changed."""
+        changed = self.store.import_meetings_csv(self.csvFilePath, self.zoneInfo)
+        if changed:
+            self._meetings = {}
+        return changed
+
+    def __len__(self):
+        return self.store.meeting_count()
+
+    @property
+    def allMeetings(self):
+        ret = {}
+        for row in self.store.meeting_rows():
+            meeting = Meeting(*row[2:], zoneInfo=self.zoneInfo)
+            ret[meeting.classId + '|' + row[1]] = meeting
+        return ret
+
+    def meeting(self, row):
+        if row not in self._meetings:
+            self._meetings[row] = Meeting(*self.store.meeting_row(row), zoneInfo=self.zoneInfo)
+        return self._meetings[row]
+
+    def match(self, videoTitle, minutesAllow, zoneInfo=ZoneInfo('US/Eastern')):
+        parsed = self.parseVideoTitle(videoTitle)
+        if not parsed:
             return None
-        elif len(matches) > 1:
-            # TODO: print a warning
-            # and select the closest meeting time
-            pass
+        return self._match(parsed, minutesAllow * 60).meeting
+
+    def match_many(self, titles, minutesAllow):
+        results = []
+        for title in titles:
+            parsed = self.parseVideoTitle(title, verbose=False)
+            results.append(self._match(parsed, minutesAllow * 60) if parsed else MatchResult(NO_MATCH))
+        return results
 
-        return matches[0]
+    def _match(self, parsed, maxDif):
+        account, video_ts = parsed
+        found = self.store.meetings_starting(account, video_ts - maxDif, video_ts + maxDif)
+        if not found:
+            return MatchResult(NO_MATCH)
+        best, count = self._closest([start for start, _ in found], video_ts, maxDif)
+        return MatchResult(MATCHED if count == 1 else AMBIGUOUS, self.meeting(found[best][1]), count)
 
 
 if __name__ == '__main__':
     meetingDB = MeetingDB("data/meetings.csv")
-    print(len(meetingDB.allMeetings))
\ No newline at end of file
+    print(len(meetingDB))
\ No newline at end of file
@@ -0,0 +1,79 @@
+import csv
+
+from thinkland.meeting import AMBIGUOUS
+from thinkland.meeting import MATCHED
+from thinkland.meeting import NO_MATCH
+from thinkland.meeting import MeetingDB
+from thinkland.snapshot import COLUMNS
+
+
+def meeting(classId, day, start, zoom='Z05-TL'):
+    return [day, start, '23:59:00', 'Class %s' % classId, classId, 'Ananya Agarwal',
+            'Class %s | %s' % (classId, day), 'Lesson of class %s' % classId, zoom, '',
+            'https://www.youtube.com/playlist?list=PL%s' % classId]
+
+
+def meeting_db(directory, rows):
+    path = directory / 'meetings.csv'
+    with open(path, mode='w', newline='') as file_out:
+        writer = csv.writer(file_out)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    return MeetingDB(str(path))
+
+
+# 19:00 EDT on 2022-09-11 is 23:00 UTC, the time in the recording titles
+SCHEDULE = [
+    meeting('774', '2022-09-11', '19:00:00'),
+    meeting('775', '2022-09-11', '19:20:00'),
+    meeting('776', '2022-09-11', '21:00:00'),
+    meeting('777', '2022-09-11', '19:00:00', zoom='Z09-TL'),
+    meeting('778', '2022-09-11', '19:00:00', zoom='nobody@example.com'),
+]
+
+
+def test_match_picks_the_closest_meeting(tmp_path):
+    db = meeting_db(tmp_path, SCHEDULE)
+    assert db.match('Z05 GMT20220911 230100 Recording', 15).classId == '774'
+    assert db.match('Z05 GMT20220911 231500 Recording', 15).classId == '775'
+    # ties go to the earlier meeting
+    assert db.match('Z05 GMT20220911 231000 Recording', 15).classId == '774'
+    assert db.match('Z09 GMT20220911 225000 Recording', 15).classId == '777'
+    assert db.match('Z05 GMT20220912 010500 Recording', 15).classId == '776'
+
+
+def test_match_without_a_meeting(tmp_path):
+    db = meeting_db(tmp_path, SCHEDULE)
+    # outside the window, another account, unknown account, not a title
+    assert db.match('Z05 GMT20220911 223000 Recording', 15) is None
+    assert db.match('Z01 GMT20220911 230000 Recording', 15) is None
+    assert db.match('Z99 GMT20220911 230000 Recording', 15) is None
+    assert db.match('not a recording title', 15) is None
+
+
+def test_match_many(tmp_path):
+    db = meeting_db(tmp_path, SCHEDULE)
+    titles = ['Z05 GMT20220911 231000 Recording',
+              'Z05 GMT20220911 231200 Recording',
+              'Z05 GMT20220912 010000 Recording',
+              'Z05 GMT20220911 223000 Recording',
+              'Z99 GMT20220911 230000 Recording',
+              'not a recording title']
+    results = db.match_many(titles, 15)
+    assert [result.status for result in results] == [
+        AMBIGUOUS, AMBIGUOUS, MATCHED, NO_MATCH, NO_MATCH, NO_MATCH]
+    assert [result.candidates for result in results] == [2, 2, 1, 0, 0, 0]
+    assert results[0].meeting.classId == '774'
+    assert results[1].meeting.classId == '775'
+    assert results[2].meeting.classId == '776'
+    assert all(result.meeting is None for result in results[3:])
+    # the same meetings as match(), and a result object per title
+    for title, result in zip(titles, results):
+        assert result.meeting is db.match(title, 15)
+    assert len(set(map(id, results))) == len(titles)
+
+
+def test_match_many_narrow_window(tmp_path):
+    db = meeting_db(tmp_path, SCHEDULE)
+    result, = db.match_many(['Z05 GMT20220911 230100 Recording'], 5)
+    assert result.status == MATCHED and result.meeting.classId == '774'
@@ -0,0 +1,181 @@
+#
+# Local SQLite mirror of which videos are in which playlists.
+#
+# Finding out whether a video is already in a playlist used to mean paging
+# through the whole playlist with playlistItems().list, once per video. The
+# mirror (data/membership.sqlite) keeps one row per playlist item:
+#
+#   items      item_id, playlist_id, video_id, title, indexed on
+#              (playlist_id, video_id) and video_id
+#   playlists  playlist_id, etag of the first page, item count, refresh time
+#
+# refresh() re-reads a playlist only when it changed: the first page (1 quota
+# unit) is compared with the stored etag and item count before paging through
+# the rest. Our own inserts and deletes are written through with add() and
+# remove() as soon as they succeed, so the mirror stays current between
+# refreshes.
+
+import sqlite3
+import threading
+import time
+import os
+import sys
+
+from thinkland.api_calls import execute
+from thinkland.playlist_items import list_request
+
+DEFAULT_MEMBERSHIP_FILE = 'data/membership.sqlite'
+PAGE_SIZE = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY,
+    playlist_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    title TEXT
+);
+CREATE INDEX IF NOT EXISTS items_playlist_video ON items (playlist_id, video_id);
+CREATE INDEX IF NOT EXISTS items_video ON items (video_id);
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_id TEXT PRIMARY KEY,
+    etag TEXT,
+    item_count INTEGER,
+    refreshed REAL
+);
+"""
+
+
+class PlaylistMembership:
+    def __init__(self, path=DEFAULT_MEMBERSHIP_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        # callbacks of the worker threads write through too
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(_SCHEMA)
+
+    def contains(self, playlistId, videoId):
+        """Whether the mirror has videoId in playlistId, None when the
+        playlist was never mirrored."""
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM items WHERE playlist_id = ? AND video_id = ? LIMIT 1',
+                                  (playlistId, videoId)).fetchone()
+            if row:
+                return True
+            if self._refreshed(playlistId) is None:
+                return None
+            return False
+
+    def is_member(self, youtube, playlistId, videoId, maxAge=3600):
+        """Whether videoId is in playlistId, refreshing the playlist first
+        when it was not refreshed within maxAge seconds."""
+        self.refresh(youtube, playlistId, maxAge)
+        return bool(self.contains(playlistId, videoId))
+
+    def playlists_of(self, videoId):
+        with self.lock:
+            return [row[0] for row in self.db.execute(
+                'SELECT DISTINCT playlist_id FROM items WHERE video_id = ?', (videoId,))]
+
+    def videos(self, playlistId):
+        with self.lock:
+            return [row[0] for row in self.db.execute(
+                'SELECT video_id FROM items WHERE playlist_id = ?', (playlistId,))]
+
+    def add(self, playlistId, videoId, itemId, title=None):
+        """Record a playlist item, e.g. after our own playlistItems().insert."""
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)',
+                            (itemId, playlistId, videoId, title))
+
+    def remove(self, itemId):
+        """Forget a playlist item, e.g. after our own playlistItems().delete."""
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM items WHERE item_id = ?', (itemId,))
+
+    def inserted(self, playlistId, videoId, title=None, then=None):
+        """A callback(response, exception) for our playlistItems().insert
+        adding the new item on success, then calling then(response, exception)."""
+        def callback(response, exception):
+            if exception is None:
+                self.add(playlistId, videoId, response['id'], title)
+            if then:
+                then(response, exception)
+        return callback
+
+    def deleted(self, itemId, then=None):
+        """The same for our playlistItems().delete of itemId."""
+        def callback(response, exception):
+            if exception is None:
+                self.remove(itemId)
+            if then:
+                then(response, exception)
+        return callback
+
+    def refresh(self, youtube, playlistId, maxAge=0):
+        """Bring the mirror of playlistId up to date. Returns the number of
+        list calls made: 0 when refreshed within maxAge seconds, 1 when the
+        first page shows no change."""
+        with self.lock:
+            refreshed = self._refreshed(playlistId)
+            stored = self.db.execute('SELECT etag, item_count FROM playlists WHERE playlist_id = ?',
+                                     (playlistId,)).fetchone()
+        if refreshed is not None and time.time() - refreshed < maxAge:
+            return 0
+
+        page = self._list(youtube, playlistId, '')
+        calls = 1
+        count = page['pageInfo']['totalResults']
+        if stored and stored == (page.get('etag'), count):
+            with self.lock, self.db:
+                self.db.execute('UPDATE playlists SET refreshed = ? WHERE playlist_id = ?',
+                                (time.time(), playlistId))
+            return calls
+
+        items = []
+        etag = page.get('etag')
+        while True:
+            for item in page['items']:
+                items.append((item['id'], playlistId, item['contentDetails']['videoId'],
+                              item['snippet']['title']))
+            if 'nextPageToken' not in page:
+                break
+            page = self._list(youtube, playlistId, page['nextPageToken'])
+            calls += 1
+
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM items WHERE playlist_id = ?', (playlistId,))
+            self.db.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)', items)
+            self.db.execute('INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?)',
+                            (playlistId, etag, count, time.time()))
+        return calls
+
+    def _list(self, youtube, playlistId, pageToken):
+        return execute(list_request(youtube, playlistId, pageToken, PAGE_SIZE))
+
+    def _refreshed(self, playlistId):
+        row = self.db.execute('SELECT refreshed FROM playlists WHERE playlist_id = ?',
+                              (playlistId,)).fetchone()
+        return row[0] if row else None
+
+
+_membership = None
+
+
+def get_membership():
+    """The shared PlaylistMembership of data/membership.sqlite."""
+    global _membership
+    if _membership is None:
+        _membership = PlaylistMembership()
+    return _membership
+
+
+if __name__ == '__main__':
+    # python3 -m thinkland.membership PLAYLIST_ID [VIDEO_ID]
+    membership = get_membership()
+    if len(sys.argv) > 2:
+        print(membership.contains(sys.argv[1], sys.argv[2]))
+    else:
+        print('\n'.join(membership.videos(sys.argv[1])))
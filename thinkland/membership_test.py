@@ -0,0 +1,61 @@
+from thinkland import membership
+from thinkland.membership import PlaylistMembership
+
+
+def list_calls(fake):
+    return fake.stats()['calls'].get('youtube.playlistItems.list', 0)
+
+
+def test_refresh_mirrors_the_playlist(tmp_path, channel, monkeypatch):
+    fake, youtube = channel
+    monkeypatch.setattr(membership, 'PAGE_SIZE', 2)
+    mirror = PlaylistMembership(str(tmp_path / 'membership.sqlite'))
+    assert mirror.contains('PL774', 'vid0') is None
+    assert mirror.refresh(youtube, 'PL774') == 2
+    assert mirror.videos('PL774') == ['vid0', 'vid1', 'vid2']
+    assert mirror.contains('PL774', 'vid0') is True
+    assert mirror.contains('PL774', 'vid9') is False
+    assert mirror.playlists_of('vid1') == ['PL774']
+
+
+def test_refresh_of_an_unchanged_playlist(tmp_path, channel, monkeypatch):
+    fake, youtube = channel
+    monkeypatch.setattr(membership, 'PAGE_SIZE', 2)
+    mirror = PlaylistMembership(str(tmp_path / 'membership.sqlite'))
+    mirror.refresh(youtube, 'PL774')
+    # only the first page, to compare its etag and the item count
+    assert mirror.refresh(youtube, 'PL774') == 1
+    # refreshed within maxAge, no call at all
+    assert mirror.refresh(youtube, 'PL774', maxAge=3600) == 0
+    assert mirror.is_member(youtube, 'PL774', 'vid2', maxAge=3600)
+    assert list_calls(fake) == 3
+
+
+def test_refresh_picks_up_changes_of_others(tmp_path, channel):
+    fake, youtube = channel
+    mirror = PlaylistMembership(str(tmp_path / 'membership.sqlite'))
+    mirror.refresh(youtube, 'PL774')
+    playlist = fake.playlists['PL774']
+    fake.itemPlaylist.pop(playlist.items[0])
+    playlist.remove(playlist.items[0])
+    fake.add_video('vid3', 'Video 3', playlistId='PL774')
+    assert not mirror.is_member(youtube, 'PL774', 'vid3', maxAge=3600)
+    assert mirror.is_member(youtube, 'PL774', 'vid3', maxAge=0)
+    assert mirror.videos('PL774') == ['vid1', 'vid2', 'vid3']
+
+
+def test_own_changes_are_written_through(tmp_path, channel):
+    fake, youtube = channel
+    mirror = PlaylistMembership(str(tmp_path / 'membership.sqlite'))
+    mirror.refresh(youtube, 'PL774')
+    done = []
+    mirror.inserted('PL774', 'vid7', 'Video 7', lambda response, exception: done.append(response))(
+        {'id': 'item7'}, None)
+    assert done == [{'id': 'item7'}]
+    assert mirror.contains('PL774', 'vid7')
+    # a failed insert records nothing
+    mirror.inserted('PL774', 'vid8')(None, Exception('failed'))
+    assert not mirror.contains('PL774', 'vid8')
+    mirror.deleted('item7')(None, None)
+    assert not mirror.contains('PL774', 'vid7')
+    assert list_calls(fake) == 1
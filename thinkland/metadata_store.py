@@ -0,0 +1,480 @@
+#
+# Embedded SQLite store of the class metadata, data/metadata.sqlite.
+#
+# The meetings CSV, converter.py's meetings.json, the playlist JSON of
+# make_playlists.py and data/processed.csv used to be re-read in full by every
+# script, and the JSON files rewritten in full on every change. The store keeps
+# them as indexed tables:
+#
+#   meetings      one row per (class id, date), the later CSV row winning as in
+#                 MeetingDB, indexed on (Zoom account number, start epoch) for
+#                 matching recordings and on (class id, teacher name). They
+#                 come from one file, the meetings CSV or converter.py's JSON:
+#                 importing the meetings of a second file raises ValueError
+#                 instead of letting the two overwrite each other's rows
+#   playlists     playlist id per (class id, teacher name); the teacher is ''
+#                 for the per class playlists of make_playlists.py
+#   processed     one row per processed video id, indexed on the meeting
+#   zoom_aliases  Zoom account email or alias => canonical id like "Z05"
+#   sources       size and mtime of every imported file
+#
+# Importing a file that did not change since the last import is a stat() call.
+# When it changed, only the rows that differ are written, deleted rows
+# included, and an appended processed journal is read from where the last
+# import stopped. Updates like set_playlist() and add_processed() are one row
+# in one transaction.
+#
+# thinkland.meeting.SqlMeetingDB and thinkland.playlist.SqlPlaylistDB answer
+# the queries of MeetingDB and PlaylistDB from the store.
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from urllib import parse
+from zoneinfo import ZoneInfo
+
+from thinkland import snapshot
+from thinkland.processed_journal import ProcessedRecord
+from thinkland.processed_journal import parse_record
+from thinkland.processed_journal import record_fields
+from thinkland.tz_offsets import get_offset_table
+from thinkland.zoom_canonicalize import ZoomCanonicalizer
+from thinkland.zoom_canonicalize import get_canonicalizer
+
+DEFAULT_METADATA_FILE = 'data/metadata.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY,
+    class_id TEXT NOT NULL,
+    class_date TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    start_epoch INTEGER NOT NULL,
+    end_epoch INTEGER NOT NULL,
+    class_name TEXT,
+    teacher_name TEXT,
+    zoom_id TEXT,
+    reported TEXT,
+    title TEXT,
+    description TEXT,
+    playlist_url TEXT,
+    video TEXT,
+    zoom_account INTEGER,
+    source TEXT,
+    UNIQUE (class_id, class_date)
+);
+CREATE INDEX IF NOT EXISTS meetings_account_start ON meetings (zoom_account, start_epoch);
+CREATE INDEX IF NOT EXISTS meetings_class_teacher ON meetings (class_id, teacher_name);
+CREATE TABLE IF NOT EXISTS playlists (
+    class_id TEXT NOT NULL,
+    teacher_name TEXT NOT NULL DEFAULT '',
+    playlist_id TEXT,
+    title TEXT,
+    ambiguous INTEGER NOT NULL DEFAULT 0,
+    source TEXT,
+    PRIMARY KEY (class_id, teacher_name)
+);
+CREATE INDEX IF NOT EXISTS playlists_playlist ON playlists (playlist_id);
+CREATE TABLE IF NOT EXISTS processed (
+    video_id TEXT PRIMARY KEY,
+    class_id TEXT,
+    class_date TEXT,
+    start_time TEXT,
+    teacher_name TEXT
+);
+CREATE INDEX IF NOT EXISTS processed_meeting ON processed (class_id, class_date, start_time);
+CREATE TABLE IF NOT EXISTS zoom_aliases (
+    alias TEXT PRIMARY KEY,
+    canonical TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS zoom_aliases_canonical ON zoom_aliases (canonical);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    imported REAL
+);
+"""
+
+# columns of an imported meeting, the key (class id, date) first
+MEETING_FIELDS = ('class_id', 'class_date', 'start_time', 'end_time', 'start_epoch', 'end_epoch',
+                  'class_name', 'teacher_name', 'zoom_id', 'reported', 'title', 'description',
+                  'playlist_url', 'video')
+# the columns in the argument order of thinkland.meeting.Meeting
+MEETING_COLUMNS = ('start_epoch, end_epoch, class_name, class_id, teacher_name, zoom_id, '
+                   'reported, video, title, description')
+
+
+def playlist_id_of(url):
+    """The list= parameter of a playlist share URL, None when there is not one."""
+    params = parse.parse_qs(parse.urlsplit(url).query)
+    if 'list' in params and len(params['list']) == 1:
+        return params['list'][0]
+    return None
+
+
+class MetadataStore:
+    def __init__(self, path=DEFAULT_METADATA_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        # the worker threads record processed videos too
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(_SCHEMA)
+        self._canonicalizer = None
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # ---- imports
+
+    def import_meetings_csv(self, csvFilePath, zoneInfo=ZoneInfo('US/Eastern')):
+        """Import the meetings and the playlists of the meetings CSV. Returns
+        the number of meeting and playlist rows added, changed or removed."""
+        st = self._changed(csvFilePath)
+        if st is None:
+            return 0
+        table = snapshot.load(csvFilePath, zoneInfo)
+        meetings = []
+        for row in range(len(table)):
+            meetings.append((
+                table.value('Class ID', row), table.value('Class Date', row),
+                table.value('Start Time', row), table.value('End Time', row),
+                table.starts[row], table.ends[row],
+                table.value('Class Name', row), table.value('Teacher Name', row),
+                table.value('Zoom ID', row), table.value('Reported', row),
+                table.value('YouTube Title', row), table.value('YouTube Description', row),
+                table.value('YouTube Playlist Share URL', row), ''))
+        with self.lock, self.db:
+            changed = self._import_meetings(csvFilePath, meetings)
+            changed += self._import_playlists(csvFilePath, self._csv_playlists(table))
+            self._imported(csvFilePath, st)
+        return changed
+
+    def import_meetings_json(self, jsonFilePath, zoneInfo=ZoneInfo('US/Eastern')):
+        """Import the classId|date => meeting JSON written by converter.py."""
+        st = self._changed(jsonFilePath)
+        if st is None:
+            return 0
+        with open(jsonFilePath, mode='r') as file_in:
+            data = json.load(file_in)
+        offsets = get_offset_table(zoneInfo)
+        meetings = []
+        for info in data.values():
+            meetings.append((
+                info['classId'], info['date'], info['stime'], info['etime'],
+                offsets.parse_local(info['date'], info['stime']),
+                offsets.parse_local(info['date'], info['etime']),
+                info['className'], info['teacher'], info['rawZoom'], info['reported'],
+                info['title'], info['description'], '', info.get('video') or ''))
+        with self.lock, self.db:
+            changed = self._import_meetings(jsonFilePath, meetings)
+            self._imported(jsonFilePath, st)
+        return changed
+
+    def import_playlist_json(self, jsonFilePath):
+        """Import the per class playlists of make_playlists.py, a JSON of
+        classId => {"Playlist ID": ..., "Playlist Title": ...} or of
+        classId => playlist id."""
+        st = self._changed(jsonFilePath)
+        if st is None:
+            return 0
+        if st.st_size == 0:
+            data = {}
+        else:
+            with open(jsonFilePath, mode='r') as file_in:
+                data = json.load(file_in)
+        playlists = {}
+        for classId, info in data.items():
+            if isinstance(info, dict):
+                playlists[(classId, '')] = (info.get('Playlist ID'), info.get('Playlist Title'), 0)
+            else:
+                playlists[(classId, '')] = (info, None, 0)
+        with self.lock, self.db:
+            changed = self._import_playlists(jsonFilePath, playlists)
+            self._imported(jsonFilePath, st)
+        return changed
+
+    def import_processed(self, journalPath):
+        """Import the records of a processed journal. When the journal only
+        grew since the last import, only the new records are read."""
+        if not os.path.exists(journalPath):
+            return 0
+        st = os.stat(journalPath)
+        with self.lock:
+            row = self.db.execute('SELECT size, mtime_ns FROM sources WHERE path = ?',
+                                  (journalPath,)).fetchone()
+        offset = 0
+        if row:
+            if (st.st_size, st.st_mtime_ns) == row:
+                return 0
+            if st.st_size >= row[0]:
+                offset = row[0]
+        records = []
+        with open(journalPath, mode='rb') as file_in:
+            file_in.seek(offset)
+            data = file_in.read(st.st_size - offset)
+        # a torn last line is read again by the next import
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            fields = parse_record(line) if line.strip() else None
+            if fields is not None:
+                record = ProcessedRecord(*fields)
+                records.append((record.videoId, record.classId, record.date, record.time,
+                                record.teacherName))
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?)', records)
+            self.db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                            (journalPath, offset + end, st.st_mtime_ns, time.time()))
+        return len(records)
+
+    def import_zoom_aliases(self, zoomKey):
+        """Replace the Zoom aliases with zoomKey (alias => canonical id) and
+        update the account numbers of the meetings when they changed."""
+        with self.lock:
+            if self._aliases() == dict(zoomKey):
+                return 0
+            with self.db:
+                self.db.execute('DELETE FROM zoom_aliases')
+                self.db.executemany('INSERT INTO zoom_aliases VALUES (?, ?)', list(zoomKey.items()))
+                self._canonicalizer = None
+                canonicalizer = self.canonicalizer()
+                zoomIds = [row[0] for row in self.db.execute('SELECT DISTINCT zoom_id FROM meetings')]
+                self.db.executemany('UPDATE meetings SET zoom_account = ? WHERE zoom_id = ?',
+                                    [(canonicalizer.account_number(zoomId), zoomId) for zoomId in zoomIds])
+        return len(zoomKey)
+
+    def _changed(self, path):
+        """os.stat() of path when it changed since its last import, else None."""
+        st = os.stat(path)
+        with self.lock:
+            row = self.db.execute('SELECT size, mtime_ns FROM sources WHERE path = ?', (path,)).fetchone()
+        if row == (st.st_size, st.st_mtime_ns):
+            return None
+        return st
+
+    def _imported(self, path, st):
+        self.db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                        (path, st.st_size, st.st_mtime_ns, time.time()))
+
+    def _import_meetings(self, source, meetings):
+        """Write the rows of meetings (MEETING_FIELDS tuples) that differ from
+        what source imported before and remove the ones it no longer has."""
+        other = self.db.execute('SELECT source FROM meetings WHERE source != ? LIMIT 1',
+                                (source,)).fetchone()
+        if other:
+            raise ValueError('%s already holds the meetings of %s, not importing %s' % (
+                self.path, other[0], source))
+        rows = {}
+        for meeting in meetings:
+            # later rows of the same class on the same date replace earlier ones
+            rows[meeting[:2]] = meeting
+        existing = {}
+        for row in self.db.execute('SELECT %s FROM meetings WHERE source = ?' % ', '.join(MEETING_FIELDS),
+                                   (source,)):
+            existing[row[:2]] = row
+        canonicalizer = self.canonicalizer()
+        changed = [row + (canonicalizer.account_number(row[8]), source)
+                   for key, row in rows.items() if existing.get(key) != row]
+        removed = [key for key in existing if key not in rows]
+        columns = MEETING_FIELDS + ('zoom_account', 'source')
+        # an update keeps the id, so meetings sharing a start keep their order
+        self.db.executemany(
+            'INSERT INTO meetings (%s) VALUES (%s) ON CONFLICT (class_id, class_date) DO UPDATE SET %s' % (
+                ', '.join(columns), ', '.join('?' * len(columns)),
+                ', '.join('%s = excluded.%s' % (column, column) for column in columns[2:])),
+            changed)
+        self.db.executemany('DELETE FROM meetings WHERE class_id = ? AND class_date = ?', removed)
+        return len(changed) + len(removed)
+
+    def _import_playlists(self, source, playlists):
+        """The same for (class id, teacher) => (playlist id, title, ambiguous)."""
+        existing = {}
+        for row in self.db.execute('SELECT class_id, teacher_name, playlist_id, title, ambiguous '
+                                   'FROM playlists WHERE source = ?', (source,)):
+            existing[row[:2]] = row[2:]
+        changed = [key + value + (source,) for key, value in playlists.items()
+                   if existing.get(key) != value]
+        removed = [key for key in existing if key not in playlists]
+        self.db.executemany('INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?, ?, ?)', changed)
+        self.db.executemany('DELETE FROM playlists WHERE class_id = ? AND teacher_name = ?', removed)
+        return len(changed) + len(removed)
+
+    def _csv_playlists(self, table):
+        """(class id, teacher) => (playlist id, None, ambiguous) of the playlist
+        share URLs of the meetings CSV, the first one of a class winning."""
+        playlists = {}
+        # every meeting of a class repeats the same playlist
+        distinct = dict.fromkeys(zip(table.codes['Class ID'], table.codes['Teacher Name'],
+                                     table.codes['YouTube Playlist Share URL']))
+        for classCode, teacherCode, urlCode in distinct:
+            url = table.strings[urlCode]
+            if not url:
+                continue
+            playlistId = playlist_id_of(url)
+            if playlistId is None:
+                print('Bad YoutubeURL: %s' % url, file=sys.stderr)
+                continue
+            key = (table.strings[classCode], table.strings[teacherCode])
+            if key not in playlists:
+                playlists[key] = (playlistId, None, 0)
+            elif playlists[key][0] != playlistId:
+                print('Different playlists for the same classID:%s\nPL1:%s\nPL2:%s' %
+                      (key[0], playlistId, playlists[key][0]), file=sys.stderr)
+                playlists[key] = (playlists[key][0], None, 1)
+        return playlists
+
+    # ---- meetings
+
+    def meeting_count(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM meetings').fetchone()[0]
+
+    def meeting_row(self, meetingId):
+        """The Meeting arguments (MEETING_COLUMNS) of a meeting id, None if unknown."""
+        with self.lock:
+            return self.db.execute('SELECT %s FROM meetings WHERE id = ?' % MEETING_COLUMNS,
+                                   (meetingId,)).fetchone()
+
+    def meeting_rows(self):
+        """(id, class date, Meeting arguments...) of every meeting."""
+        with self.lock:
+            return self.db.execute('SELECT id, class_date, %s FROM meetings ORDER BY id' %
+                                   MEETING_COLUMNS).fetchall()
+
+    def meeting_id(self, classId, classDate):
+        with self.lock:
+            row = self.db.execute('SELECT id FROM meetings WHERE class_id = ? AND class_date = ?',
+                                  (classId, classDate)).fetchone()
+        return row[0] if row else None
+
+    def meetings_starting(self, account, first, last):
+        """[(start epoch, id)] of the meetings of a Zoom account number starting
+        between the epochs first and last, sorted by start."""
+        with self.lock:
+            return self.db.execute('SELECT start_epoch, id FROM meetings WHERE zoom_account = ? AND '
+                                   'start_epoch BETWEEN ? AND ? ORDER BY start_epoch, id',
+                                   (account, first, last)).fetchall()
+
+    # ---- playlists
+
+    def playlist_id(self, classId, teacherName=''):
+        """The playlist of a class, None when unknown or not created yet. For
+        an ambiguous class it is the first one, as in PlaylistDB."""
+        with self.lock:
+            row = self.db.execute('SELECT playlist_id FROM playlists '
+                                  'WHERE class_id = ? AND teacher_name = ?',
+                                  (classId, teacherName)).fetchone()
+        return row[0] if row else None
+
+    def playlists(self):
+        """[(class id, teacher name, playlist id, title, ambiguous)] of every playlist."""
+        with self.lock:
+            return self.db.execute('SELECT class_id, teacher_name, playlist_id, title, ambiguous '
+                                   'FROM playlists').fetchall()
+
+    def set_playlist(self, classId, playlistId, teacherName='', title=None):
+        """Record the playlist of a class, keeping the title when none is given."""
+        with self.lock, self.db:
+            self.db.execute('INSERT INTO playlists (class_id, teacher_name, playlist_id, title) '
+                            'VALUES (?, ?, ?, ?) ON CONFLICT (class_id, teacher_name) DO UPDATE SET '
+                            'playlist_id = excluded.playlist_id, ambiguous = 0, '
+                            'title = coalesce(excluded.title, title)',
+                            (classId, teacherName, playlistId, title))
+
+    def playlists_to_create(self):
+        """[(class id, title)] of the per class playlists without a playlist id yet."""
+        with self.lock:
+            return self.db.execute("SELECT class_id, title FROM playlists WHERE teacher_name = '' "
+                                   "AND playlist_id IS NULL").fetchall()
+
+    # ---- processed videos
+
+    def add_processed(self, meeting, videoId):
+        fields = record_fields(meeting, videoId)
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?)',
+                            [fields[4]] + fields[:4])
+
+    def is_processed(self, videoId):
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM processed WHERE video_id = ?',
+                                   (videoId,)).fetchone() is not None
+
+    def processed_videos_of(self, classId, date, time):
+        """Ids of the videos processed for the meeting of classId at date, time."""
+        with self.lock:
+            return [row[0] for row in self.db.execute(
+                'SELECT video_id FROM processed WHERE class_id = ? AND class_date = ? AND start_time = ?',
+                (classId, date, time))]
+
+    def processed_count(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM processed').fetchone()[0]
+
+    # ---- Zoom aliases
+
+    def canonical_zoom_id(self, alias):
+        """The canonical id of a Zoom alias, the alias itself when unknown."""
+        with self.lock:
+            row = self.db.execute('SELECT canonical FROM zoom_aliases WHERE alias = ?',
+                                  (alias,)).fetchone()
+        return row[0] if row else alias
+
+    def canonicalizer(self):
+        """A ZoomCanonicalizer of the stored aliases, the built in table when
+        none were imported."""
+        if self._canonicalizer is None:
+            aliases = self._aliases()
+            if not aliases:
+                return get_canonicalizer()
+            self._canonicalizer = ZoomCanonicalizer(aliases)
+        return self._canonicalizer
+
+    def _aliases(self):
+        return dict(self.db.execute('SELECT alias, canonical FROM zoom_aliases'))
+
+
+_store = None
+
+
+def get_metadata_store():
+    """The shared MetadataStore of data/metadata.sqlite."""
+    global _store
+    if _store is None:
+        _store = MetadataStore()
+    return _store
+
+
+if __name__ == '__main__':
+    # python3 -m thinkland.metadata_store --meeting_csv data/meetings.csv --processed_csv data/processed.csv
+    parser = argparse.ArgumentParser(description='Import the metadata files into the SQLite store')
+    parser.add_argument('--db', default=DEFAULT_METADATA_FILE)
+    parser.add_argument('--meeting_csv', help='meetings CSV, with the playlist share URLs')
+    parser.add_argument('--meetings_json', help='meetings JSON written by converter.py, instead of --meeting_csv')
+    parser.add_argument('--playlist_json', help='per class playlist JSON of make_playlists.py')
+    parser.add_argument('--processed_csv', help='processed videos journal')
+    parser.add_argument('--zoom_key', help='Zoom key CSV or JSON, see thinkland.zoom_canonicalize')
+    args = parser.parse_args()
+
+    store = MetadataStore(args.db)
+    if args.zoom_key:
+        store.import_zoom_aliases(ZoomCanonicalizer.from_file(args.zoom_key).zoomKey)
+    if args.meeting_csv:
+        print('%s: %d rows changed' % (args.meeting_csv, store.import_meetings_csv(args.meeting_csv)))
+    if args.meetings_json:
+        print('%s: %d rows changed' % (args.meetings_json, store.import_meetings_json(args.meetings_json)))
+    if args.playlist_json:
+        print('%s: %d rows changed' % (args.playlist_json, store.import_playlist_json(args.playlist_json)))
+    if args.processed_csv:
+        print('%s: %d records read' % (args.processed_csv, store.import_processed(args.processed_csv)))
+    print('%d meetings, %d playlists, %d processed videos' % (
+        store.meeting_count(), len(store.playlists()), store.processed_count()))
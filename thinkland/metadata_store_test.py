@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+
+import pytest
+
+from thinkland.metadata_store import MetadataStore
+from thinkland.processed_journal import format_row
+from thinkland.playlist import PlaylistDB
+from thinkland.playlist import SqlPlaylistDB
+from thinkland.snapshot import COLUMNS
+
+
+def meeting(classId, day, teacher='Ananya Agarwal', playlist=None, start='19:00:00', zoom='Z05-TL'):
+    return [day, start, '20:00:00', 'Class %s' % classId, classId, teacher,
+            'Class %s | %s' % (classId, day), 'Lesson of class %s' % classId, zoom, '',
+            'https://www.youtube.com/playlist?list=%s' % (playlist or 'PL' + classId)]
+
+
+def write_csv(path, rows):
+    with open(path, mode='w', newline='') as file_out:
+        writer = csv.writer(file_out)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_ambiguous_playlist_same_in_both_backends(tmp_path):
+    csvPath = write_csv(tmp_path / 'meetings.csv', [
+        meeting('774', '2022-09-11', playlist='PLfirst'),
+        meeting('774', '2022-09-18', playlist='PLsecond'),
+        meeting('775', '2022-09-12')])
+    memory = PlaylistDB(csvPath)
+    sql = SqlPlaylistDB(csvPath, MetadataStore(str(tmp_path / 'metadata.sqlite')))
+    for db in [memory, sql]:
+        assert db.getPlaylistId('774', 'Ananya Agarwal') == 'PLfirst'
+        assert db.getPlaylistId('775', 'Ananya Agarwal') == 'PL775'
+        assert db.getPlaylistId('776', 'Ananya Agarwal') is None
+        assert db.ambiguousClasses == {'774'}
+    assert sql.allPlaylists == memory.allPlaylists
+
+
+def test_one_meetings_source(tmp_path):
+    store = MetadataStore(str(tmp_path / 'metadata.sqlite'))
+    csvPath = write_csv(tmp_path / 'meetings.csv', [meeting('774', '2022-09-11')])
+    store.import_meetings_csv(csvPath)
+    jsonPath = tmp_path / 'meetings.json'
+    jsonPath.write_text(json.dumps({'774|2022-09-11': {
+        'classId': '774', 'date': '2022-09-11', 'stime': '19:00:00', 'etime': '20:00:00',
+        'className': 'Class 774', 'teacher': 'Ananya Agarwal', 'rawZoom': 'Z05-TL',
+        'reported': '', 'title': '', 'description': ''}}))
+    with pytest.raises(ValueError):
+        store.import_meetings_json(str(jsonPath))
+    # nothing of the refused import was kept, it is refused again
+    assert store.meeting_count() == 1
+    with pytest.raises(ValueError):
+        store.import_meetings_json(str(jsonPath))
+
+
+def meetings(store):
+    return [(row[1], row[5], row[4]) for row in store.meeting_rows()]
+
+
+def test_import_meetings_csv(tmp_path):
+    store = MetadataStore(str(tmp_path / 'metadata.sqlite'))
+    csvPath = write_csv(tmp_path / 'meetings.csv', [
+        meeting('774', '2022-09-11', start='18:00:00'),
+        meeting('774', '2022-09-11'),
+        meeting('775', '2022-09-12', teacher='Wei Zhang')])
+    # two meetings, the later row of 774 winning, and two playlists
+    assert store.import_meetings_csv(csvPath) == 4
+    assert meetings(store) == [('2022-09-11', '774', 'Class 774'), ('2022-09-12', '775', 'Class 775')]
+    assert store.meeting_row(store.meeting_id('774', '2022-09-11'))[0] == 1662937200
+    assert store.playlist_id('775', 'Wei Zhang') == 'PL775'
+    # unchanged, not even read again
+    assert store.import_meetings_csv(csvPath) == 0
+
+
+def test_reimport_changed_meetings_csv(tmp_path):
+    store = MetadataStore(str(tmp_path / 'metadata.sqlite'))
+    csvPath = write_csv(tmp_path / 'meetings.csv', [
+        meeting('774', '2022-09-11'), meeting('775', '2022-09-12'), meeting('776', '2022-09-13')])
+    store.import_meetings_csv(csvPath)
+    firstId = store.meeting_id('774', '2022-09-11')
+    write_csv(csvPath, [
+        meeting('774', '2022-09-11', start='19:30:00'), meeting('776', '2022-09-13'),
+        meeting('777', '2022-09-14')])
+    # the same size, written within the same clock tick
+    os.utime(csvPath, ns=(0, 0))
+    # 774 changed, 775 removed, 777 added, and the playlists of 775 and 777
+    assert store.import_meetings_csv(csvPath) == 5
+    assert [row[1] for row in meetings(store)] == ['774', '776', '777']
+    assert store.meeting_id('774', '2022-09-11') == firstId
+    assert store.meeting_row(firstId)[0] == 1662937200 + 1800
+    assert store.playlist_id('775', 'Ananya Agarwal') is None
+
+
+def test_import_processed_incrementally(tmp_path):
+    store = MetadataStore(str(tmp_path / 'metadata.sqlite'))
+    journalPath = tmp_path / 'processed.csv'
+    assert store.import_processed(str(journalPath)) == 0
+    journalPath.write_text(format_row(['774', '2022-09-11', '19:00:00', 'Ananya Agarwal', 'video0']) +
+                           '775,2022-09-12,19:00:00,Wei Zhang,video1\n')
+    assert store.import_processed(str(journalPath)) == 2
+    assert store.import_processed(str(journalPath)) == 0
+    # only the appended record is read, a torn last line waits for the next import
+    with open(journalPath, mode='a') as file_out:
+        file_out.write('776,2022-09-13,19:00:00,Wei Zhang,video2\n777,2022-09-14')
+    assert store.import_processed(str(journalPath)) == 1
+    with open(journalPath, mode='a') as file_out:
+        file_out.write(',19:00:00,Wei Zhang,video3\n')
+    assert store.import_processed(str(journalPath)) == 1
+    assert store.processed_count() == 4
+    assert store.is_processed('video3')
+    assert store.processed_videos_of('774', '2022-09-11', '19:00:00') == ['video0']
+
+
+def test_import_playlist_json(tmp_path):
+    store = MetadataStore(str(tmp_path / 'metadata.sqlite'))
+    jsonPath = tmp_path / 'playlist.json'
+    jsonPath.write_text(json.dumps({
+        '774': {'Playlist ID': 'PL774', 'Playlist Title': 'Class 774'},
+        '775': {'Playlist ID': None, 'Playlist Title': 'Class 775'},
+        '776': 'PL776'}))
+    assert store.import_playlist_json(str(jsonPath)) == 3
+    assert store.playlist_id('774') == 'PL774'
+    assert store.playlist_id('776') == 'PL776'
+    assert store.playlists_to_create() == [('775', 'Class 775')]
+    assert store.import_playlist_json(str(jsonPath)) == 0
+    jsonPath.write_text(json.dumps({'774': {'Playlist ID': 'PL774', 'Playlist Title': 'Class 774'}}))
+    assert store.import_playlist_json(str(jsonPath)) == 2
+    assert store.playlist_id('776') is None
+
+
+def test_import_zoom_aliases(tmp_path):
+    store = MetadataStore(str(tmp_path / 'metadata.sqlite'))
+    csvPath = write_csv(tmp_path / 'meetings.csv', [meeting('774', '2022-09-11', zoom='teacher@example.com')])
+    store.import_meetings_csv(csvPath)
+    start = 1662937200
+    assert store.meetings_starting(5, start - 900, start + 900) == []
+    assert store.import_zoom_aliases({'teacher@example.com': 'Z05', 'Z05-TL': 'Z05'}) == 2
+    assert store.meetings_starting(5, start - 900, start + 900) == [(start, store.meeting_id('774', '2022-09-11'))]
+    assert store.canonical_zoom_id('teacher@example.com') == 'Z05'
+    assert store.canonical_zoom_id('Z77-XX') == 'Z77-XX'
+    assert store.import_zoom_aliases({'Z05-TL': 'Z05', 'teacher@example.com': 'Z05'}) == 0
@@ -1,35 +1,53 @@
-import csv
 import sys
 from urllib import parse
+from thinkland import snapshot
 
 class PlaylistDB:
     def __init__(self, csvMeetingsFile):
-        with open(csvMeetingsFile, mode='r') as file_in:
+        self.csvMeetingsFile = csvMeetingsFile
+        self.table = snapshot.load(csvMeetingsFile)
+        self.allPlaylists = {}
+        self.ambiguousClasses = set()
+        self._addRows(0)
+
+    def reload(self):
+        """Pick up the playlists of rows appended to the CSV since it was
+        loaded, or rebuild when the already loaded part changed."""
+        self.table, firstNewRow = snapshot.reload(self.table, self.csvMeetingsFile)
+        if firstNewRow == 0:
             self.allPlaylists = {}
-            reader = csv.DictReader(file_in)
-            PLAYLIST_URL = "YouTube Playlist Share URL"
-            CLASS_ID = "Class ID"
-            TEACHER_NAME = "Teacher Name"
             self.ambiguousClasses = set()
-            for line in reader:
-                class_id = line[CLASS_ID]
-                teacher = line[TEACHER_NAME]
-                plkey = "%s|%s" % (class_id, teacher)
-                if line[PLAYLIST_URL]:
-                    url = line[PLAYLIST_URL]
-                    params = parse.parse_qs(parse.urlsplit(url).query)
-                    playlist_id = None
-                    if 'list' in params and len(params['list']) == 1:
-                        playlist_id = params['list'][0]
-                    else:
-                        print(("Bad YoutubeURL: %s" % url), sys.stderr)
-                        continue
-                    if plkey not in self.allPlaylists:
-                        self.allPlaylists[plkey] = playlist_id
-                    elif self.allPlaylists[plkey] != playlist_id:
-                        self.ambiguousClasses.add(class_id)
-                        print("Different playlists for the same classID:%s\nPL1:%s\nPL2:%s" %
-                            (class_id, playlist_id, self.allPlaylists[class_id]))
+        self._addRows(firstNewRow)
+
+    def _addRows(self, firstRow):
+        table = self.table
+        PLAYLIST_URL = "YouTube Playlist Share URL"
+        CLASS_ID = "Class ID"
+        TEACHER_NAME = "Teacher Name"
+        # every meeting of a class repeats the same playlist, so only look at
+        # the distinct (class, teacher, url) string ids, in CSV order
+        distinct = dict.fromkeys(zip(table.codes[CLASS_ID][firstRow:],
+                                     table.codes[TEACHER_NAME][firstRow:],
+                                     table.codes[PLAYLIST_URL][firstRow:]))
+        for classCode, teacherCode, urlCode in distinct:
+            class_id = table.strings[classCode]
+            teacher = table.strings[teacherCode]
+            plkey = "%s|%s" % (class_id, teacher)
+            if table.strings[urlCode]:
+                url = table.strings[urlCode]
+                params = parse.parse_qs(parse.urlsplit(url).query)
+                playlist_id = None
+                if 'list' in params and len(params['list']) == 1:
+                    playlist_id = params['list'][0]
+                else:
+                    print(("Bad YoutubeURL: %s" % url), sys.stderr)
+                    continue
+                if plkey not in self.allPlaylists:
+                    self.allPlaylists[plkey] = playlist_id
+                elif self.allPlaylists[plkey] != playlist_id:
+                    self.ambiguousClasses.add(class_id)
+                    print("Different playlists for the same classID:%s\nPL1:%s\nPL2:%s" %
+                        (class_id, playlist_id, self.allPlaylists[plkey]))
 
     def getPlaylistId(self, classId, teacherName):
         plkey = "%s|%s" % (classId, teacherName)
@@ -40,6 +58,31 @@ class PlaylistDB:
         return None
 
 
+class SqlPlaylistDB(PlaylistDB):
+    """PlaylistDB answering from a thinkland.metadata_store.MetadataStore,
+    which imports the playlist URLs of the meetings CSV when it changed."""
+    def __init__(self, csvMeetingsFile, store):
+        self.csvMeetingsFile = csvMeetingsFile
+        self.store = store
+        if csvMeetingsFile:
+            store.import_meetings_csv(csvMeetingsFile)
+
+    def reload(self):
+        self.store.import_meetings_csv(self.csvMeetingsFile)
+
+    @property
+    def allPlaylists(self):
+        return {"%s|%s" % (classId, teacher): playlistId
+                for classId, teacher, playlistId, _, _ in self.store.playlists() if teacher}
+
+    @property
+    def ambiguousClasses(self):
+        return {classId for classId, _, _, _, ambiguous in self.store.playlists() if ambiguous}
+
+    def getPlaylistId(self, classId, teacherName):
+        return self.store.playlist_id(classId, teacherName)
+
+
 if __name__ == '__main__':
     plDB = PlaylistDB("data/meetings.csv")
     print(len(plDB.allPlaylists))
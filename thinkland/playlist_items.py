@@ -0,0 +1,81 @@
+#
+# Slim playlist item records and the list requests that fill them.
+#
+# Matching a video only needs its id, its title and the playlist item id, so
+# the list calls ask for exactly those fields (plus the paging fields) with a
+# fields= mask instead of whole snippets. Descriptions are long and only a
+# few scripts need them; fetch_descriptions() gets them afterwards with one
+# videos().list call per 50 videos, for just the videos that need them.
+# iter_pages() pages through a playlist lazily, so that a caller can stop as
+# soon as it has seen enough.
+
+from thinkland.list_cache import get_list_cache
+
+PAGE_SIZE = 50
+MAX_IDS = 50
+
+ITEM_FIELDS = 'etag,nextPageToken,pageInfo/totalResults,items(id,snippet/title,contentDetails/videoId)'
+DESCRIPTION_FIELDS = 'items(id,snippet/description)'
+
+
+class PlaylistItem:
+    """A video in a playlist. desc stays None until fetch_descriptions()."""
+    __slots__ = ('id', 'title', 'itemId', 'desc')
+
+    def __init__(self, id, title, itemId, desc=None):
+        self.id = id
+        self.title = title
+        self.itemId = itemId
+        self.desc = desc
+
+    def __repr__(self):
+        return 'PlaylistItem(%r, %r, %r)' % (self.id, self.title, self.itemId)
+
+
+def list_request(youtube, playlistId, pageToken='', maxResults=PAGE_SIZE):
+    """playlistItems().list request of one page, with the ITEM_FIELDS mask."""
+    return youtube.playlistItems().list(
+        part='snippet,contentDetails',
+        fields=ITEM_FIELDS,
+        maxResults=maxResults,
+        pageToken=pageToken,
+        playlistId=playlistId
+    )
+
+
+def iter_pages(youtube, playlistId, pageSize=PAGE_SIZE):
+    """Yield the PlaylistItem records of a playlist one page at a time."""
+    pageToken = ''
+    while True:
+        response = get_list_cache().execute(list_request(youtube, playlistId, pageToken, pageSize))
+        yield decode_items(response)
+        if 'nextPageToken' not in response:
+            return
+        pageToken = response['nextPageToken']
+
+
+def decode_items(response):
+    """The PlaylistItem records of a list response."""
+    return [PlaylistItem(item['contentDetails']['videoId'], item['snippet']['title'], item['id'])
+            for item in response.get('items', [])]
+
+
+def fetch_descriptions(youtube, items):
+    """Fill in the desc of the items that do not have it yet, with bulk
+    videos().list calls of up to MAX_IDS videos each."""
+    missing = [item for item in items if item.desc is None]
+    for start in range(0, len(missing), MAX_IDS):
+        chunk = missing[start:start + MAX_IDS]
+        request = youtube.videos().list(
+            part='snippet',
+            fields=DESCRIPTION_FIELDS,
+            id=','.join(dict.fromkeys(item.id for item in chunk)),
+            maxResults=MAX_IDS
+        )
+        response = get_list_cache().execute(request)
+        descriptions = {video['id']: video['snippet']['description']
+                        for video in response.get('items', [])}
+        for item in chunk:
+            # deleted or private videos are left out of the response
+            item.desc = descriptions.get(item.id, '')
+    return items
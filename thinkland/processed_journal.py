@@ -0,0 +1,237 @@
+#
+# Write-ahead journal of the processed videos, data/processed.csv.
+#
+# Every processed video appends one record:
+#
+#   <crc32>,<class id>,<date>,<start time>,<teacher name>,<video id>
+#
+# The fields are written with the csv module, so a teacher name with a comma
+# or a quote stays one field, and crc32 (8 hex digits) is the checksum of the
+# rest of the line. The file is still a CSV a spreadsheet can open. Rows of
+# the old format, the five fields without a checksum, are read as well: the
+# number of fields tells the two apart.
+#
+# ProcessedJournal stays open for the whole run. Records are buffered and
+# written and fsync'ed every syncEvery records or syncSeconds seconds, and on
+# close. After a crash at most that many records are lost, never half of one:
+# load_journal() skips a record whose checksum does not match (the torn last
+# line) and counts it in ProcessedIndex.corrupt.
+#
+# Journal is the same file without the processed video fields: append_row()
+# takes any list of strings and load_rows() reads them back. make_playlists.py
+# journals the playlists it creates with it.
+
+import csv
+import io
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+SYNC_EVERY = 20
+SYNC_SECONDS = 5.0
+
+LEGACY_DATE_TIME = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
+
+def format_record(meeting, videoId):
+    """The journal line of videoId processed as a recording of meeting."""
+    return format_row(record_fields(meeting, videoId))
+
+
+def record_fields(meeting, videoId):
+    """[class id, date, start time, teacher name, video id] of a processed video."""
+    start = str(meeting.startTime)
+    return [meeting.classId, start[:10], start[11:19], meeting.teacherName, videoId]
+
+
+def format_row(fields):
+    out = io.StringIO()
+    csv.writer(out, lineterminator='').writerow(fields)
+    row = out.getvalue()
+    return '%08x,%s\n' % (zlib.crc32(row.encode('utf-8')), row)
+
+
+def parse_row(line):
+    """The fields after the checksum of a journal line, None when it is damaged."""
+    line = line.rstrip('\r\n')
+    checksum, _, row = line.partition(',')
+    if len(checksum) != 8 or not row or not _is_hex(checksum):
+        return None
+    if int(checksum, 16) != zlib.crc32(row.encode('utf-8')):
+        return None
+    return next(csv.reader([row]), None)
+
+
+def parse_record(line):
+    """The fields of a journal line, None when it is damaged.
+
+    A checksummed record has six fields and a record of the old format
+    five, so the field count tells them apart; a class id that happens to
+    be 8 hex digits is not taken for a checksum. An old record must also
+    have its date and time in place, so that a checksummed record torn
+    after its fifth field is not read as one."""
+    fields = next(csv.reader([line.rstrip('\r\n')]), None)
+    if not fields:
+        return None
+    if len(fields) == 6:
+        return parse_row(line)
+    if len(fields) == 5 and LEGACY_DATE_TIME.match('%s %s' % (fields[1], fields[2])):
+        return fields
+    return None
+
+
+def _is_hex(text):
+    try:
+        int(text, 16)
+    except ValueError:
+        return False
+    return True
+
+
+class ProcessedRecord:
+    __slots__ = ('classId', 'date', 'time', 'teacherName', 'videoId')
+
+    def __init__(self, classId, date, time, teacherName, videoId):
+        self.classId = classId
+        self.date = date
+        self.time = time
+        self.teacherName = teacherName
+        self.videoId = videoId
+
+
+class ProcessedIndex:
+    """The records of a journal by video id and by meeting."""
+    def __init__(self):
+        self.videos = {}     # videoId -> ProcessedRecord, the last one written
+        self.meetings = {}   # (classId, date, time) -> [videoId, ...]
+        self.corrupt = 0
+
+    def add(self, record):
+        self.videos[record.videoId] = record
+        self.meetings.setdefault((record.classId, record.date, record.time), []).append(record.videoId)
+
+    def __contains__(self, videoId):
+        return videoId in self.videos
+
+    def __len__(self):
+        return len(self.videos)
+
+    def get(self, videoId):
+        return self.videos.get(videoId)
+
+    def videos_of(self, classId, date, time):
+        """Ids of the videos processed for the meeting of classId at date, time."""
+        return self.meetings.get((classId, date, time), [])
+
+
+def load_journal(path):
+    """Read a journal into a ProcessedIndex; an empty one when there is none."""
+    index = ProcessedIndex()
+    if not os.path.exists(path):
+        return index
+    with open(path, mode='r', newline='') as file_in:
+        for line in file_in:
+            if not line.strip():
+                continue
+            fields = parse_record(line)
+            if fields is None:
+                index.corrupt += 1
+                continue
+            index.add(ProcessedRecord(*fields))
+    return index
+
+
+def load_rows(path):
+    """(rows, number of damaged rows) of a Journal file; no rows when there is none."""
+    rows = []
+    corrupt = 0
+    if not os.path.exists(path):
+        return rows, corrupt
+    with open(path, mode='r', newline='', encoding='utf-8') as file_in:
+        for line in file_in:
+            if not line.strip():
+                continue
+            fields = parse_row(line)
+            if fields is None:
+                corrupt += 1
+            else:
+                rows.append(fields)
+    return rows, corrupt
+
+
+class Journal:
+    def __init__(self, path, syncEvery=SYNC_EVERY, syncSeconds=SYNC_SECONDS, fsync=True):
+        """syncEvery=0 writes the records only on flush() and close()."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.syncEvery = syncEvery
+        self.syncSeconds = syncSeconds
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.pending = []
+        self.written = 0
+        self.synced = time.monotonic()
+        self.file = open(path, mode='a', newline='', encoding='utf-8')
+        self._repair()
+
+    def append_row(self, fields):
+        with self.lock:
+            self.pending.append(format_row(fields))
+            due = self.syncEvery and (len(self.pending) >= self.syncEvery or
+                                      time.monotonic() - self.synced >= self.syncSeconds)
+            if due:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self._flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _flush(self):
+        if self.pending:
+            self.file.write(''.join(self.pending))
+            self.written += len(self.pending)
+            self.pending = []
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.synced = time.monotonic()
+
+    def _repair(self):
+        """End a torn last line, so the next record starts on a line of its own."""
+        size = self.file.tell()
+        if size == 0:
+            return
+        with open(self.path, mode='rb') as file_in:
+            file_in.seek(size - 1)
+            if file_in.read(1) != b'\n':
+                self.file.write('\n')
+
+
+class ProcessedJournal(Journal):
+    def append(self, meeting, videoId):
+        self.append_row(record_fields(meeting, videoId))
+
+
+if __name__ == '__main__':
+    # python3 -m thinkland.processed_journal [data/processed.csv]
+    index = load_journal(sys.argv[1] if len(sys.argv) > 1 else 'data/processed.csv')
+    print('%d processed videos of %d meetings, %d damaged records' % (
+        len(index), len(index.meetings), index.corrupt))
@@ -0,0 +1,67 @@
+from thinkland.processed_journal import Journal
+from thinkland.processed_journal import format_row
+from thinkland.processed_journal import load_journal
+from thinkland.processed_journal import load_rows
+from thinkland.processed_journal import parse_record
+
+FIELDS = ['774', '2022-09-11', '19:00:00', 'Ananya Agarwal', 'dQw4w9WgXcQ']
+
+
+def journal_file(directory, text):
+    path = directory / 'processed.csv'
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+
+def test_checksummed_record():
+    assert parse_record(format_row(FIELDS)) == FIELDS
+
+
+def test_comma_in_teacher_name():
+    fields = ['774', '2022-09-11', '19:00:00', 'Agarwal, "Ananya"', 'dQw4w9WgXcQ']
+    assert parse_record(format_row(fields)) == fields
+
+
+def test_legacy_record():
+    assert parse_record('774,2022-09-11,19:00:00,Ananya Agarwal,dQw4w9WgXcQ\n') == FIELDS
+
+
+def test_legacy_record_with_hex_class_id():
+    # 8 hex digits, but five fields: a class id, not a checksum
+    line = '20220911,2022-09-11,19:00:00,Ananya Agarwal,dQw4w9WgXcQ\n'
+    assert parse_record(line) == ['20220911'] + FIELDS[1:]
+
+
+def test_checksummed_record_with_hex_class_id():
+    fields = ['20220911'] + FIELDS[1:]
+    assert parse_record(format_row(fields)) == fields
+
+
+def test_corrupt_record():
+    line = format_row(FIELDS).replace('Ananya', 'Ananyb')
+    assert parse_record(line) is None
+    assert parse_record('not,a,record\n') is None
+
+
+def test_torn_record():
+    line = format_row(FIELDS)
+    for end in range(1, len(line) - 1):
+        assert parse_record(line[:end]) is None, line[:end]
+
+
+def test_load_journal_mixed(tmp_path):
+    legacy = '20220911,2022-09-11,19:00:00,Ananya Agarwal,old\n'
+    corrupt = format_row(FIELDS[:4] + ['bad']).replace('bad', 'bac')
+    torn = format_row(FIELDS[:4] + ['torn'])[:-8]
+    index = load_journal(journal_file(tmp_path, legacy + format_row(FIELDS) + corrupt + torn))
+    assert sorted(index.videos) == ['dQw4w9WgXcQ', 'old']
+    assert index.corrupt == 2
+    assert index.videos_of('20220911', '2022-09-11', '19:00:00') == ['old']
+
+
+def test_journal_rows_after_torn_line(tmp_path):
+    path = journal_file(tmp_path, format_row(['1', 'PL1']) + format_row(['2', 'PL2'])[:-5])
+    with Journal(path) as journal:
+        journal.append_row(['3', 'PL3'])
+    assert load_rows(path) == ([['1', 'PL1'], ['3', 'PL3']], 1)
+
@@ -0,0 +1,143 @@
+#
+# Ledger of the YouTube Data API quota spent today, shared by all the scripts.
+#
+# The API grants 10000 units per day, reset at midnight Pacific time. Every
+# script charges the ledger before sending a request; the ledger refuses with
+# QuotaExceeded when the request would go over the limit (thinkland.api_calls
+# does the charging for every request it sends). Spending is kept in
+# data/quota.json
+#
+#   {"day": "2023-01-05", "spent": 4051, "methods": {"youtube.videos.update": 3950, ...}}
+#
+# and the file is locked while it is updated, so two scripts run back to back
+# (or at the same time) add up instead of each assuming a full day of quota.
+
+import json
+import os
+import threading
+import contextlib
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DAILY_QUOTA = 10000
+DEFAULT_LEDGER_FILE = 'data/quota.json'
+QUOTA_ZONE = ZoneInfo('America/Los_Angeles')
+
+# units per call of every API method the scripts use
+COSTS = {
+    'youtube.playlistItems.list': 1,
+    'youtube.playlists.list': 1,
+    'youtube.videos.list': 1,
+    'youtube.videos.update': 50,
+    'youtube.playlistItems.insert': 50,
+    'youtube.playlistItems.delete': 50,
+    'youtube.playlists.insert': 50,
+}
+# charged for a method missing from COSTS, the price of a write
+UNKNOWN_COST = 50
+
+
+class QuotaExceeded(Exception): pass
+
+
+def cost(method):
+    """Units charged for a call, method is a methodId or an HttpRequest."""
+    return COSTS.get(getattr(method, 'methodId', method), UNKNOWN_COST)
+
+
+def quota_day(now=None):
+    """The quota day, as 'YYYY-MM-DD' in Pacific time."""
+    return (now or datetime.now(QUOTA_ZONE)).astimezone(QUOTA_ZONE).date().isoformat()
+
+
+class QuotaLedger:
+    def __init__(self, path=DEFAULT_LEDGER_FILE, limit=DAILY_QUOTA):
+        self.path = path
+        self.limit = limit
+        self._lock = threading.Lock()
+
+    def charge(self, method, count=1):
+        """Record count calls of method, raise QuotaExceeded instead when they
+        do not fit in what is left of today's quota."""
+        units = cost(method) * count
+        methodId = getattr(method, 'methodId', method)
+        with self._locked():
+            state = self._read()
+            if state['spent'] + units > self.limit:
+                raise QuotaExceeded('%s needs %d units, %d of %d left for %s' % (
+                    methodId, units, self.limit - state['spent'], self.limit, state['day']))
+            state['spent'] += units
+            state['methods'][methodId] = state['methods'].get(methodId, 0) + units
+            self._write(state)
+        return units
+
+    def exhaust(self):
+        """Count the rest of today's quota as spent, when the API says so."""
+        with self._locked():
+            state = self._read()
+            state['spent'] = max(state['spent'], self.limit)
+            self._write(state)
+
+    def spent(self):
+        with self._locked():
+            return self._read()['spent']
+
+    def remaining(self):
+        return self.limit - self.spent()
+
+    def can_afford(self, method, count=1):
+        return cost(method) * count <= self.remaining()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path + '.lock', 'a') as lockFile:
+                fcntl.flock(lockFile, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    def _read(self):
+        today = quota_day()
+        try:
+            with open(self.path, mode='r') as file_in:
+                state = json.load(file_in)
+        except (OSError, ValueError):
+            state = None
+        if not state or state.get('day') != today:
+            state = {'day': today, 'spent': 0, 'methods': {}}
+        return state
+
+    def _write(self, state):
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, mode='w') as file_out:
+            json.dump(state, file_out, indent=4)
+        os.replace(tmpPath, self.path)
+
+
+_ledger = None
+
+
+def get_ledger():
+    """The shared QuotaLedger of data/quota.json."""
+    global _ledger
+    if _ledger is None:
+        _ledger = QuotaLedger()
+    return _ledger
+
+
+if __name__ == '__main__':
+    ledger = get_ledger()
+    print('%s: %d of %d units spent' % (quota_day(), ledger.spent(), ledger.limit))
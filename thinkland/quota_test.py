@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from thinkland.quota import QuotaExceeded
+from thinkland.quota import QuotaLedger
+from thinkland.quota import quota_day
+
+
+def test_charge_adds_up(tmp_path):
+    path = str(tmp_path / 'quota.json')
+    QuotaLedger(path).charge('youtube.videos.update')
+    QuotaLedger(path).charge('youtube.playlistItems.list', count=3)
+    with open(path) as file_in:
+        state = json.load(file_in)
+    assert state['day'] == quota_day()
+    assert state['spent'] == 53
+    assert state['methods'] == {'youtube.videos.update': 50, 'youtube.playlistItems.list': 3}
+
+
+def test_quota_exceeded(tmp_path):
+    ledger = QuotaLedger(str(tmp_path / 'quota.json'), limit=120)
+    ledger.charge('youtube.videos.update', count=2)
+    with pytest.raises(QuotaExceeded):
+        ledger.charge('youtube.playlistItems.insert')
+    # the refused call is not charged, a cheaper one still fits
+    assert ledger.spent() == 100
+    ledger.charge('youtube.playlistItems.list', count=20)
+    assert ledger.remaining() == 0
+    assert not ledger.can_afford('youtube.playlistItems.list')
+
+
+def test_new_day_starts_from_zero(tmp_path):
+    path = tmp_path / 'quota.json'
+    path.write_text(json.dumps({'day': '2000-01-01', 'spent': 10000,
+                                'methods': {'youtube.videos.update': 10000}}))
+    ledger = QuotaLedger(str(path))
+    assert ledger.spent() == 0
+    ledger.charge('youtube.videos.update')
+    state = json.loads(path.read_text())
+    assert state == {'day': quota_day(), 'spent': 50, 'methods': {'youtube.videos.update': 50}}
+
+
+def test_exhaust(tmp_path):
+    ledger = QuotaLedger(str(tmp_path / 'quota.json'))
+    ledger.exhaust()
+    assert ledger.remaining() == 0
+    assert not ledger.can_afford('youtube.playlistItems.list')
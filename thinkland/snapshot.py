@@ -0,0 +1,249 @@
+#
+# Binary snapshot of the meetings CSV.
+#
+# Parsing data/meetings.csv with csv.DictReader and converting the local class
+# times to UTC epochs takes most of the start-up time of every script, and client.py used
+# to do it twice (PlaylistDB and MeetingDB). The first load writes a sidecar
+# file next to the CSV (meetings.csv.snap) holding
+#
+#   header   magic, CSV size, CSV mtime, sha1 of the CSV, row/string counts,
+#            time zone used for the epochs
+#   starts   int64 UTC epoch seconds of each row's start time
+#   ends     int64 UTC epoch seconds of each row's end time
+#   codes    uint32 string id per column per row
+#   offsets  uint32 byte offsets of each string in the blob
+#   blob     utf-8 encoded unique strings
+#
+# Later loads memory-map the sidecar. It is rebuilt only when the CSV content
+# changes: a size/mtime mismatch alone falls back to comparing the sha1.
+#
+# The scheduling export only appends rows, so reload() checks the sha1 of the
+# first CSV-size bytes recorded in the header. When that prefix is unchanged
+# only the appended tail is parsed and added to the table.
+
+import csv
+import hashlib
+import io
+import mmap
+import os
+import struct
+from array import array
+from zoneinfo import ZoneInfo
+
+from thinkland.tz_offsets import get_offset_table
+
+MAGIC = b'TLSNAP01'
+HEADER = struct.Struct('<8sqq20sII32s4x')
+
+COLUMNS = ['Class Date', 'Start Time', 'End Time', 'Class Name', 'Class ID',
+           'Teacher Name', 'YouTube Title', 'YouTube Description', 'Zoom ID',
+           'Reported', 'YouTube Playlist Share URL']
+# columns with few distinct values, an appended tail reuses their string ids
+SHARED_COLUMNS = ['Class Date', 'Start Time', 'End Time', 'Class Name', 'Class ID',
+                  'Teacher Name', 'Zoom ID', 'Reported', 'YouTube Playlist Share URL']
+
+# the table last loaded by this process of every (CSV path, zone), so
+# MeetingDB and PlaylistDB share one; a newer version of the CSV replaces it
+_loaded = {}
+
+
+class StringTable:
+    """The unique strings of a snapshot, decoded from the mapped blob on access."""
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+
+class MeetingTable:
+    """Column view of the meetings CSV, one row per CSV line.
+
+    Every string is interned: codes[column][row] is an index into strings, so
+    repeated class names, teachers and Zoom IDs are stored once. csvSize,
+    csvMtime and csvDigest describe the CSV content the table was built from.
+    """
+    def __init__(self, strings, codes, starts, ends, csvSize, csvMtime, csvDigest):
+        self.strings = strings
+        self.codes = codes
+        self.starts = starts
+        self.ends = ends
+        self.csvSize = csvSize
+        self.csvMtime = csvMtime
+        self.csvDigest = csvDigest
+
+    def __len__(self):
+        return len(self.starts)
+
+    def value(self, column, row):
+        return self.strings[self.codes[column][row]]
+
+
+class _TableBuilder:
+    """Accumulates parsed CSV rows, optionally on top of an existing table."""
+    def __init__(self, base=None):
+        self.stringIds = {}
+        self.blob = bytearray()
+        self.offsets = array('I', [0])
+        self.starts = array('q')
+        self.ends = array('q')
+        self.codes = {column: array('I') for column in COLUMNS}
+        if base is None:
+            return
+        self.blob += base.strings.blob
+        self.offsets = array('I')
+        self.offsets.frombytes(memoryview(base.strings.offsets).cast('B'))
+        self.starts.frombytes(memoryview(base.starts).cast('B'))
+        self.ends.frombytes(memoryview(base.ends).cast('B'))
+        for column in COLUMNS:
+            self.codes[column].frombytes(memoryview(base.codes[column]).cast('B'))
+        for column in SHARED_COLUMNS:
+            for code in set(base.codes[column]):
+                self.stringIds[base.strings[code]] = code
+
+    def intern(self, value):
+        if value not in self.stringIds:
+            self.stringIds[value] = len(self.offsets) - 1
+            self.blob += value.encode('utf-8')
+            self.offsets.append(len(self.blob))
+        return self.stringIds[value]
+
+    def add(self, reader, zoneInfo):
+        offsets = get_offset_table(zoneInfo)
+        for line in reader:
+            for column in COLUMNS:
+                self.codes[column].append(self.intern(line.get(column) or ''))
+            self.starts.append(offsets.parse_local(line['Class Date'], line['Start Time']))
+            self.ends.append(offsets.parse_local(line['Class Date'], line['End Time']))
+
+    def table(self, st, digest):
+        return MeetingTable(StringTable(memoryview(self.blob), self.offsets), self.codes,
+                            self.starts, self.ends, st.st_size, st.st_mtime_ns, digest)
+
+
+def snapshot_path(csvFilePath):
+    return csvFilePath + '.snap'
+
+
+def load(csvFilePath, zoneInfo=ZoneInfo('US/Eastern')):
+    """Return the MeetingTable of csvFilePath, using the snapshot when valid."""
+    st = os.stat(csvFilePath)
+    memoKey = (os.path.abspath(csvFilePath), zoneInfo.key)
+    table = _loaded.get(memoKey)
+    if table is not None and (table.csvSize, table.csvMtime) == (st.st_size, st.st_mtime_ns):
+        return table
+
+    table = _read_snapshot(csvFilePath, st, zoneInfo)
+    if table is None:
+        with open(csvFilePath, 'rb') as file_in:
+            data = file_in.read()
+        builder = _TableBuilder()
+        builder.add(csv.DictReader(io.StringIO(data.decode('utf-8'), newline='')), zoneInfo)
+        table = _save(csvFilePath, builder.table(st, hashlib.sha1(data).digest()), zoneInfo)
+    _loaded[memoKey] = table
+    return table
+
+
+def reload(table, csvFilePath, zoneInfo=ZoneInfo('US/Eastern')):
+    """Bring table up to date with csvFilePath.
+
+    Returns (table, firstNewRow). When only rows were appended to the CSV the
+    returned table extends the given one and firstNewRow is the first appended
+    row. When anything else changed the table is rebuilt and firstNewRow is 0.
+    """
+    st = os.stat(csvFilePath)
+    if st.st_size == table.csvSize and st.st_mtime_ns == table.csvMtime:
+        return table, len(table)
+
+    with open(csvFilePath, 'rb') as file_in:
+        data = file_in.read()
+    prefix = data[:table.csvSize]
+    if (len(data) < table.csvSize or not prefix.endswith(b'\n') or
+            hashlib.sha1(prefix).digest() != table.csvDigest):
+        return load(csvFilePath, zoneInfo), 0
+
+    firstNewRow = len(table)
+    if len(data) > table.csvSize:
+        header = data[:data.index(b'\n') + 1].decode('utf-8')
+        fieldnames = next(csv.reader([header]))
+        tail = io.StringIO(data[table.csvSize:].decode('utf-8'), newline='')
+        builder = _TableBuilder(table)
+        builder.add(csv.DictReader(tail, fieldnames=fieldnames), zoneInfo)
+        table = builder.table(st, hashlib.sha1(data).digest())
+    else:
+        # touched but not changed
+        table = MeetingTable(table.strings, table.codes, table.starts, table.ends,
+                             st.st_size, st.st_mtime_ns, table.csvDigest)
+    table = _save(csvFilePath, table, zoneInfo)
+    _loaded[(os.path.abspath(csvFilePath), zoneInfo.key)] = table
+    return table, firstNewRow
+
+
+def _save(csvFilePath, table, zoneInfo):
+    """Write the snapshot of table and return the memory-mapped copy of it."""
+    try:
+        _write_snapshot(csvFilePath, table, zoneInfo)
+    except OSError as error:
+        print('Cannot write snapshot of %s: %s' % (csvFilePath, error))
+        return table
+    # drop the parsed arrays in favor of the mapped columns
+    st = os.stat(csvFilePath)
+    return _read_snapshot(csvFilePath, st, zoneInfo) or table
+
+
+def _read_snapshot(csvFilePath, st, zoneInfo):
+    path = snapshot_path(csvFilePath)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file_in:
+        if os.fstat(file_in.fileno()).st_size < HEADER.size:
+            return None
+        buf = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, size, mtime, digest, nrows, nstrings, zone = HEADER.unpack_from(buf)
+    if magic != MAGIC or zone.rstrip(b'\0').decode() != zoneInfo.key:
+        return None
+    if size != st.st_size or mtime != st.st_mtime_ns:
+        # touched or copied, check whether the content actually changed
+        with open(csvFilePath, 'rb') as file_in:
+            if hashlib.sha1(file_in.read()).digest() != digest:
+                return None
+
+    view = memoryview(buf)
+    pos = HEADER.size
+    starts = view[pos:pos + 8 * nrows].cast('q')
+    pos += 8 * nrows
+    ends = view[pos:pos + 8 * nrows].cast('q')
+    pos += 8 * nrows
+    codes = {}
+    for column in COLUMNS:
+        codes[column] = view[pos:pos + 4 * nrows].cast('I')
+        pos += 4 * nrows
+    offsets = view[pos:pos + 4 * (nstrings + 1)].cast('I')
+    pos += 4 * (nstrings + 1)
+    strings = StringTable(view[pos:pos + offsets[nstrings]], offsets)
+    return MeetingTable(strings, codes, starts, ends, st.st_size, st.st_mtime_ns, digest)
+
+
+def _write_snapshot(csvFilePath, table, zoneInfo):
+    path = snapshot_path(csvFilePath)
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'wb') as file_out:
+        file_out.write(HEADER.pack(MAGIC, table.csvSize, table.csvMtime, table.csvDigest,
+                                   len(table), len(table.strings),
+                                   zoneInfo.key.encode()))
+        file_out.write(table.starts)
+        file_out.write(table.ends)
+        for column in COLUMNS:
+            file_out.write(table.codes[column])
+        file_out.write(table.strings.offsets)
+        file_out.write(table.strings.blob)
+    os.replace(tmpPath, path)
+
+
+if __name__ == '__main__':
+    table = load('data/meetings.csv')
+    print('%d rows, %d unique strings' % (len(table), len(table.strings)))
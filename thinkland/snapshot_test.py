@@ -0,0 +1,80 @@
+import csv
+import os
+
+from thinkland import snapshot
+from thinkland.snapshot import COLUMNS
+
+
+def meeting(classId, day, zoom='Z05-TL'):
+    return [day, '19:00:00', '20:00:00', 'Class %s' % classId, classId, 'Ananya Agarwal',
+            'Class %s | %s' % (classId, day), 'Lesson of class %s' % classId, zoom, '',
+            'https://www.youtube.com/playlist?list=PL%s' % classId]
+
+
+def write_csv(path, rows, mode='w'):
+    with open(path, mode=mode, newline='') as file_out:
+        writer = csv.writer(file_out)
+        if mode == 'w':
+            writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+
+def class_ids(table):
+    return [table.value('Class ID', row) for row in range(len(table))]
+
+
+def test_reload_appended_rows(tmp_path):
+    path = str(tmp_path / 'meetings.csv')
+    write_csv(path, [meeting('774', '2022-09-11'), meeting('775', '2022-09-12')])
+    table = snapshot.load(path)
+    write_csv(path, [meeting('776', '2022-09-13')], mode='a')
+    table, firstNewRow = snapshot.reload(table, path)
+    assert firstNewRow == 2
+    assert class_ids(table) == ['774', '775', '776']
+
+
+def test_reload_unchanged(tmp_path):
+    path = str(tmp_path / 'meetings.csv')
+    write_csv(path, [meeting('774', '2022-09-11')])
+    table = snapshot.load(path)
+    reloaded, firstNewRow = snapshot.reload(table, path)
+    assert reloaded is table and firstNewRow == 1
+
+
+def test_reload_rebuilds_when_prefix_changed(tmp_path):
+    path = str(tmp_path / 'meetings.csv')
+    write_csv(path, [meeting('774', '2022-09-11'), meeting('775', '2022-09-12')])
+    table = snapshot.load(path)
+    # an edited row, with a row appended after it
+    write_csv(path, [meeting('774', '2022-09-11'), meeting('785', '2022-09-12'),
+                     meeting('776', '2022-09-13')])
+    table, firstNewRow = snapshot.reload(table, path)
+    assert firstNewRow == 0
+    assert class_ids(table) == ['774', '785', '776']
+    starts = list(table.starts)
+    assert starts == sorted(starts) and starts[1] - starts[0] == 86400
+
+
+def test_reload_rebuilds_when_truncated(tmp_path):
+    path = str(tmp_path / 'meetings.csv')
+    write_csv(path, [meeting('774', '2022-09-11'), meeting('775', '2022-09-12')])
+    table = snapshot.load(path)
+    write_csv(path, [meeting('774', '2022-09-11')])
+    table, firstNewRow = snapshot.reload(table, path)
+    assert firstNewRow == 0
+    assert class_ids(table) == ['774']
+
+
+def test_memo_keeps_the_latest_table_only(tmp_path):
+    path = str(tmp_path / 'meetings.csv')
+    write_csv(path, [meeting('774', '2022-09-11')])
+    table = snapshot.load(path)
+    assert snapshot.load(path) is table
+    memoKey = (os.path.abspath(path), 'US/Eastern')
+    for day in range(12, 15):
+        write_csv(path, [meeting('775', '2022-09-%d' % day)], mode='a')
+        table, _ = snapshot.reload(table, path)
+        assert snapshot._loaded[memoKey] is table
+        assert snapshot.load(path) is table
+    assert [key for key in snapshot._loaded if key[0] == memoKey[0]] == [memoKey]
+    assert len(table) == 4
@@ -0,0 +1,107 @@
+#
+# Local wall time to UTC epoch seconds through a per-day offset table.
+#
+# Building datetime(..., tzinfo=ZoneInfo('US/Eastern')) for every meeting and
+# calling timestamp() on it goes through the zone's transition lookup each
+# time. The meetings only need plain UTC epoch integers, so for each local day
+# we precompute
+#
+#   the UTC offset at local midnight
+#   the local second of the day at which the offset changes (86400 if never)
+#   the offset from then on
+#
+# A conversion is then a date ordinal, one comparison and some arithmetic.
+# Days are filled in a year at a time, on first use.
+#
+# Wall times that do not exist (the skipped hour in spring) or happen twice
+# (the repeated hour in fall) resolve like datetime's default fold=0: the
+# offset in effect before the transition.
+
+import functools
+from array import array
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DAY = 86400
+
+_tables = {}
+
+
+def get_offset_table(zoneInfo=ZoneInfo('US/Eastern')):
+    """The shared OffsetTable of a zone."""
+    if zoneInfo.key not in _tables:
+        _tables[zoneInfo.key] = OffsetTable(zoneInfo)
+    return _tables[zoneInfo.key]
+
+
+class OffsetTable:
+    def __init__(self, zoneInfo):
+        self.zoneInfo = zoneInfo
+        # year => (first day number, midnight offsets, change seconds, changed offsets)
+        self._years = {}
+
+    def local_to_epoch(self, year, month, day, hour, minute, second):
+        """UTC epoch seconds of a local wall time in this zone."""
+        dayNumber = date(year, month, day).toordinal() - EPOCH_ORDINAL
+        return self._to_epoch(year, dayNumber, hour * 3600 + minute * 60 + second)
+
+    def parse_local(self, dateStr, timeStr):
+        """UTC epoch seconds of 'YYYY-MM-DD', 'HH:MM:SS' local strings."""
+        year, dayNumber = _day_number(dateStr)
+        sections_time = timeStr.split(':')
+        seconds = int(sections_time[0]) * 3600 + int(sections_time[1]) * 60 + int(sections_time[2])
+        return self._to_epoch(year, dayNumber, seconds)
+
+    def _to_epoch(self, year, dayNumber, seconds):
+        first, midnight, changeAt, changed = self._year(year)
+        i = dayNumber - first
+        if seconds >= changeAt[i]:
+            return dayNumber * DAY + seconds - changed[i]
+        return dayNumber * DAY + seconds - midnight[i]
+
+    def _year(self, year):
+        if year not in self._years:
+            self._years[year] = self._build_year(year)
+        return self._years[year]
+
+    def _build_year(self, year):
+        first = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - first).days
+        midnight = array('l')
+        changeAt = array('l')
+        changed = array('l')
+        nextOffset = self._offset(datetime(year, 1, 1))
+        for i in range(days):
+            day = datetime.combine(first + timedelta(days=i), datetime.min.time())
+            offset = nextOffset
+            nextOffset = self._offset(day + timedelta(days=1))
+            midnight.append(offset)
+            if nextOffset == offset:
+                changeAt.append(DAY)
+                changed.append(offset)
+                continue
+            # binary search the first wall second using the new offset
+            lo, hi = 0, DAY
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._offset(day + timedelta(seconds=mid)) == offset:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            changeAt.append(lo)
+            changed.append(self._offset(day + timedelta(seconds=lo)) if lo < DAY else offset)
+        return first.toordinal() - EPOCH_ORDINAL, midnight, changeAt, changed
+
+    def _offset(self, wallTime):
+        return int(self.zoneInfo.utcoffset(wallTime).total_seconds())
+
+
+@functools.lru_cache(maxsize=8192)
+def _day_number(dateStr):
+    """(year, days since 1970-01-01) of a 'YYYY-MM-DD' string."""
+    sections_meet = dateStr.split('-')
+    d = date(int(sections_meet[0]), int(sections_meet[1]), int(sections_meet[2]))
+    return d.year, d.toordinal() - EPOCH_ORDINAL
@@ -0,0 +1,80 @@
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from thinkland.tz_offsets import OffsetTable
+from thinkland.tz_offsets import get_offset_table
+
+EASTERN = ZoneInfo('US/Eastern')
+
+
+def expected(zoneInfo, year, month, day, hour, minute, second):
+    return int(datetime(year, month, day, hour, minute, second, tzinfo=zoneInfo).timestamp())
+
+
+def check_day(table, day, step=60):
+    """Compare every step seconds of a local day with datetime.timestamp()."""
+    for seconds in range(0, 86400, step):
+        hour, minute, second = seconds // 3600, seconds // 60 % 60, seconds % 60
+        want = expected(table.zoneInfo, day.year, day.month, day.day, hour, minute, second)
+        got = table.local_to_epoch(day.year, day.month, day.day, hour, minute, second)
+        assert got == want, '%s %s %02d:%02d:%02d: %d != %d' % (
+            table.zoneInfo.key, day, hour, minute, second, got, want)
+
+
+def transition_days(zoneInfo, year):
+    day = date(year, 1, 1)
+    ret = []
+    while day.year == year:
+        today = datetime(day.year, day.month, day.day, tzinfo=zoneInfo).utcoffset()
+        following = day + timedelta(days=1)
+        if datetime(following.year, following.month, following.day, tzinfo=zoneInfo).utcoffset() != today:
+            ret.append(day)
+        day = following
+    return ret
+
+
+def test_eastern_transition_days():
+    table = OffsetTable(EASTERN)
+    days = [d for year in range(2020, 2026) for d in transition_days(EASTERN, year)]
+    assert date(2022, 3, 13) in days and date(2022, 11, 6) in days
+    for day in days:
+        check_day(table, day, step=1)
+
+
+def test_eastern_skipped_and_repeated_hour():
+    table = get_offset_table(EASTERN)
+    # 02:30 does not exist on 2022-03-13, fold=0 reads it as EST
+    assert table.local_to_epoch(2022, 3, 13, 1, 59, 59) == 1647154799
+    assert table.local_to_epoch(2022, 3, 13, 2, 30, 0) == 1647156600
+    assert table.local_to_epoch(2022, 3, 13, 3, 0, 0) == 1647154800
+    # 01:30 happens twice on 2022-11-06, fold=0 reads it as EDT
+    assert table.local_to_epoch(2022, 11, 6, 1, 30, 0) == 1667712600
+    assert table.local_to_epoch(2022, 11, 6, 2, 0, 0) == 1667718000
+
+
+def test_eastern_every_day():
+    table = OffsetTable(EASTERN)
+    day = date(2021, 12, 25)
+    while day < date(2024, 1, 10):
+        check_day(table, day, step=3 * 3600 + 17 * 60 + 13)
+        day += timedelta(days=1)
+
+
+def test_other_zones():
+    # southern hemisphere, half hour offsets and zones without DST
+    for key in ['Europe/London', 'Australia/Sydney', 'America/St_Johns',
+                'Asia/Kolkata', 'Australia/Lord_Howe', 'UTC']:
+        zoneInfo = ZoneInfo(key)
+        table = OffsetTable(zoneInfo)
+        for day in transition_days(zoneInfo, 2023) + [date(2023, 1, 1), date(2023, 12, 31)]:
+            check_day(table, day)
+
+
+def test_parse_local():
+    table = get_offset_table(EASTERN)
+    assert table.parse_local('2022-08-12', '14:30:13') == expected(EASTERN, 2022, 8, 12, 14, 30, 13)
+    assert table.parse_local('2022-12-04', '15:03:09') == expected(EASTERN, 2022, 12, 4, 15, 3, 9)
+    assert table.parse_local('2022-11-06', '23:59:59') == expected(EASTERN, 2022, 11, 6, 23, 59, 59)
+
@@ -0,0 +1,137 @@
+#
+# JSON object stored as a snapshot plus numbered deltas, as described at the
+# top of converter.py.
+#
+# XXX.json is the last full snapshot. Every change after it is written to the
+# next delta file next to it, XXX.v001.json, XXX.v002.json, ..., holding only
+# the keys that changed:
+#
+#   {"set": {"774": "PLxxxx"}, "delete": []}
+#
+# A delta is written to a temp file and renamed into place, so it is either
+# there in full or not at all, and writing one costs the same however big the
+# object is. Loading reads the snapshot and replays the deltas in order.
+# compact(), run every compactEvery changes and on close(), writes the full
+# snapshot the same way (temp file, fsync, rename) and only then removes the
+# deltas. Replaying a delta twice gives the same object, so a crash between
+# the rename and the removal loses nothing either.
+#
+# converter.add_playlist() keeps data/playlist_copy.json this way.
+
+import json
+import os
+import re
+import sys
+import threading
+
+COMPACT_EVERY = 100
+
+
+def write_atomic(path, data, fsync=True):
+    """Write data as JSON to a temp file and rename it over path."""
+    tmp = path + '.tmp'
+    with open(tmp, mode='w', encoding='utf-8') as file_out:
+        json.dump(data, file_out, indent=4)
+        file_out.flush()
+        if fsync:
+            os.fsync(file_out.fileno())
+    os.replace(tmp, path)
+
+
+class VersionedJson:
+    def __init__(self, path, compactEvery=COMPACT_EVERY, fsync=True):
+        """compactEvery=0 compacts only on compact() and close()."""
+        self.path = path
+        self.compactEvery = compactEvery
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.base, _ = os.path.splitext(path)
+        self.data = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, mode='r', encoding='utf-8') as file_in:
+                self.data = json.load(file_in)
+        self.deltas = self._delta_versions()
+        for version in self.deltas:
+            with open(self.delta_path(version), mode='r', encoding='utf-8') as file_in:
+                self._apply(json.load(file_in))
+        self.version = self.deltas[-1] if self.deltas else 0
+
+    def delta_path(self, version):
+        return '%s.v%03d.json' % (self.base, version)
+
+    def _delta_versions(self):
+        directory = os.path.dirname(self.path) or '.'
+        pattern = re.compile(re.escape(os.path.basename(self.base)) + r'\.v(\d+)\.json$')
+        versions = []
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                versions.append(int(match.group(1)))
+        return sorted(versions)
+
+    def _apply(self, delta):
+        self.data.update(delta.get('set', {}))
+        for key in delta.get('delete', []):
+            self.data.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def delete(self, key):
+        self.update({}, [key])
+
+    def update(self, changes, deleted=()):
+        """Apply and write one delta setting changes and removing deleted."""
+        delta = {'set': dict(changes), 'delete': list(deleted)}
+        with self.lock:
+            self.version += 1
+            write_atomic(self.delta_path(self.version), delta, self.fsync)
+            self.deltas.append(self.version)
+            self._apply(delta)
+            if self.compactEvery and len(self.deltas) >= self.compactEvery:
+                self._compact()
+
+    def compact(self):
+        """Write the full snapshot and remove the deltas it includes."""
+        with self.lock:
+            self._compact()
+
+    def close(self):
+        self.compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _compact(self):
+        if not self.deltas:
+            return
+        write_atomic(self.path, self.data, self.fsync)
+        # oldest first: the deltas a crash leaves behind are the newest ones,
+        # and replaying those on the snapshot gives the snapshot again
+        for version in self.deltas:
+            os.remove(self.delta_path(version))
+        self.deltas = []
+        self.version = 0
+
+
+if __name__ == '__main__':
+    # python3 -m thinkland.versioned_json data/playlist_copy.json [--compact]
+    store = VersionedJson(sys.argv[1])
+    print('%d keys, %d deltas' % (len(store), len(store.deltas)))
+    if '--compact' in sys.argv[2:]:
+        store.compact()
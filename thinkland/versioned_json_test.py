@@ -0,0 +1,60 @@
+import json
+import os
+
+from thinkland.versioned_json import VersionedJson
+
+
+def test_deltas_then_compact(tmp_path):
+    path = str(tmp_path / 'playlist_copy.json')
+    store = VersionedJson(path, compactEvery=0)
+    store.set('774', 'PL1')
+    store.set('775', 'PL2')
+    store.delete('774')
+    assert sorted(os.listdir(tmp_path)) == [
+        'playlist_copy.v001.json', 'playlist_copy.v002.json', 'playlist_copy.v003.json']
+    store.close()
+    assert os.listdir(tmp_path) == ['playlist_copy.json']
+    with open(path) as file_in:
+        assert json.load(file_in) == {'775': 'PL2'}
+
+
+def test_leftover_deltas_are_replayed(tmp_path):
+    # a run that died before compacting leaves its deltas behind
+    path = str(tmp_path / 'playlist_copy.json')
+    store = VersionedJson(path, compactEvery=0)
+    store.set('774', 'PL1')
+    store.compact()
+    store.set('775', 'PL2')
+    store.update({'774': 'PL3'}, ['775'])
+    store.set('776', 'PL4')
+
+    store = VersionedJson(path, compactEvery=0)
+    assert store.data == {'774': 'PL3', '776': 'PL4'}
+    assert store.deltas == [1, 2, 3]
+    # new deltas go after the leftover ones
+    store.set('777', 'PL5')
+    assert store.deltas == [1, 2, 3, 4]
+    store.close()
+    assert VersionedJson(path).data == {'774': 'PL3', '776': 'PL4', '777': 'PL5'}
+
+
+def test_crash_between_snapshot_and_delta_removal(tmp_path):
+    # the snapshot already includes the delta left behind: replaying it
+    # gives the same object
+    path = str(tmp_path / 'playlist_copy.json')
+    store = VersionedJson(path, compactEvery=0)
+    store.set('774', 'PL1')
+    store.update({'775': 'PL2'}, ['774'])
+    with open(path, mode='w') as file_out:
+        json.dump(store.data, file_out)
+    os.remove(store.delta_path(1))
+    assert VersionedJson(path).data == {'775': 'PL2'}
+
+
+def test_compact_every(tmp_path):
+    path = str(tmp_path / 'playlist_copy.json')
+    store = VersionedJson(path, compactEvery=2)
+    store.set('1', 'a')
+    assert store.deltas == [1]
+    store.set('2', 'b')
+    assert store.deltas == [] and os.listdir(tmp_path) == ['playlist_copy.json']
@@ -0,0 +1,67 @@
+#
+# Matching stage of the processing pipeline.
+#
+# match_pages() turns the pages of the Unprocessed playlist into VideoMatch
+# records: every video is matched against the meetings exactly once (one
+# match_many call per page) and its class playlist looked up once. Later
+# stages, the processing and the dry run report, read the record instead of
+# matching again.
+
+from thinkland.meeting import NO_MATCH
+
+# window around the meeting start a recording has to start in
+MATCH_MINUTES = 20
+
+# skip reasons of a VideoMatch
+NO_MEETING = 'meeting not found'
+NO_PLAYLIST = 'playlist not created yet'
+
+
+class VideoMatch:
+    """A video with the outcome of matching it.
+
+    status and candidates are those of the MatchResult. skip is None for an
+    eligible video, which has both meeting and playlist (also set as
+    meeting.playlist), else NO_MEETING or NO_PLAYLIST.
+    """
+    __slots__ = ('video', 'meeting', 'playlist', 'status', 'candidates', 'skip')
+
+    def __init__(self, video, meeting, playlist, status, candidates, skip):
+        self.video = video
+        self.meeting = meeting
+        self.playlist = playlist
+        self.status = status
+        self.candidates = candidates
+        self.skip = skip
+
+    @property
+    def eligible(self):
+        return self.skip is None
+
+
+def match_page(page, meetingDB, playlistDB, minutesAllow=MATCH_MINUTES):
+    """The VideoMatch records of a list of PlaylistItem records."""
+    matches = []
+    results = meetingDB.match_many([video.title for video in page], minutesAllow)
+    for video, result in zip(page, results):
+        meeting = result.meeting
+        if result.status == NO_MATCH or meeting is None:
+            matches.append(VideoMatch(video, None, None, result.status, 0, NO_MEETING))
+            continue
+        playlist = playlistDB.getPlaylistId(meeting.classId, meeting.teacherName)
+        meeting.playlist = playlist
+        matches.append(VideoMatch(video, meeting, playlist, result.status, result.candidates,
+                                  None if playlist else NO_PLAYLIST))
+    return matches
+
+
+def match_pages(pages, meetingDB, playlistDB, minutesAllow=MATCH_MINUTES):
+    """Yield the VideoMatch of every video of pages, page by page. Closing
+    the generator closes pages, e.g. to stop a prefetch()."""
+    try:
+        for page in pages:
+            yield from match_page(page, meetingDB, playlistDB, minutesAllow)
+    finally:
+        close = getattr(pages, 'close', None)
+        if close:
+            close()
@@ -0,0 +1,140 @@
+#
+# Thread pool for the YouTube writes of a processing run.
+#
+# An httplib2.Http object is not thread-safe, so each worker thread builds its
+# own Resource from the shared credentials on first use. Everything the
+# workers share goes through a Coordinator: the quota points and the outcome
+# of every job, which it hands on in submission order (e.g. to write the
+# processed CSV) no matter which thread finishes first.
+#
+# prefetch() runs a producer, e.g. the paging through a playlist, on its own
+# thread a bounded number of items ahead of the consumer.
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_END = object()
+
+
+class Coordinator:
+    def __init__(self, record=None, points=0, threshold=None):
+        """record(item) is called, under the lock and in submission order, for
+        every job that succeeded. threshold is the daily quota in points."""
+        self.lock = threading.Lock()
+        self.record = record
+        self.points = points
+        self.threshold = threshold
+        self.results = []  # (item, exception) in submission order
+        self.succeeded = 0
+        self.failed = 0
+        self._submitted = 0
+        self._next = 0
+        self._finished = {}
+
+    def charge(self, points):
+        """Account for points of quota, False once over the threshold."""
+        with self.lock:
+            self.points += points
+            return self.threshold is None or self.points <= self.threshold
+
+    def submit(self, item):
+        """Register the next job, returns its done(response, exception) callback."""
+        with self.lock:
+            index = self._submitted
+            self._submitted += 1
+        return lambda response, exception: self.finish(index, item, exception)
+
+    def finish(self, index, item, exception):
+        with self.lock:
+            if index < self._next or index in self._finished:
+                return
+            self._finished[index] = (item, exception)
+            while self._next in self._finished:
+                item, exception = self._finished.pop(self._next)
+                self._next += 1
+                self.results.append((item, exception))
+                if exception is not None:
+                    self.failed += 1
+                    continue
+                self.succeeded += 1
+                if self.record:
+                    self.record(item)
+
+
+def run_workers(jobs, buildResource, workers, func):
+    """Call func(youtube, *job) for every job on `workers` threads.
+
+    Each thread gets its own youtube Resource from buildResource(). jobs may
+    be a generator: a job is submitted as soon as it is produced, with at most
+    2 * workers jobs waiting or running at a time. Waits for all the jobs,
+    then raises the first exception a job raised, if any.
+    """
+    local = threading.local()
+    slots = threading.BoundedSemaphore(2 * workers)
+    errors = []
+
+    def work(job):
+        try:
+            if not hasattr(local, 'youtube'):
+                local.youtube = buildResource()
+            func(local.youtube, *job)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='youtube') as pool:
+        for job in jobs:
+            slots.acquire()
+            pool.submit(work, job)
+    if errors:
+        raise errors[0]
+
+
+def prefetch(iterable, depth=1):
+    """Yield the items of iterable, produced on a background thread that
+    stays at most depth items (plus the one being produced) ahead.
+
+    An exception of the producer is raised in the consumer. When the consumer
+    stops early the producer is stopped too, after the item in progress.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except Exception as error:
+            put((_END, error))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,37 @@
+from thinkland.workers import Coordinator
+
+
+def test_results_in_submission_order():
+    recorded = []
+    coordinator = Coordinator(record=recorded.append)
+    done = [coordinator.submit(item) for item in ['a', 'b', 'c', 'd']]
+    done[2](None, None)
+    done[1](None, ValueError('b failed'))
+    assert recorded == [] and coordinator.results == []
+    done[0](None, None)
+    assert recorded == ['a', 'c']
+    done[3](None, None)
+    assert recorded == ['a', 'c', 'd']
+    assert [item for item, _ in coordinator.results] == ['a', 'b', 'c', 'd']
+    assert coordinator.succeeded == 3 and coordinator.failed == 1
+
+
+def test_duplicate_finish_is_ignored():
+    recorded = []
+    coordinator = Coordinator(record=recorded.append)
+    first = coordinator.submit('a')
+    second = coordinator.submit('b')
+    second(None, None)
+    second(None, ValueError('again, while waiting'))
+    first(None, None)
+    first(None, ValueError('again, after being handed on'))
+    assert recorded == ['a', 'b']
+    assert coordinator.results == [('a', None), ('b', None)]
+    assert coordinator.succeeded == 2 and coordinator.failed == 0
+
+
+def test_charge_threshold():
+    coordinator = Coordinator(points=9900, threshold=10000)
+    assert coordinator.charge(50)
+    assert coordinator.charge(50)
+    assert not coordinator.charge(50)
@@ -0,0 +1,277 @@
+#
+# asyncio client for the YouTube Data API calls of the processing pipeline.
+#
+# googleapiclient sends one request at a time over one httplib2 connection.
+# AsyncYouTube speaks HTTP/1.1 over asyncio streams instead, so one event loop
+# can have the requests of many videos in flight:
+#
+#   - a pool of up to maxConnections keep-alive connections to the API host
+#   - at most maxInFlight requests in flight, capped by a semaphore
+#   - the OAuth2 credentials of auth.get_credentials(); the access token is
+#     refreshed on a thread when it expired or the API answers 401
+#   - the quota ledger, rate limiter, retries and per method stats of
+#     thinkland.api_calls, the same as for the synchronous calls
+#
+# Only the calls the scripts make are covered: playlistItems list, insert and
+# delete, videos list and update, playlists insert. Errors are raised as
+# googleapiclient.errors.HttpError, like with the synchronous client.
+# baseUrl points the client at a local stand-in of the API for offline tests:
+#
+#   async with AsyncYouTube(credentials, baseUrl='http://127.0.0.1:8080') as youtube:
+#       page = await youtube.playlist_items_list(playlistId)
+
+import asyncio
+import json
+import ssl
+import time
+import urllib.parse
+
+import googleapiclient.errors
+import httplib2
+
+from thinkland.api_calls import QUOTA
+from thinkland.api_calls import classify
+from thinkland.api_calls import get_caller
+from thinkland.quota import get_ledger
+
+DEFAULT_BASE_URL = 'https://youtube.googleapis.com'
+API_PATH = '/youtube/v3/'
+MAX_CONNECTIONS = 8
+MAX_IN_FLIGHT = 16
+USER_AGENT = 'thinkland_video_mgmt (asyncio)'
+
+
+class StaleConnection(ConnectionResetError):
+    """A kept alive connection the server closed before answering."""
+
+
+class AsyncRequest:
+    """A request as the quota ledger and the ApiCaller see it."""
+    __slots__ = ('method', 'methodId', 'uri', 'target', 'body')
+
+    def __init__(self, method, methodId, uri, target, body):
+        self.method = method
+        self.methodId = methodId
+        self.uri = uri
+        self.target = target
+        self.body = body
+
+
+class ConnectionPool:
+    """Up to size keep-alive HTTP/1.1 connections to the host of baseUrl."""
+    def __init__(self, baseUrl, size=MAX_CONNECTIONS):
+        url = urllib.parse.urlsplit(baseUrl)
+        self.secure = url.scheme == 'https'
+        self.host = url.hostname
+        self.port = url.port or (443 if self.secure else 80)
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.ssl = ssl.create_default_context() if self.secure else None
+        self.opened = 0
+        # a free slot holds an idle connection, or None to open a new one
+        self._slots = asyncio.LifoQueue()
+        for _ in range(size):
+            self._slots.put_nowait(None)
+
+    async def request(self, method, target, headers, body=b''):
+        """Send one request, returns (status, headers, content)."""
+        connection = await self._slots.get()
+        idle = None
+        try:
+            while True:
+                reused = connection is not None
+                if not reused:
+                    connection = await self._open()
+                try:
+                    status, responseHeaders, content, keepAlive = await self._exchange(
+                        connection, method, target, headers, body)
+                except StaleConnection:
+                    self._close(connection)
+                    connection = None
+                    if not reused:
+                        raise
+                    continue
+                if keepAlive:
+                    idle = connection
+                else:
+                    self._close(connection)
+                connection = None
+                return status, responseHeaders, content
+        finally:
+            if connection is not None:
+                self._close(connection)
+            self._slots.put_nowait(idle)
+
+    async def close(self):
+        while not self._slots.empty():
+            connection = self._slots.get_nowait()
+            if connection is not None:
+                self._close(connection)
+
+    async def _open(self):
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    def _close(self, connection):
+        connection[1].close()
+
+    async def _exchange(self, connection, method, target, headers, body):
+        reader, writer = connection
+        lines = ['%s %s HTTP/1.1' % (method, target), 'Host: %s' % self.netloc]
+        lines.extend('%s: %s' % item for item in headers.items())
+        if body or method in ('POST', 'PUT'):
+            lines.append('Content-Length: %d' % len(body))
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            statusLine = await reader.readline()
+        except ConnectionError as error:
+            raise StaleConnection(str(error)) from error
+        if not statusLine:
+            raise StaleConnection('connection closed by the server')
+        try:
+            version, status = statusLine.decode('latin-1').split(None, 2)[:2]
+            responseHeaders = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, value = line.decode('latin-1').split(':', 1)
+                responseHeaders[name.strip().lower()] = value.strip()
+            status = int(status)
+            keepAlive = (version == 'HTTP/1.1' and
+                         responseHeaders.get('connection', '').lower() != 'close')
+            if responseHeaders.get('transfer-encoding', '').lower() == 'chunked':
+                content = await self._read_chunked(reader)
+            elif 'content-length' in responseHeaders:
+                content = await reader.readexactly(int(responseHeaders['content-length']))
+            elif status in (204, 304) or 100 <= status < 200:
+                content = b''
+            else:
+                content = await reader.read()
+                keepAlive = False
+        except asyncio.IncompleteReadError as error:
+            raise ConnectionResetError('connection closed in the middle of a response') from error
+        return status, responseHeaders, content, keepAlive
+
+    async def _read_chunked(self, reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                # trailers up to the blank line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+
+class AsyncYouTube:
+    def __init__(self, credentials, baseUrl=DEFAULT_BASE_URL, maxConnections=MAX_CONNECTIONS,
+                 maxInFlight=MAX_IN_FLIGHT, ledger=None, caller=None):
+        """credentials are OAuth2 credentials, e.g. of auth.get_credentials()."""
+        self.credentials = credentials
+        self.baseUrl = baseUrl.rstrip('/')
+        self.pool = ConnectionPool(baseUrl, maxConnections)
+        self.inFlight = asyncio.Semaphore(maxInFlight)
+        self.ledger = ledger or get_ledger()
+        self.caller = caller or get_caller()
+        self._token = None
+        self._tokenLock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def playlist_items_list(self, playlistId, pageToken='', maxResults=50,
+                                  part='snippet,contentDetails', fields=None):
+        return await self.call('GET', 'playlistItems', 'youtube.playlistItems.list', {
+            'part': part, 'playlistId': playlistId, 'pageToken': pageToken,
+            'maxResults': maxResults, 'fields': fields})
+
+    async def playlist_items_insert(self, body, part='snippet'):
+        return await self.call('POST', 'playlistItems', 'youtube.playlistItems.insert',
+                               {'part': part}, body)
+
+    async def playlist_items_delete(self, id):
+        return await self.call('DELETE', 'playlistItems', 'youtube.playlistItems.delete', {'id': id})
+
+    async def videos_list(self, id, part='snippet', fields=None, maxResults=None):
+        return await self.call('GET', 'videos', 'youtube.videos.list', {
+            'part': part, 'id': id, 'fields': fields, 'maxResults': maxResults})
+
+    async def videos_update(self, body, part='snippet'):
+        return await self.call('PUT', 'videos', 'youtube.videos.update', {'part': part}, body)
+
+    async def playlists_insert(self, body, part='snippet,status'):
+        return await self.call('POST', 'playlists', 'youtube.playlists.insert', {'part': part}, body)
+
+    async def call(self, method, resource, methodId, params, body=None):
+        """Charge, rate limit and send one API call, retrying it when safe.
+        Returns the decoded JSON response, None for an empty one."""
+        query = urllib.parse.urlencode([(name, value) for name, value in params.items()
+                                        if value not in (None, '')])
+        path = API_PATH + resource + '?' + query
+        request = AsyncRequest(method, methodId, self.baseUrl + path, self.pool.prefix + path,
+                               None if body is None else json.dumps(body).encode('utf-8'))
+        # the ledger locks and rewrites data/quota.json: keep that off the loop
+        await asyncio.get_running_loop().run_in_executor(None, self.ledger.charge, request)
+        attempt = 0
+        async with self.inFlight:
+            while True:
+                await asyncio.sleep(self.caller.bucket.reserve())
+                start = time.perf_counter()
+                try:
+                    response = await self._send(request)
+                except Exception as error:
+                    self.caller.record(request, time.perf_counter() - start, failed=True)
+                    if self.caller.gone_already(request, error, attempt):
+                        return None
+                    if not self.caller.retryable(request, error, attempt):
+                        if classify(error) == QUOTA:
+                            raise self.caller.quota_exceeded(error) from error
+                        raise
+                    await asyncio.sleep(self.caller.backoff(attempt, error))
+                    attempt += 1
+                    self.caller.record(request, 0.0, retried=True)
+                else:
+                    self.caller.record(request, time.perf_counter() - start)
+                    return response
+
+    async def _send(self, request):
+        for refresh in (False, True):
+            headers = {
+                'Authorization': 'Bearer %s' % await self._access_token(refresh),
+                'Accept': 'application/json',
+                'Accept-Encoding': 'identity',
+                'User-Agent': USER_AGENT,
+            }
+            if request.body is not None:
+                headers['Content-Type'] = 'application/json'
+            status, responseHeaders, content = await self.pool.request(
+                request.method, request.target, headers, request.body or b'')
+            if status != 401:
+                break
+        if status >= 300:
+            resp = httplib2.Response(dict(responseHeaders, status=status))
+            raise googleapiclient.errors.HttpError(resp, content, uri=request.uri)
+        return json.loads(content) if content else None
+
+    async def _access_token(self, refresh=False):
+        """The current access token; a new one when refresh is set, after the
+        API rejected the current one."""
+        async with self._tokenLock:
+            stale = self._token is None or getattr(self.credentials, 'access_token_expired', False)
+            if refresh or stale:
+                loop = asyncio.get_running_loop()
+                if refresh:
+                    await loop.run_in_executor(None, self.credentials.refresh, httplib2.Http())
+                info = await loop.run_in_executor(None, self.credentials.get_access_token)
+                self._token = info.access_token
+            return self._token
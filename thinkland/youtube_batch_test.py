@@ -0,0 +1,132 @@
+import googleapiclient.errors
+import httplib2
+
+from thinkland import youtube_batch
+from thinkland.api_calls import ApiCaller
+from thinkland.quota import QuotaLedger
+from thinkland.youtube_batch import BatchExecutor
+from thinkland.youtube_batch import SkippedError
+
+# keep data/log.jsonl out of the checks
+youtube_batch.log = lambda message, **fields: None
+
+
+def http_error(status):
+    return googleapiclient.errors.HttpError(httplib2.Response({'status': status}), b'{}')
+
+
+class FakeRequest:
+    def __init__(self, youtube, name, method='PUT', methodId='youtube.videos.update', error=None):
+        self.youtube = youtube
+        self.name = name
+        self.method = method
+        self.methodId = methodId
+        self.error = error
+
+    def execute(self):
+        # a batch of one is sent as a plain request
+        self.youtube.round()
+        self.youtube.sent.append(self.name)
+        if self.error:
+            raise self.error
+        return {'id': self.name}
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.round()
+        for request_id, request in self.requests:
+            self.service.sent.append(request.name)
+            if request.error:
+                self.callback(request_id, None, request.error)
+            else:
+                self.callback(request_id, {'id': request.name}, None)
+
+
+class FakeYouTube:
+    """Fails the first HTTP requests with envelopeErrors, then answers every call."""
+    def __init__(self, envelopeErrors=()):
+        self.envelopeErrors = list(envelopeErrors)
+        self.envelopes = 0
+        self.sent = []
+
+    def round(self):
+        self.envelopes += 1
+        if self.envelopeErrors:
+            raise self.envelopeErrors.pop(0)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+def executor(youtube, directory):
+    ledger = QuotaLedger(str(directory / 'quota.json'), limit=10 ** 6)
+    return BatchExecutor(youtube, ledger=ledger, caller=ApiCaller(rate=10 ** 6, sleep=lambda seconds: None))
+
+
+def test_envelope_503_is_retried(tmp_path):
+    youtube = FakeYouTube([http_error(503)])
+    batch = executor(youtube, tmp_path)
+    results = []
+    for name in ['a', 'b', 'c']:
+        batch.add(FakeRequest(youtube, name), callback=lambda response, exception: results.append((response, exception)))
+    assert batch.execute() == 0
+    assert youtube.envelopes == 2
+    assert sorted(youtube.sent) == ['a', 'b', 'c']
+    assert len(results) == 3 and all(exception is None for _, exception in results)
+
+
+def test_envelope_failure_finishes_every_operation(tmp_path):
+    # an insert is not idempotent and a 400 is not transient: nothing is
+    # retried, but every callback still hears about the failure
+    youtube = FakeYouTube([http_error(503), http_error(400)])
+    batch = executor(youtube, tmp_path)
+    results = {}
+    for name, method in [('update', 'PUT'), ('insert', 'POST')]:
+        batch.add(FakeRequest(youtube, name, method),
+                  callback=lambda response, exception, name=name: results.setdefault(name, exception))
+    assert batch.execute() == 2
+    assert youtube.sent == []
+    assert results['insert'].resp.status == 503
+    assert results['update'].resp.status == 400
+
+
+def test_after_waits_for_its_prerequisite(tmp_path):
+    youtube = FakeYouTube()
+    batch = executor(youtube, tmp_path)
+    update = batch.add(FakeRequest(youtube, 'update'))
+    insert = batch.add(FakeRequest(youtube, 'insert', 'POST', 'youtube.playlistItems.insert'), after=update)
+    batch.add(FakeRequest(youtube, 'delete', 'DELETE', 'youtube.playlistItems.delete'), after=insert)
+    batch.add(FakeRequest(youtube, 'other'))
+    assert batch.execute() == 0
+    # one HTTP call per round: update and other, then insert, then delete
+    assert youtube.sent == ['update', 'other', 'insert', 'delete']
+    assert youtube.envelopes == 3
+
+
+def test_failed_prerequisite_cancels_dependents(tmp_path):
+    youtube = FakeYouTube()
+    batch = executor(youtube, tmp_path)
+    results = {}
+
+    def callback(name):
+        return lambda response, exception: results.setdefault(name, exception)
+    update = batch.add(FakeRequest(youtube, 'update', error=http_error(400)), callback('update'))
+    insert = batch.add(FakeRequest(youtube, 'insert', 'POST', 'youtube.playlistItems.insert'),
+                       callback('insert'), after=update)
+    batch.add(FakeRequest(youtube, 'delete', 'DELETE', 'youtube.playlistItems.delete'),
+              callback('delete'), after=insert)
+    assert batch.execute() == 3
+    assert youtube.sent == ['update']
+    assert results['update'].resp.status == 400
+    assert isinstance(results['insert'], SkippedError)
+    assert isinstance(results['delete'], SkippedError)
+
@@ -1,3 +1,4 @@
+import os
 import csv
 import json
 import argparse
@@ -46,23 +47,88 @@ SKIP_PAST = [
     "aicode1@huaxiabh.org"
 ]
 
+DEFAULT_KEY_FILE = 'data/zoom_key.json'
+
+
+class ZoomCanonicalizer:
+    """Maps Zoom account emails and aliases to canonical IDs like "Z05".
+
+    Built once from a key table; lookups are dict/set hits and every raw ID
+    seen is memoized. canonical() only knows the exact keys; near misses are
+    left to callers that ask for normalize().
+    """
+    def __init__(self, zoomKey, skipPast=SKIP_PAST):
+        self.zoomKey = dict(zoomKey)
+        self.skipPast = set(skipPast)
+        self.canonicalIds = set(self.zoomKey.values())
+        # "Z05" => 5, cheap keys for indexes
+        self.numbers = {}
+        for canonical in self.canonicalIds:
+            if canonical[1:].isdigit():
+                self.numbers[canonical] = int(canonical[1:])
+        self._canonical = {}
+        self._normalized = {}
+
+    @classmethod
+    def from_file(cls, file_path):
+        """Load the key table from the CSV export or the JSON written by --store_keys."""
+        if file_path.endswith('.csv'):
+            return cls(read_dict_from_csv(file_path))
+        with open(file_path, mode='r') as file_in:
+            return cls(json.load(file_in))
+
+    def is_canonical(self, id):
+        return id in self.canonicalIds
+
+    def canonical(self, account):
+        """Return the canonical zoom id of account, or account itself when unknown."""
+        if account in self._canonical:
+            return self._canonical[account]
+        ret = self.zoomKey.get(account, account)
+        self._canonical[account] = ret
+        return ret
+
+    def normalize(self, prefix):
+        """Create a prefix closer to the valid format, e.g. "z5" => "Z05"."""
+        if prefix in self._normalized:
+            return self._normalized[prefix]
+        changes = prefix
+        if len(changes) > 0 and changes[0] == 'z':
+            changes = 'Z' + changes[1:]
+
+        if len(changes) == 2 and changes[1].isdigit():
+            ret = changes[0] + '0' + changes[1]
+        elif len(changes) >= 3 and not changes[2].isdigit() and changes[1].isdigit():
+            ret = changes[0] + '0' + changes[1]
+        else:
+            ret = changes[0:min(len(changes), 3)]
+        self._normalized[prefix] = ret
+        return ret
+
+    def account_number(self, account):
+        """Return the account number of a raw or canonical id, None if unknown."""
+        return self.numbers.get(self.canonical(account))
+
+
+_default = None
+
+def get_canonicalizer():
+    """The shared ZoomCanonicalizer, from data/zoom_key.json when present."""
+    global _default
+    if _default is None:
+        if os.path.exists(DEFAULT_KEY_FILE):
+            _default = ZoomCanonicalizer.from_file(DEFAULT_KEY_FILE)
+        else:
+            _default = ZoomCanonicalizer(ZOOM_KEY)
+    return _default
+
+
 def is_canonical(id):
-    for key in ZOOM_KEY:
-        if id == ZOOM_KEY[key]:
-            return True
-    return False
+    return get_canonicalizer().is_canonical(id)
 
 
 def get_canonical_zoom_id(account):
-    if account in ZOOM_KEY:
-        return ZOOM_KEY[account]
-    # check whether account is already a canonical zoom id
-    # if not, return a warning
-    
-    if (not is_canonical(account)) and account not in SKIP_PAST:
-        pass
-        #print('Zoom ID "' + account + '" is not a key nor a canonical ID itself.', sys.stderr)
-    return account
+    return get_canonicalizer().canonical(account)
 
 
 def read_dict_from_csv(file_path):
@@ -0,0 +1,26 @@
+from thinkland.zoom_canonicalize import ZOOM_KEY
+from thinkland.zoom_canonicalize import ZoomCanonicalizer
+
+
+def test_canonical_is_exact():
+    zoom = ZoomCanonicalizer(ZOOM_KEY)
+    assert zoom.canonical('z5@thinklandai.com') == 'Z05'
+    assert zoom.canonical('Z05-TL') == 'Z05'
+    assert zoom.canonical('Z05') == 'Z05'
+    # near misses are left alone
+    assert zoom.canonical('z5') == 'z5'
+    assert zoom.canonical('Z5-1223') == 'Z5-1223'
+    assert zoom.account_number('z5') is None
+    assert zoom.account_number('Z05-TL') == 5
+
+
+def test_normalize_near_misses():
+    # what upload_prep/rename_files.py offers for a directory name
+    zoom = ZoomCanonicalizer(ZOOM_KEY)
+    assert zoom.normalize('z5') == 'Z05'
+    assert zoom.normalize('Z5') == 'Z05'
+    assert zoom.normalize('z5a') == 'Z05'
+    assert zoom.normalize('z12') == 'Z12'
+    assert zoom.normalize('Z05') == 'Z05'
+    # normalize() does not leak into the exact lookup
+    assert zoom.canonical('z5') == 'z5'
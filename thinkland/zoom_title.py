@@ -0,0 +1,107 @@
+#
+# Parser for the Zoom recording titles, shared by every script.
+#
+# Zoom names a local recording GMT20220812-183013_Recording_1760x820.mp4 and
+# rename_files.py prefixes the account: Z09-GMT20220812-183013_Recording_...
+# On YouTube the same video shows up as "Z09 GMT20220812 183013 Recording ...".
+# parse_title() understands both and returns a RecordingTitle, or None when
+# the title does not look like a recording. parse_title(title, strict=True)
+# only accepts the YouTube layout, for the scripts that flag the others.
+
+import re
+import functools
+from collections import namedtuple
+from datetime import date
+
+GALLERY = 'gallery'
+SPEAKER = 'speaker'
+TRANSCRIPT = 'transcript'
+
+RecordingTitle = namedtuple('RecordingTitle', ['account', 'epoch', 'view', 'resolution', 'ext'])
+RecordingTitle.__doc__ = """A parsed recording title.
+
+account     Zoom account prefix as written in the title, e.g. "Z09"
+epoch       recording start in UTC epoch seconds
+view        GALLERY, TRANSCRIPT or SPEAKER
+resolution  (width, height) or None
+ext         file extension without the dot, '' for YouTube titles
+"""
+
+# ACCOUNT<sep>GMTyyyymmdd<sep>hhmmss followed by a separator or the end
+_TITLE_RE = re.compile(r'([^ _-]+)[ _-]GMT(\d{8})[ _-](\d{6})(?=[ _.]|$)(.*)', re.S)
+# ACCOUNT GMTyyyymmdd hhmmss followed by a space or the end
+_STRICT_TITLE_RE = re.compile(r'([^ ]+) GMT(\d{8}) (\d{6})(?= |$)(.*)', re.S)
+_RESOLUTION_RE = re.compile(r'(\d{3,5})x(\d{3,5})')
+_EXT_RE = re.compile(r'\.([A-Za-z0-9]+)$')
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def parse_title(title, strict=False):
+    """Parse a recording title, returning a RecordingTitle or None.
+
+    With strict=True only the "Z09 GMT20220812 183013 ..." layout is
+    accepted, spaces around the date and the time."""
+    if strict:
+        m = _STRICT_TITLE_RE.match(title)
+        if m is None:
+            return None
+        return _record(m.group(1), m.group(2), m.group(3), m.group(4))
+    # fast path for the well-formed "Z09 GMT20220812 183013..." layout
+    if (len(title) >= 22 and title[4:7] == 'GMT' and title[3] in ' -' and
+            title[15] in ' -' and (len(title) == 22 or title[22] in ' _.')):
+        return _record(title[:3], title[7:15], title[16:22], title[22:])
+    m = _TITLE_RE.match(title)
+    if m is None:
+        return None
+    return _record(m.group(1), m.group(2), m.group(3), m.group(4))
+
+
+def parse_titles(titles):
+    """Parse a list of titles, returning a list of RecordingTitle or None."""
+    return [parse_title(title) for title in titles]
+
+
+def _record(account, ymd, hms, rest):
+    if not (ymd.isdigit() and hms.isdigit()):
+        return None
+    days = _day_number(ymd)
+    hms = int(hms)
+    hour = hms // 10000
+    mins = hms // 100 % 100
+    sec = hms % 100
+    if days is None or hour > 23 or mins > 59 or sec > 59:
+        return None
+    view, resolution, ext = _describe(rest)
+    return RecordingTitle(account, days * 86400 + hour * 3600 + mins * 60 + sec,
+                          view, resolution, ext)
+
+
+@functools.lru_cache(maxsize=4096)
+def _day_number(ymd):
+    """Days since 1970-01-01 of a yyyymmdd string, None if not a valid date."""
+    try:
+        return date(int(ymd[:4]), int(ymd[4:6]), int(ymd[6:8])).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def _describe(rest):
+    """(view, resolution, ext) from what follows the time in a title.
+    The same few suffixes repeat over and over, hence the cache."""
+    lowered = rest.lower()
+    if GALLERY in lowered:
+        view = GALLERY
+    elif TRANSCRIPT in lowered:
+        view = TRANSCRIPT
+    else:
+        view = SPEAKER
+    resolution = None
+    m = _RESOLUTION_RE.search(rest)
+    if m:
+        resolution = (int(m.group(1)), int(m.group(2)))
+    ext = ''
+    m = _EXT_RE.search(rest)
+    if m:
+        ext = m.group(1)
+    return view, resolution, ext
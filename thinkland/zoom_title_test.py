@@ -0,0 +1,66 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from thinkland.zoom_title import GALLERY
+from thinkland.zoom_title import SPEAKER
+from thinkland.zoom_title import TRANSCRIPT
+from thinkland.zoom_title import parse_title
+from thinkland.zoom_title import parse_titles
+
+EPOCH = int(datetime(2022, 8, 12, 18, 30, 13, tzinfo=ZoneInfo('UTC')).timestamp())
+
+
+def test_youtube_layout():
+    parsed = parse_title('Z09 GMT20220812 183013 Recording 1760x820')
+    assert parsed.account == 'Z09'
+    assert parsed.epoch == EPOCH
+    assert parsed.view == SPEAKER
+    assert parsed.resolution == (1760, 820)
+    assert parsed.ext == ''
+
+
+def test_separators():
+    for title in ['Z09 GMT20220812 183013',
+                  'Z09-GMT20220812-183013_Recording_1760x820.mp4',
+                  'Z09_GMT20220812_183013_Recording.mp4',
+                  'Z09-GMT20220812 183013 Recording',
+                  'z9@thinklandai.com GMT20220812 183013 Recording']:
+        parsed = parse_title(title)
+        assert parsed is not None, title
+        assert parsed.epoch == EPOCH, title
+    assert parse_title('Z09_GMT20220812_183013_Recording.mp4').ext == 'mp4'
+    assert parse_title('Z09_GMT20220812_183013_Recording.mp4').account == 'Z09'
+
+
+def test_views():
+    assert parse_title('Z05 GMT20221204 200309 Recording gallery 1686x768').view == GALLERY
+    assert parse_title('Z09-GMT20221218-225935_Recording.transcript.vtt').view == TRANSCRIPT
+    assert parse_title('Z09-GMT20221218-225935_Recording.transcript.vtt').ext == 'vtt'
+
+
+def test_bad_titles():
+    for title in ['', 'not a recording title', 'Z09', 'Z09 GMT20220812',
+                  'Z09 GMT2022081 183013', 'Z09 GMT20220812 18301',
+                  'Z09 GMT20220812 1830130', 'Z09 GMT2022081a 183013',
+                  'Z09 GMT20221340 183013', 'Z09 GMT20220230 183013',
+                  'Z09 GMT20220812 243013', 'Z09 GMT20220812 186013',
+                  'Z09 GMT20220812 183060', 'Z09/GMT20220812/183013',
+                  'Z09 20220812 183013', 'Z09 GMT20220812 183013x']:
+        assert parse_title(title) is None, title
+
+
+def test_strict_only_takes_the_youtube_layout():
+    parsed = parse_title('Z09 GMT20220812 183013 Recording 1760x820', strict=True)
+    assert parsed == parse_title('Z09 GMT20220812 183013 Recording 1760x820')
+    assert parse_title('Z09 GMT20220812 183013', strict=True).epoch == EPOCH
+    for title in ['Z09-GMT20220812-183013_Recording_1760x820.mp4',
+                  'Z09_GMT20220812_183013_Recording.mp4',
+                  'Z09-GMT20220812 183013 Recording',
+                  'Z09 GMT20220812 183013_Recording',
+                  'Z09 GMT20220812 183013.mp4',
+                  'Z09 GMT20220812 243013 Recording']:
+        assert parse_title(title, strict=True) is None, title
+
+
+def test_parse_titles():
+    assert parse_titles(['Z09 GMT20220812 183013', 'bad']) == [parse_title('Z09 GMT20220812 183013'), None]
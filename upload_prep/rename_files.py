@@ -31,83 +31,30 @@ output> Terminating code by user input
 
 import os
 import os.path
+import sys
 import argparse
 from zoneinfo import ZoneInfo
 import csv
 from datetime import datetime
-from datetime import timedelta
 import urllib.request
 
+# the script is run from anywhere, make the thinkland package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from thinkland.zoom_title import parse_title
+from thinkland.zoom_canonicalize import get_canonicalizer
+from thinkland.zoom_canonicalize import get_canonical_zoom_id
+from thinkland.zoom_canonicalize import is_canonical
+
 
 # Predefined Standard Zoom accounts used for matching purpose
 ZOOM_ACCOUNTS = ['Z01', 'Z02', 'Z03', 'Z04', 'Z05', 'Z06', 'Z07', 'Z08', 'Z09',
     'Z10', 'Z11', 'Z12', 'Z13', 'Z14', 'Z16', 'Z17', 'Z18', 'Z19']
 
-ZOOM_KEY = {
-    "MNCCS.zoom.04@gmail.com": "Z12",
-    "z1@thinklandai.com": "Z01",
-    "z7@thinklandai.com": "Z07",
-    "z3@thinklandai.com": "Z03",
-    "z4@thinklandai.com": "Z04",
-    "z9@thinklandai.com": "Z09",
-    "teach@thinkland.ai": "Z06",
-    "z11@thinklandai.com": "Z11",
-    "cnscc16@chicagochinesecenter.com": "Z13",
-    "z2@thinklandai.com": "Z02",
-    "cnscc17@chicagochinesecenter.com": "Z14",
-    "z5@thinklandai.com": "Z05",
-    "z10@thinklandai.com": "Z10",
-    "hcsgb_minor@hopechineseschool.org": "Z16",
-    "z8@thinklandai.com": "Z08",
-    "enrichmentclass3@tvcs.ngo": "Z19",
-    "enrichmentclass2@tvcs.ngo": "Z18",
-    "Z01-TL": "Z01",
-    "Z02-TL": "Z02",
-    "Z03-TL": "Z03",
-    "Z04-TL": "Z04",
-    "Z05-TL": "Z05",
-    "Z06-TL0": "Z06",
-    "Z07-TL": "Z07",
-    "Z08-TL": "Z08",
-    "Z09-TL": "Z09",
-    "Z10-TL": "Z10",
-    "Z11-TL": "Z11",
-    "Z14-CNSCC17": "Z14",
-    "Z13-CNSCC16": "Z13",
-}
-#"sqinga3@bostoncccc.org": "?",
-#"teachersun.hxbg@gmail.com": "?",
-#"aicode1@huaxiabh.org": "?",
-
-SKIP_PAST = [
-    "sqinga3@bostoncccc.org",
-    "teachersun.hxbg@gmail.com",
-    "aicode1@huaxiabh.org"
-]
-
 def remove(value, deletechars):
     for c in deletechars:
         value = value.replace(c,'_')
     return value
 
-def is_canonical(id):
-    for key in ZOOM_KEY:
-        if id == ZOOM_KEY[key]:
-            return True
-    return False
-
-
-def get_canonical_zoom_id(account):
-    if account in ZOOM_KEY:
-        return ZOOM_KEY[account]
-    # check whether account is already a canonical zoom id
-    # if not, return a warning
-    
-    if (not is_canonical(account)) and account not in SKIP_PAST:
-        pass
-        #print('Zoom ID "' + account + '" is not a key nor a canonical ID itself.', sys.stderr)
-    return account
-
 class Meeting:
     def __init__(self, startTime, endTime, className, classId, teacherName, rawZoomId, reported, video, title, description):
         self.startTime = startTime
@@ -171,35 +118,24 @@ class MeetingDB:
 
     def match(self, videoTitle, minutesAllow, zoneInfo=ZoneInfo('US/Eastern')):
         matches = list()
-        sections = videoTitle.split('_')[0].split('-')
-        if (len(sections) < 3 or len(sections[1]) < 11 or len(sections[2]) < 6 or
-            not sections[1][3:].isdigit() or not sections[2].isdigit()):
+        parsed = parse_title(videoTitle)
+        if parsed is None:
             # TODO: print some error messages
             print('Video title error: %s' % videoTitle)
             return None
-        year = int(sections[1][3:7])
-        month = int(sections[1][7:9])
-        day = int(sections[1][9:11])
-        hour = int(sections[2][:2])
-        mins = int(sections[2][2:4])
-        sec = int(sections[2][4:6])
-        video_dt = datetime(year, month, day, hour, mins, sec, tzinfo=ZoneInfo('UTC'))
         
-        zoomId = sections[0]
+        zoomId = parsed.account
         if not is_canonical(zoomId):
             print("Not a valid canonical ZoomID: %s" % videoTitle)
             return
 
-        maxDif = timedelta(minutes=minutesAllow)
+        maxDif = minutesAllow * 60
         for meetingId in self.allMeetings:
             meeting = self.allMeetings[meetingId]
             if zoomId != meeting.getCanonicalZoomId():
                 continue
             
-            time_diff = video_dt - meeting.startTime
-            if meeting.startTime >= video_dt:
-                time_diff = meeting.startTime - video_dt
-            if time_diff <= maxDif:
+            if abs(parsed.epoch - meeting.startTime.timestamp()) <= maxDif:
                 matches.append(meeting)
 
         if len(matches) == 0:
@@ -212,19 +148,6 @@ class MeetingDB:
         return matches[0]
 
 
-def validFormat(prefix):
-    '''create a prefix closer to the valid format'''
-    changes = prefix
-    if len(changes) > 0 and changes[0] == 'z':
-        changes = 'Z' + changes[1:]
-
-    if len(changes) == 2 and changes[1].isdigit():
-        return changes[0] + '0' + changes[1]
-
-    if len(changes) >= 3 and not changes[2].isdigit() and changes[1].isdigit():
-        return changes[0] + '0' + changes[1]
-    return changes[0:min(len(changes), 3)]
-
 if __name__ == '__main__':
     url = 'https://tinyurl.com/thinkland-csv'
     response = urllib.request.urlopen(url)
@@ -246,7 +169,7 @@ if __name__ == '__main__':
 
     if zoomPrefix not in ZOOM_ACCOUNTS:
         ''' check if prefix is similar to a zoom account name '''
-        edited = validFormat(zoomPrefix)
+        edited = get_canonicalizer().normalize(zoomPrefix)
         valid = edited in ZOOM_ACCOUNTS
         if valid:
             res = input('The directory name is not a valid Zoom ID, but is similar to ' + edited +